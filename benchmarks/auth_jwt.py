@@ -0,0 +1,125 @@
+"""
+Mede o custo por requisição da autenticação JWT (MiddlewareAutenticacao) sem
+e com o cache de tokens verificados: primeiro o custo isolado de obter o
+usuário a partir do token, depois o middleware inteiro com as requisições
+chegando a uma taxa fixa (5 mil por segundo, por padrão).
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.auth_jwt --usuarios 2000 --requisicoes 50000 --taxa 5000
+
+Os tokens são gerados com um segredo de teste se JWT_SECRET não estiver
+definido; o banco não é usado.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("JWT_SECRET", "segredo-de-benchmark-com-mais-de-32-bytes")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+import jwt
+from starlette.responses import Response
+
+from dtos.usuario_autenticado_dto import UsuarioAutenticadoDto
+from util import auth_jwt
+from util.cookies import NOME_COOKIE_AUTH
+
+
+def usuario_sem_cache(token: str) -> UsuarioAutenticadoDto:
+    # o caminho anterior ao cache: variáveis de ambiente e jwt.decode a cada
+    # requisição
+    dados = jwt.decode(token, os.getenv("JWT_SECRET"), os.getenv("JWT_ALGORITHM"))
+    return UsuarioAutenticadoDto(
+        id=dados["id"], nome=dados["nome"], email=dados["email"], perfil=dados["perfil"]
+    )
+
+
+def montar_escopo(token: str) -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"cookie", f"{NOME_COOKIE_AUTH}={token}".encode())],
+        "query_string": b"",
+    }
+
+
+def medir_funcao(funcao, tokens: list[str]) -> float:
+    inicio = time.perf_counter()
+    for token in tokens:
+        funcao(token)
+    return (time.perf_counter() - inicio) / len(tokens)
+
+
+async def medir_middleware(tokens: list[str], taxa: int) -> tuple[list[float], float]:
+    # requisições disparadas no ritmo da taxa; mede só o middleware, com uma
+    # rota que responde na hora
+    async def enviar(mensagem):
+        pass
+
+    middleware = auth_jwt.MiddlewareAutenticacao(Response())
+
+    latencias = []
+    intervalo = 1 / taxa
+    inicio = time.perf_counter()
+    for i, token in enumerate(tokens):
+        atraso = inicio + i * intervalo - time.perf_counter()
+        if atraso > 0:
+            await asyncio.sleep(atraso)
+        escopo = montar_escopo(token)
+        comeco = time.perf_counter()
+        await middleware(escopo, None, enviar)
+        latencias.append(time.perf_counter() - comeco)
+    return latencias, len(tokens) / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=2000)
+    parser.add_argument("--requisicoes", type=int, default=50000)
+    parser.add_argument("--taxa", type=int, default=5000)
+    args = parser.parse_args()
+
+    usuarios = [
+        auth_jwt.criar_token(i, f"Usuário {i}", f"u{i}@email.com", 1)
+        for i in range(args.usuarios)
+    ]
+    # cada usuário navega várias páginas (e seus arquivos estáticos)
+    aleatorio = random.Random(42)
+    tokens = [aleatorio.choice(usuarios) for _ in range(args.requisicoes)]
+
+    sem_cache = medir_funcao(usuario_sem_cache, tokens)
+    auth_jwt.cache_tokens.invalidar()
+    com_cache = medir_funcao(auth_jwt.obter_usuario_do_token, tokens)
+    print(
+        f"token -> usuário: sem cache {sem_cache * 1e6:.1f} µs, "
+        f"com cache {com_cache * 1e6:.1f} µs "
+        f"(a {args.taxa}/s: {sem_cache * args.taxa * 100:.1f}% e "
+        f"{com_cache * args.taxa * 100:.1f}% de um núcleo)"
+    )
+
+    original = auth_jwt.obter_usuario_do_token
+    for nome in ("sem cache", "com cache"):
+        auth_jwt.cache_tokens.invalidar()
+        auth_jwt.obter_usuario_do_token = (
+            usuario_sem_cache if nome == "sem cache" else original
+        )
+        latencias, taxa = asyncio.run(medir_middleware(tokens, args.taxa))
+        latencias.sort()
+        print(
+            f"middleware {nome}: {taxa:.0f} req/s  "
+            f"média {statistics.mean(latencias) * 1e6:.1f} µs  "
+            f"p50 {latencias[len(latencias) // 2] * 1e6:.1f} µs  "
+            f"p99 {latencias[int(len(latencias) * 0.99)] * 1e6:.1f} µs"
+        )
+    auth_jwt.obter_usuario_do_token = original
+    print("cache:", auth_jwt.cache_tokens.estatisticas())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Mede a disputa pelo lock de escrita com cliques de aumentar/diminuir item
+no carrinho, gravando cada clique direto no banco (CarrinhoService) e
+acumulando-os no buffer do carrinho (util.buffer_carrinho). Vários
+processos, como workers do servidor, simulam clientes clicando ao mesmo
+tempo; ao final confere que as quantidades gravadas batem com os cliques.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.buffer_carrinho --processos 4 --clientes 200 --cliques 50
+
+O dados.db é copiado para um diretório temporário; o original não é
+alterado. Sai com código 1 se alguma quantidade não conferir.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+QUANTIDADE_INICIAL = 100
+
+
+def preparar_banco(clientes: int) -> tuple[str, list[int], list[int]]:
+    diretorio = tempfile.mkdtemp(prefix="benchmark_buffer_carrinho_")
+    arquivo = os.path.join(diretorio, "dados.db")
+    shutil.copy2("dados.db", arquivo)
+    os.environ["DB_ARQUIVO"] = arquivo
+    from util.database import fechar_pool
+    from util.migracoes import executar_migracoes
+
+    executar_migracoes()
+    fechar_pool()
+    conexao = sqlite3.connect(arquivo)
+    with conexao:
+        produtos = [t[0] for t in conexao.execute("SELECT id FROM produto LIMIT 3")]
+        ids = []
+        for i in range(clientes):
+            cursor = conexao.execute(
+                "INSERT INTO usuario(nome, cpf, data_nascimento, endereco, telefone, "
+                "email, perfil, senha) VALUES (?, ?, '2000-01-01', 'x', ?, ?, 1, 'x')",
+                (f"Cliente {i}", f"bc{i}", f"bt{i}", f"bc{i}@email.com"),
+            )
+            ids.append(cursor.lastrowid)
+    conexao.close()
+    return arquivo, ids, produtos
+
+
+def preencher_carrinhos(clientes: list[int], produtos: list[int]):
+    from services.carrinho_service import CarrinhoService
+    from util.database import fechar_pool
+
+    for id_cliente in clientes:
+        for id_produto in produtos:
+            CarrinhoService.definir_quantidade(id_cliente, id_produto, QUANTIDADE_INICIAL)
+    fechar_pool()
+
+
+def trabalhar(argumentos: tuple) -> dict:
+    modo, clientes, produtos, cliques = argumentos
+    os.environ["CARRINHO_BUFFER"] = "1" if modo == "buffer" else "0"
+    from services.carrinho_service import CarrinhoService
+    from util.buffer_carrinho import (
+        alterar_quantidade,
+        buffer_carrinho,
+        iniciar_buffer_carrinho,
+        parar_buffer_carrinho,
+    )
+    from util.database import fechar_pool
+
+    latencias = []
+    variacoes: dict[tuple[int, int], int] = {}
+
+    async def clicar(id_cliente: int, aleatorio: random.Random):
+        for _ in range(cliques):
+            id_produto = aleatorio.choice(produtos)
+            variacao = 1 if aleatorio.random() < 0.6 else -1
+            inicio = time.perf_counter()
+            if modo == "buffer":
+                ok = await alterar_quantidade(id_cliente, id_produto, variacao)
+            elif variacao > 0:
+                ok = await CarrinhoService.aaumentar(id_cliente, id_produto)
+            else:
+                ok = await CarrinhoService.adiminuir(id_cliente, id_produto)
+            latencias.append(time.perf_counter() - inicio)
+            if ok:
+                chave = (id_cliente, id_produto)
+                variacoes[chave] = variacoes.get(chave, 0) + variacao
+            # intervalo entre cliques do mesmo cliente
+            await asyncio.sleep(aleatorio.uniform(0, 0.02))
+
+    async def simular():
+        await iniciar_buffer_carrinho()
+        aleatorio = random.Random(os.getpid())
+        await asyncio.gather(
+            *(clicar(id_cliente, random.Random(aleatorio.random())) for id_cliente in clientes)
+        )
+        await parar_buffer_carrinho()
+
+    inicio = time.perf_counter()
+    asyncio.run(simular())
+    decorrido = time.perf_counter() - inicio
+    fechar_pool()
+    gravacoes = buffer_carrinho.estatisticas()["gravacoes"] if modo == "buffer" else len(latencias)
+    return {
+        "latencias": latencias,
+        "variacoes": variacoes,
+        "transacoes": gravacoes,
+        "decorrido": decorrido,
+    }
+
+
+def conferir(arquivo: str, variacoes: dict[tuple[int, int], int]) -> bool:
+    conexao = sqlite3.connect(arquivo)
+    erros = 0
+    for (id_cliente, id_produto), variacao in variacoes.items():
+        quantidade = conexao.execute(
+            "SELECT quantidade FROM item_pedido i INNER JOIN pedido p "
+            "ON p.id = i.id_pedido WHERE p.id_cliente = ? AND p.estado = 'carrinho' "
+            "AND i.id_produto = ?",
+            (id_cliente, id_produto),
+        ).fetchone()[0]
+        erros += quantidade != QUANTIDADE_INICIAL + variacao
+    total = conexao.execute(
+        "SELECT COUNT(*) FROM pedido p WHERE estado = 'carrinho' AND valor_total <> ("
+        "SELECT ROUND(COALESCE(SUM(valor_item), 0), 2) FROM item_pedido "
+        "WHERE id_pedido = p.id)"
+    ).fetchone()[0]
+    conexao.close()
+    if erros or total:
+        print(f"  {erros} quantidades e {total} totais não conferem")
+    return not erros and not total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processos", type=int, default=4)
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--cliques", type=int, default=50)
+    args = parser.parse_args()
+
+    ok = True
+    for modo in ("direto", "buffer"):
+        arquivo, clientes, produtos = preparar_banco(args.clientes)
+        preencher_carrinhos(clientes, produtos)
+        fatias = [
+            (modo, clientes[i :: args.processos], produtos, args.cliques)
+            for i in range(args.processos)
+        ]
+        inicio = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(args.processos) as pool:
+            resultados = pool.map(trabalhar, fatias)
+        decorrido = time.perf_counter() - inicio
+        latencias = sorted(l for r in resultados for l in r["latencias"])
+        variacoes = {}
+        for resultado in resultados:
+            variacoes.update(resultado["variacoes"])
+        percentil = lambda p: latencias[int(p * (len(latencias) - 1))] * 1000
+        print(
+            f"{modo:7s} {len(latencias)} cliques em {decorrido:.2f}s "
+            f"({len(latencias) / decorrido:.0f}/s)  "
+            f"latência média {statistics.mean(latencias) * 1000:.2f} ms  "
+            f"p50 {percentil(0.5):.2f} ms  p99 {percentil(0.99):.2f} ms  "
+            f"máx {latencias[-1] * 1000:.1f} ms  "
+            f"transações de escrita {sum(r['transacoes'] for r in resultados)}"
+        )
+        ok = conferir(arquivo, variacoes) and ok
+    print("resultado:", "OK" if ok else "FALHOU")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Compara o fluxo antigo de "adicionar ao carrinho" (várias leituras e
+escritas pelos repositórios, com o total recalculado em Python) com o
+CarrinhoService (UPSERT em uma transação), em sequência e com cliques
+duplos simultâneos do mesmo cliente.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.carrinho --operacoes 2000 --threads 8
+
+O dados.db é copiado para um diretório temporário; o original não é
+alterado.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+def preparar_banco() -> str:
+    diretorio = tempfile.mkdtemp(prefix="benchmark_carrinho_")
+    arquivo = os.path.join(diretorio, "dados.db")
+    shutil.copy2("dados.db", arquivo)
+    return arquivo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--operacoes", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    os.environ["DB_ARQUIVO"] = preparar_banco()
+    # importados só aqui para que DB_ARQUIVO já esteja definido
+    from models.item_pedido_model import ItemPedido
+    from models.pedido_model import EstadoPedido, Pedido
+    from repositories.item_pedido_repo import ItemPedidoRepo
+    from repositories.pedido_repo import PedidoRepo
+    from repositories.produto_repo import ProdutoRepo
+    from repositories.usuario_repo import UsuarioRepo
+    from services.carrinho_service import CarrinhoService
+    from util.database import obter_pool
+    from util.migracoes import executar_migracoes
+
+    executar_migracoes()
+    pool = obter_pool()
+    produtos = [p.id for p in ProdutoRepo.obter_todos()]
+    clientes = [u.id for u in UsuarioRepo.obter_todos_por_perfil(1)]
+
+    def fluxo_antigo(id_cliente: int, id_produto: int, conexao) -> bool:
+        # a sequência de chamadas de post_adicionar_carrinho antes do serviço
+        produto = ProdutoRepo.obter_um(id_produto, conexao=conexao)
+        pedidos = PedidoRepo.obter_por_estado(
+            id_cliente, EstadoPedido.CARRINHO.value, conexao=conexao
+        )
+        pedido = pedidos[0] if pedidos else None
+        usuario = UsuarioRepo.obter_por_id(id_cliente, conexao=conexao)
+        if pedido is None:
+            pedido = PedidoRepo.inserir(
+                Pedido(
+                    0,
+                    datetime.now(),
+                    0,
+                    usuario.endereco,
+                    EstadoPedido.CARRINHO.value,
+                    id_cliente,
+                ),
+                conexao=conexao,
+            )
+        qtde = ItemPedidoRepo.obter_quantidade_por_produto(
+            pedido.id, id_produto, conexao=conexao
+        )
+        if qtde == 0:
+            ItemPedidoRepo.inserir(
+                ItemPedido(pedido.id, id_produto, produto.nome, produto.preco, 1, 0),
+                conexao=conexao,
+            )
+        else:
+            ItemPedidoRepo.aumentar_quantidade_produto(
+                pedido.id, id_produto, conexao=conexao
+            )
+        # o total era recalculado relendo todos os itens do pedido; hoje é
+        # mantido por gatilhos, mas a releitura continua sendo medida aqui
+        ItemPedidoRepo.obter_por_pedido(pedido.id, conexao=conexao)
+        return True
+
+    def fluxo_servico(id_cliente: int, id_produto: int, conexao) -> bool:
+        return CarrinhoService.adicionar(id_cliente, id_produto, conexao=conexao) is not None
+
+    def executar(fluxo, id_cliente: int, id_produto: int) -> bool:
+        # como a unidade de trabalho da requisição: uma conexão, um commit
+        conexao = pool.obter()
+        try:
+            try:
+                ok = fluxo(id_cliente, id_produto, conexao)
+            except Exception:
+                ok = False
+            if ok and not conexao.falhou:
+                conexao.commit()
+                return True
+            return False
+        finally:
+            pool.devolver(conexao)
+
+    def limpar():
+        with pool.obter() as conexao:
+            conexao.execute("DELETE FROM item_pedido")
+            conexao.execute("DELETE FROM pedido")
+        pool.devolver(conexao)
+
+    def quantidade_total() -> int:
+        conexao = pool.obter()
+        try:
+            return conexao.execute(
+                "SELECT COALESCE(SUM(quantidade), 0) FROM item_pedido"
+            ).fetchone()[0]
+        finally:
+            pool.devolver(conexao)
+
+    for nome, fluxo in (("antigo", fluxo_antigo), ("serviço", fluxo_servico)):
+        limpar()
+        inicio = time.perf_counter()
+        for i in range(args.operacoes):
+            executar(fluxo, clientes[i % len(clientes)], produtos[i % len(produtos)])
+        decorrido = time.perf_counter() - inicio
+        print(
+            f"{nome:8s} sequencial: {args.operacoes / decorrido:8.0f} op/s  "
+            f"({decorrido * 1000 / args.operacoes:.3f} ms/op)"
+        )
+
+        # cliques duplos: todas as threads adicionam o mesmo produto ao
+        # carrinho do mesmo cliente ao mesmo tempo
+        limpar()
+        sucessos = 0
+        lock = threading.Lock()
+        barreira = threading.Barrier(args.threads)
+        rodadas = max(1, args.operacoes // (args.threads * 10))
+
+        def clicar():
+            nonlocal sucessos
+            for rodada in range(rodadas):
+                barreira.wait()
+                cliente = clientes[rodada % len(clientes)]
+                produto = produtos[rodada % len(produtos)]
+                if executar(fluxo, cliente, produto):
+                    with lock:
+                        sucessos += 1
+
+        threads = [threading.Thread(target=clicar) for _ in range(args.threads)]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        decorrido = time.perf_counter() - inicio
+        tentativas = rodadas * args.threads
+        print(
+            f"{nome:8s} concorrente: {tentativas / decorrido:7.0f} op/s  "
+            f"falhas={tentativas - sucessos}/{tentativas}  "
+            f"quantidade gravada={quantidade_total()} (esperado {sucessos})"
+        )
+
+
+if __name__ == "__main__":
+    main()
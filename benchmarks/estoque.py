@@ -0,0 +1,161 @@
+"""
+Teste de contenção da reserva de estoque: vários processos disputam o
+mesmo produto, de estoque limitado, reservando, confirmando e cancelando
+pedidos ao mesmo tempo. Ao final confere que o estoque nunca ficou
+negativo e que tudo que saiu do estoque está em uma reserva (nenhuma baixa
+parcial nem devolução em dobro), antes e depois da varredura de reservas
+expiradas.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.estoque --processos 8 --pedidos 2000 --estoque 500
+
+O dados.db é copiado para um diretório temporário; o original não é
+alterado. Sai com código 1 se alguma verificação falhar.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+
+def preparar_banco() -> str:
+    diretorio = tempfile.mkdtemp(prefix="benchmark_estoque_")
+    arquivo = os.path.join(diretorio, "dados.db")
+    shutil.copy2("dados.db", arquivo)
+    return arquivo
+
+
+def criar_pedidos(arquivo: str, quantidade: int, estoque: int) -> list[int]:
+    # metade dos pedidos leva só o produto disputado; a outra metade leva
+    # também um segundo produto, para exercitar a reserva "tudo ou nada"
+    conexao = sqlite3.connect(arquivo)
+    with conexao:
+        produtos = [t[0] for t in conexao.execute("SELECT id FROM produto LIMIT 2")]
+        conexao.execute("UPDATE produto SET estoque = ? WHERE id = ?", (estoque, produtos[0]))
+        conexao.execute(
+            "UPDATE produto SET estoque = ? WHERE id = ?", (estoque // 2, produtos[1])
+        )
+        conexao.execute("DELETE FROM reserva_estoque")
+        pedidos = []
+        aleatorio = random.Random(42)
+        for i in range(quantidade):
+            cursor = conexao.execute(
+                "INSERT INTO pedido(data_hora, valor_total, endereco_entrega, estado, id_cliente) "
+                "VALUES (unixepoch() * 1000, 0, '', 'pendente', 1)"
+            )
+            itens = produtos if i % 2 else produtos[:1]
+            for id_produto in itens:
+                conexao.execute(
+                    "INSERT INTO item_pedido(id_pedido, id_produto, nome_produto, "
+                    "valor_produto, quantidade) VALUES (?, ?, 'x', 1, ?)",
+                    (cursor.lastrowid, id_produto, aleatorio.randint(1, 3)),
+                )
+            pedidos.append(cursor.lastrowid)
+    conexao.close()
+    return pedidos
+
+
+def trabalhar(pedidos: list[int]) -> dict:
+    from services.estoque_service import EstoqueService
+    from util.database import fechar_pool
+
+    aleatorio = random.Random(os.getpid())
+    contagem = {"reservados": 0, "recusados": 0, "confirmados": 0, "cancelados": 0}
+    for id_pedido in pedidos:
+        if not EstoqueService.reservar(id_pedido):
+            contagem["recusados"] += 1
+            continue
+        contagem["reservados"] += 1
+        sorteio = aleatorio.random()
+        if sorteio < 0.3:
+            EstoqueService.liberar(id_pedido)
+            contagem["cancelados"] += 1
+        elif sorteio < 0.6:
+            EstoqueService.confirmar(id_pedido)
+            contagem["confirmados"] += 1
+    fechar_pool()
+    return contagem
+
+
+def verificar(arquivo: str, estoques_iniciais: dict[int, int]) -> bool:
+    conexao = sqlite3.connect(arquivo)
+    ok = True
+    for id_produto, inicial in estoques_iniciais.items():
+        atual = conexao.execute(
+            "SELECT estoque FROM produto WHERE id = ?", (id_produto,)
+        ).fetchone()[0]
+        reservado = conexao.execute(
+            "SELECT COALESCE(SUM(i.quantidade), 0) FROM reserva_estoque r "
+            "INNER JOIN item_pedido i ON i.id_pedido = r.id_pedido "
+            "WHERE i.id_produto = ?",
+            (id_produto,),
+        ).fetchone()[0]
+        situacao = "ok" if atual >= 0 and inicial - atual == reservado else "ERRO"
+        ok = ok and situacao == "ok"
+        print(
+            f"  produto {id_produto}: inicial={inicial} atual={atual} "
+            f"baixado={inicial - atual} em reservas={reservado}  {situacao}"
+        )
+    conexao.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processos", type=int, default=8)
+    parser.add_argument("--pedidos", type=int, default=2000)
+    parser.add_argument("--estoque", type=int, default=500)
+    args = parser.parse_args()
+
+    arquivo = preparar_banco()
+    os.environ["DB_ARQUIVO"] = arquivo
+    from util.migracoes import executar_migracoes
+    from util.database import fechar_pool
+
+    executar_migracoes()
+    fechar_pool()
+    pedidos = criar_pedidos(arquivo, args.pedidos, args.estoque)
+    conexao = sqlite3.connect(arquivo)
+    estoques_iniciais = dict(
+        conexao.execute(
+            "SELECT DISTINCT p.id, p.estoque FROM produto p "
+            "INNER JOIN item_pedido i ON i.id_produto = p.id "
+            "WHERE i.id_pedido BETWEEN ? AND ?",
+            (pedidos[0], pedidos[-1]),
+        )
+    )
+    conexao.close()
+
+    random.Random(7).shuffle(pedidos)
+    fatias = [pedidos[i :: args.processos] for i in range(args.processos)]
+    inicio = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(args.processos) as pool:
+        resultados = pool.map(trabalhar, fatias)
+    decorrido = time.perf_counter() - inicio
+    total = {chave: sum(r[chave] for r in resultados) for chave in resultados[0]}
+    print(
+        f"{args.processos} processos, {len(pedidos)} pedidos em {decorrido:.2f}s "
+        f"({len(pedidos) / decorrido:.0f} reservas/s): "
+        + ", ".join(f"{chave}={valor}" for chave, valor in total.items())
+    )
+    ok = verificar(arquivo, estoques_iniciais)
+
+    # todas as reservas ainda pendentes vencem: só as confirmadas ficam
+    from services.estoque_service import EstoqueService
+
+    liberadas = EstoqueService.liberar_expiradas(agora=int(time.time()) + 10**9)
+    print(f"varredura: {liberadas} reservas expiradas liberadas")
+    ok = verificar(arquivo, estoques_iniciais) and ok
+    fechar_pool()
+    print("resultado:", "OK" if ok else "FALHOU")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Mede a latência (p50/p95/p99) das rotas públicas da loja sob carga
+concorrente mista: muitas requisições baratas (/produto/{id}) disputando
+o mesmo worker com buscas caras (/buscar, LIKE em toda a tabela produto).
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.latencia_rotas --produtos 200000 --concorrencia 50
+
+Com --produtos, o dados.db é copiado para um diretório temporário e
+recebe produtos sintéticos; o banco original não é alterado. Com --url,
+a carga é enviada para um servidor uvicorn já em execução.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import httpx
+
+
+def preparar_banco(quantidade_produtos: int) -> str:
+    diretorio = tempfile.mkdtemp(prefix="benchmark_loja_")
+    arquivo = os.path.join(diretorio, "dados.db")
+    shutil.copy2("dados.db", arquivo)
+    with sqlite3.connect(arquivo) as conexao:
+        conexao.executemany(
+            "INSERT INTO produto(id_categoria, nome, preco, descricao, estoque) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    (i % 10) + 1,
+                    f"Produto sintético {i:07d}",
+                    round(random.uniform(10, 5000), 2),
+                    f"Descrição do produto sintético número {i} para testes de carga.",
+                    100,
+                )
+                for i in range(quantidade_produtos)
+            ),
+        )
+    return arquivo
+
+
+def percentis(latencias: list[float]) -> str:
+    if len(latencias) < 2:
+        return f"n={len(latencias)}"
+    cortes = statistics.quantiles(latencias, n=100, method="inclusive")
+    return (
+        f"n={len(latencias):6d}  p50={cortes[49]:8.1f}ms  "
+        f"p95={cortes[94]:8.1f}ms  p99={cortes[98]:8.1f}ms  "
+        f"max={max(latencias):8.1f}ms"
+    )
+
+
+async def executar_carga(
+    cliente: httpx.AsyncClient,
+    concorrencia: int,
+    duracao: float,
+    proporcao_busca: float,
+    maior_id: int,
+) -> dict[str, list[float]]:
+    latencias: dict[str, list[float]] = {"produto": [], "buscar": []}
+    # termos seletivos: a busca percorre toda a tabela, mas a página
+    # renderizada continua pequena
+    termos = ["Apple", "Geração", "00042", "xyz"]
+    fim = time.perf_counter() + duracao
+
+    async def trabalhador():
+        while time.perf_counter() < fim:
+            if random.random() < proporcao_busca:
+                rota = "buscar"
+                url = f"/buscar?q={random.choice(termos)}&p={random.randint(1, 5)}"
+            else:
+                rota = "produto"
+                url = f"/produto/{random.randint(1, maior_id)}"
+            inicio = time.perf_counter()
+            resposta = await cliente.get(url)
+            latencias[rota].append((time.perf_counter() - inicio) * 1000)
+            if resposta.status_code >= 500:
+                print(f"Erro {resposta.status_code} em {url}")
+
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return latencias
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="servidor já em execução (ex.: http://localhost:8000)")
+    parser.add_argument("--produtos", type=int, default=0, help="produtos sintéticos a inserir")
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos de carga")
+    parser.add_argument("--proporcao-busca", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.url:
+        cliente = httpx.AsyncClient(base_url=args.url, timeout=60)
+        maior_id = 12
+    else:
+        if args.produtos:
+            os.environ["DB_ARQUIVO"] = preparar_banco(args.produtos)
+        # importado só aqui para que DB_ARQUIVO já esteja definido
+        import main as aplicacao
+
+        cliente = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=aplicacao.app),
+            base_url="http://benchmark",
+            timeout=60,
+        )
+        maior_id = 12 + args.produtos
+
+    async with cliente:
+        latencias = await executar_carga(
+            cliente, args.concorrencia, args.duracao, args.proporcao_busca, maior_id
+        )
+    todas = latencias["produto"] + latencias["buscar"]
+    print(f"concorrência={args.concorrencia} duração={args.duracao}s produtos extras={args.produtos}")
+    print(f"  /produto  {percentis(latencias['produto'])}")
+    print(f"  /buscar   {percentis(latencias['buscar'])}")
+    print(f"  total     {percentis(todas)}  ({len(todas) / args.duracao:.0f} req/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
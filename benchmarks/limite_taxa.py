@@ -0,0 +1,136 @@
+"""
+Mede o limite de taxa (util.limite_taxa): custo por requisição do balde
+em memória e do middleware nas rotas sem política, memória por chave,
+despejo das chaves ociosas e, com vários processos disputando a mesma
+chave, quantas requisições cada backend deixa passar (em memória cada
+worker tem o próprio balde; no SQLite o balde é um só).
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.limite_taxa --chaves 100000 --processos 4 --duracao 3
+
+O arquivo SQLite dos baldes é criado em um diretório temporário.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+from util.limite_taxa import (
+    BaldesMemoria,
+    BaldesSqlite,
+    MiddlewareLimiteTaxa,
+    PoliticaLimite,
+)
+
+POLITICA = PoliticaLimite("benchmark", 10, 1)
+
+
+async def medir_consumo(chaves: int) -> float:
+    baldes = BaldesMemoria(chaves)
+    identidades = [f"ip:10.0.{i // 256}.{i % 256}" for i in range(1000)]
+    inicio = time.perf_counter()
+    for i in range(chaves):
+        await baldes.consumir((POLITICA.nome, identidades[i % 1000]), POLITICA)
+    return (time.perf_counter() - inicio) / chaves
+
+
+async def medir_middleware(requisicoes: int) -> float:
+    async def aplicacao(scope, receive, send):
+        pass
+
+    middleware = MiddlewareLimiteTaxa(aplicacao)
+    escopo = {"type": "http", "method": "GET", "path": "/produto/1"}
+    inicio = time.perf_counter()
+    for _ in range(requisicoes):
+        await middleware(escopo, None, None)
+    return (time.perf_counter() - inicio) / requisicoes
+
+
+async def medir_memoria(chaves: int) -> tuple[float, int]:
+    # período longo, para que nenhuma chave seja despejada durante a medição
+    politica = PoliticaLimite("memoria", 10, 3600)
+    baldes = BaldesMemoria(chaves)
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    for i in range(chaves):
+        identidade = f"ip:10.{i // 65536}.{i // 256 % 256}.{i % 256}"
+        await baldes.consumir((politica.nome, identidade), politica)
+    depois = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (depois - antes) / chaves, baldes.estatisticas()["chaves"]
+
+
+async def medir_despejo(chaves: int) -> list[int]:
+    # política que enche em 0,2 s: depois da pausa, as chaves da primeira
+    # leva estão ociosas e saem à medida que chaves novas chegam
+    politica = PoliticaLimite("despejo", 2, 0.2)
+    baldes = BaldesMemoria(chaves * 10)
+    tamanhos = []
+    for leva in range(3):
+        for i in range(chaves):
+            await baldes.consumir((politica.nome, f"{leva}:{i}"), politica)
+        tamanhos.append(baldes.estatisticas()["chaves"])
+        await asyncio.sleep(0.3)
+    return tamanhos
+
+
+async def medir_sqlite(arquivo: str, consumos: int) -> float:
+    baldes = BaldesSqlite(arquivo, POLITICA.periodo)
+    inicio = time.perf_counter()
+    for i in range(consumos):
+        await baldes.consumir((POLITICA.nome, f"ip:{i % 500}"), POLITICA)
+    return (time.perf_counter() - inicio) / consumos
+
+
+def disputar(argumentos: tuple) -> int:
+    backend, arquivo, duracao = argumentos
+    baldes = BaldesSqlite(arquivo, POLITICA.periodo) if backend == "sqlite" else BaldesMemoria()
+
+    async def executar() -> int:
+        aceitas = 0
+        fim = time.monotonic() + duracao
+        while time.monotonic() < fim:
+            if not await baldes.consumir((POLITICA.nome, "ip:203.0.113.7"), POLITICA):
+                aceitas += 1
+            await asyncio.sleep(0.001)
+        return aceitas
+
+    return asyncio.run(executar())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chaves", type=int, default=100000)
+    parser.add_argument("--processos", type=int, default=4)
+    parser.add_argument("--duracao", type=float, default=3.0)
+    args = parser.parse_args()
+
+    consumo = asyncio.run(medir_consumo(args.chaves))
+    middleware = asyncio.run(medir_middleware(args.chaves))
+    memoria, guardadas = asyncio.run(medir_memoria(args.chaves))
+    despejo = asyncio.run(medir_despejo(args.chaves // 10))
+    print(f"balde em memória: {consumo * 1e6:.2f} µs por consumo")
+    print(f"middleware em rota sem política: {middleware * 1e6:.2f} µs por requisição")
+    print(f"memória: {memoria:.0f} bytes por chave ({guardadas} chaves)")
+    print(f"chaves após cada leva de {args.chaves // 10} chaves novas: {despejo}")
+
+    arquivo = os.path.join(tempfile.mkdtemp(prefix="benchmark_limite_taxa_"), "limite.db")
+    esperado = POLITICA.capacidade + POLITICA.taxa * args.duracao
+    for backend in ("memoria", "sqlite"):
+        with multiprocessing.get_context("spawn").Pool(args.processos) as pool:
+            aceitas = pool.map(disputar, [(backend, arquivo, args.duracao)] * args.processos)
+        print(
+            f"{backend:7s} {args.processos} processos, mesma chave, {args.duracao:.0f}s: "
+            f"{sum(aceitas)} aceitas (limite de um balde: ~{esperado:.0f})"
+        )
+    consumos = asyncio.run(medir_sqlite(arquivo, 2000))
+    print(f"balde no SQLite: {consumos * 1e6:.0f} µs por consumo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Mede a latência da navegação no catálogo (/produto/{id}) enquanto uma
+rajada de logins (/post_entrar, bcrypt) acontece no mesmo worker: com o
+bcrypt chamado direto no handler (como antes) e pelo pool de senhas
+(util.senhas). Cada modo roda primeiro sem logins, como referência.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.login_carga --navegacao 20 --logins 8 --duracao 10
+
+A aplicação roda no próprio processo (um worker); o dados.db é copiado
+para um diretório temporário e o original não é alterado.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import bcrypt
+import httpx
+
+EMAIL = "joao@email.com"
+SENHA = "123@Abc"
+
+
+def preparar_banco() -> str:
+    diretorio = tempfile.mkdtemp(prefix="benchmark_login_")
+    arquivo = os.path.join(diretorio, "dados.db")
+    shutil.copy2("dados.db", arquivo)
+    return arquivo
+
+
+def percentis(latencias: list[float]) -> str:
+    if len(latencias) < 2:
+        return f"n={len(latencias)}"
+    cortes = statistics.quantiles(latencias, n=100, method="inclusive")
+    return (
+        f"n={len(latencias):6d}  p50={cortes[49]:7.1f}ms  "
+        f"p95={cortes[94]:7.1f}ms  p99={cortes[98]:7.1f}ms  "
+        f"max={max(latencias):7.1f}ms"
+    )
+
+
+async def executar_carga(
+    cliente: httpx.AsyncClient, navegacao: int, logins: int, duracao: float
+) -> tuple[list[float], list[float], dict[int, int]]:
+    latencias: list[float] = []
+    latencias_login: list[float] = []
+    respostas_login: dict[int, int] = {}
+    fim = time.perf_counter() + duracao
+
+    async def navegar():
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            await cliente.get(f"/produto/{random.randint(1, 12)}")
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    async def entrar():
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            resposta = await cliente.post(
+                "/post_entrar",
+                json={"email": EMAIL, "senha": SENHA, "return_url": "/"},
+            )
+            codigo = resposta.status_code
+            if codigo == 200:
+                latencias_login.append((time.perf_counter() - inicio) * 1000)
+            respostas_login[codigo] = respostas_login.get(codigo, 0) + 1
+            if codigo == 503:
+                await asyncio.sleep(float(resposta.headers.get("retry-after", "1")))
+
+    await asyncio.gather(
+        *(navegar() for _ in range(navegacao)), *(entrar() for _ in range(logins))
+    )
+    return latencias, latencias_login, respostas_login
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--navegacao", type=int, default=20, help="clientes navegando")
+    parser.add_argument("--logins", type=int, default=8, help="clientes entrando")
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por fase")
+    args = parser.parse_args()
+
+    arquivo = preparar_banco()
+    os.environ["DB_ARQUIVO"] = arquivo
+    # todos os logins vêm do mesmo IP: sem o limite de taxa de /post_entrar
+    os.environ["LIMITE_TAXA"] = "0"
+    # importados só aqui para que DB_ARQUIVO já esteja definido
+    import main as aplicacao
+    from routes import main_routes
+    from util import senhas
+    from util.auth_jwt import conferir_senha
+
+    # hash com o custo padrão do cadastro (gensalt), não o do banco de exemplo
+    with sqlite3.connect(arquivo) as conexao:
+        conexao.execute(
+            "UPDATE usuario SET senha = ? WHERE email = ?",
+            (bcrypt.hashpw(SENHA.encode(), bcrypt.gensalt()).decode(), EMAIL),
+        )
+
+    async def conferir_no_event_loop(senha: str, hash_senha: str) -> bool:
+        return conferir_senha(senha, hash_senha)
+
+    cliente = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=aplicacao.app),
+        base_url="http://benchmark",
+        timeout=120,
+    )
+    async with cliente:
+        for modo, conferir in (
+            ("no handler", conferir_no_event_loop),
+            ("pool de senhas", senhas.aconferir_senha),
+        ):
+            main_routes.aconferir_senha = conferir
+            for logins in (0, args.logins):
+                latencias, latencias_login, respostas = await executar_carga(
+                    cliente, args.navegacao, logins, args.duracao
+                )
+                print(f"{modo:15s} logins={logins:3d}  /produto {percentis(latencias)}")
+                if respostas:
+                    print(f"{'':25s}/post_entrar {percentis(latencias_login)}")
+                    print(f"{'':25s}respostas: {respostas}")
+    main_routes.aconferir_senha = senhas.aconferir_senha
+    print("pool de senhas:", senhas.pool_senhas.estatisticas())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
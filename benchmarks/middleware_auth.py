@@ -0,0 +1,174 @@
+"""
+Mede o custo de despacho da autenticação por requisição: o middleware
+anterior (BaseHTTPMiddleware com call_next, que envolvia todas as
+requisições) com a checagem de autorização por prefixo, e o middleware
+ASGI atual (MiddlewareAutenticacao) com a tabela de políticas de rota.
+Cada cenário é comparado com a mesma aplicação sem autenticação nenhuma;
+a diferença é o custo por requisição.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.middleware_auth --requisicoes 5000
+
+As rotas são mínimas (não usam o banco) e os arquivos estáticos são os de
+static/; as requisições são feitas direto na interface ASGI, sem rede.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("JWT_SECRET", "segredo-de-benchmark-com-mais-de-32-bytes")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+import jwt
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.staticfiles import StaticFiles
+
+from util import auth_jwt
+from util.cookies import NOME_COOKIE_AUTH
+
+ARQUIVO_ESTATICO = "/static/css/estilos.css"
+
+
+async def checar_autenticacao_anterior(request: Request, call_next):
+    # o middleware antes da tabela de políticas (já com o cache de tokens)
+    try:
+        usuario = await auth_jwt.obter_usuario_logado(request)
+        request.state.usuario = usuario
+        response = await call_next(request)
+        if response.status_code == status.HTTP_307_TEMPORARY_REDIRECT:
+            return response
+        return response
+    except jwt.ExpiredSignatureError:
+        return JSONResponse({"message": "Token expirado"})
+    except jwt.InvalidTokenError:
+        return JSONResponse({"message": "Token inválido"})
+    except Exception as e:
+        return JSONResponse({"message": f"Erro: {e}"})
+
+
+async def checar_autorizacao_anterior(request: Request):
+    usuario = request.state.usuario if hasattr(request.state, "usuario") else None
+    area_do_cliente = request.url.path.startswith("/cliente")
+    area_do_admin = request.url.path.startswith("/admin")
+    if (area_do_cliente or area_do_admin) and not usuario:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    if (area_do_cliente and usuario.perfil != 1) or (
+        area_do_admin and usuario.perfil != 0
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+
+def montar_app(modo: str) -> FastAPI:
+    dependencias = {
+        "sem autenticação": [],
+        "anterior": [Depends(checar_autorizacao_anterior)],
+        "atual": [Depends(auth_jwt.checar_autorizacao)],
+    }[modo]
+    app = FastAPI(dependencies=dependencias)
+    app.mount(path="/static", app=StaticFiles(directory="static"), name="static")
+    if modo == "anterior":
+        app.middleware("http")(checar_autenticacao_anterior)
+    elif modo == "atual":
+        app.add_middleware(auth_jwt.MiddlewareAutenticacao)
+
+    @app.get("/produto/{id:int}")
+    async def get_produto(request: Request, id: int):
+        return PlainTextResponse(f"produto {id}")
+
+    @app.get("/cliente/pedidos")
+    async def get_pedidos(request: Request):
+        return PlainTextResponse("pedidos")
+
+    return app
+
+
+def montar_escopo(caminho: str, token: str) -> dict:
+    headers = [(b"host", b"benchmark")]
+    if token:
+        headers.append((b"cookie", f"{NOME_COOKIE_AUTH}={token}".encode()))
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("benchmark", 80),
+        "path": caminho,
+        "raw_path": caminho.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+    }
+
+
+async def medir(app: FastAPI, caminho: str, token: str, requisicoes: int) -> float:
+    codigos = set()
+    desconexao = asyncio.Event()
+
+    def montar_receber():
+        # como um servidor: o corpo (vazio) e depois nada até a desconexão
+        mensagens = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receber():
+            if mensagens:
+                return mensagens.pop()
+            await desconexao.wait()
+            return {"type": "http.disconnect"}
+
+        return receber
+
+    async def enviar(mensagem):
+        if mensagem["type"] == "http.response.start":
+            codigos.add(mensagem["status"])
+
+    # aquece (rotas, arquivos estáticos e cache de tokens)
+    for _ in range(50):
+        await app(montar_escopo(caminho, token), montar_receber(), enviar)
+    tempos = []
+    for _ in range(5):
+        inicio = time.perf_counter()
+        for _ in range(requisicoes):
+            await app(montar_escopo(caminho, token), montar_receber(), enviar)
+        tempos.append((time.perf_counter() - inicio) / requisicoes)
+    if codigos != {200}:
+        raise SystemExit(f"{caminho}: respostas inesperadas {codigos}")
+    return statistics.median(tempos)
+
+
+async def executar(requisicoes: int):
+    token = auth_jwt.criar_token(1, "Cliente", "cliente@email.com", 1)
+    cenarios = [
+        ("estático, anônimo", ARQUIVO_ESTATICO, ""),
+        ("estático, logado", ARQUIVO_ESTATICO, token),
+        ("página, anônimo", "/produto/1", ""),
+        ("página, logado", "/produto/1", token),
+        ("área do cliente", "/cliente/pedidos", token),
+    ]
+    apps = {modo: montar_app(modo) for modo in ("sem autenticação", "anterior", "atual")}
+    print(f"{'':20s} {'sem auth':>10s} {'anterior':>18s} {'atual':>18s}")
+    for nome, caminho, token_cenario in cenarios:
+        tempos = {}
+        for modo, app in apps.items():
+            tempos[modo] = await medir(app, caminho, token_cenario, requisicoes)
+        base = tempos["sem autenticação"]
+        print(
+            f"{nome:20s} {base * 1e6:8.1f}µs "
+            f"{tempos['anterior'] * 1e6:8.1f}µs ({(tempos['anterior'] - base) * 1e6:+6.1f}) "
+            f"{tempos['atual'] * 1e6:8.1f}µs ({(tempos['atual'] - base) * 1e6:+6.1f})"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requisicoes", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(executar(args.requisicoes))
+
+
+if __name__ == "__main__":
+    main()
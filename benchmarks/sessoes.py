@@ -0,0 +1,226 @@
+"""
+Mede a autenticação por cookie (util.auth_cookie) antes e depois do
+armazenamento de sessões: a forma anterior procurava o usuário pela coluna
+token (sem índice) a cada requisição e regravava o cookie em toda
+resposta; a atual lê a sessão pelo hash do token, com um cache em memória
+na frente. Conta as leituras do banco e os cookies regravados por
+requisição, e confere que o logout encerra a sessão.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.sessoes --usuarios 5000 --requisicoes 20000
+
+O dados.db é copiado para um diretório temporário; o original não é
+alterado.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import secrets
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.responses import PlainTextResponse
+
+
+def preparar_banco(usuarios: int) -> str:
+    diretorio = tempfile.mkdtemp(prefix="benchmark_sessoes_")
+    arquivo = os.path.join(diretorio, "dados.db")
+    shutil.copy2("dados.db", arquivo)
+    os.environ["DB_ARQUIVO"] = arquivo
+    from util.database import fechar_pool
+    from util.migracoes import executar_migracoes
+
+    executar_migracoes()
+    fechar_pool()
+    with sqlite3.connect(arquivo) as conexao:
+        conexao.executemany(
+            "INSERT INTO usuario(nome, cpf, data_nascimento, endereco, telefone, "
+            "email, perfil, senha, token) VALUES (?, ?, '2000-01-01', 'x', ?, ?, 1, 'x', ?)",
+            (
+                (f"Cliente {i}", f"se{i}", f"st{i}", f"se{i}@email.com", secrets.token_hex(32))
+                for i in range(usuarios)
+            ),
+        )
+    return arquivo
+
+
+def montar_app(modo: str) -> FastAPI:
+    from repositories.usuario_repo import UsuarioRepo
+    from util import auth_cookie
+    from util.cookies import NOME_COOKIE_AUTH, adicionar_cookie_auth
+
+    async def checar_autenticacao_anterior(request: Request, call_next):
+        # o middleware antes das sessões
+        token = request.cookies.get(NOME_COOKIE_AUTH, "")
+        usuario = await UsuarioRepo.aobter_por_token(token) if token.strip() else None
+        request.state.usuario = usuario
+        response = await call_next(request)
+        if response.status_code == status.HTTP_303_SEE_OTHER:
+            return response
+        if usuario:
+            adicionar_cookie_auth(response, token)
+        return response
+
+    app = FastAPI(dependencies=[Depends(auth_cookie.checar_autorizacao)])
+    if modo == "anterior":
+        app.middleware("http")(checar_autenticacao_anterior)
+    else:
+        app.add_middleware(auth_cookie.MiddlewareAutenticacao)
+
+    @app.get("/cliente/pedidos")
+    async def get_pedidos(request: Request):
+        return PlainTextResponse(request.state.usuario.nome)
+
+    return app
+
+
+def montar_escopo(token: str) -> dict:
+    from util.cookies import NOME_COOKIE_AUTH
+
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("benchmark", 80),
+        "path": "/cliente/pedidos",
+        "raw_path": b"/cliente/pedidos",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"cookie", f"{NOME_COOKIE_AUTH}={token}".encode()),
+        ],
+    }
+
+
+class Contador:
+    def __init__(self, objeto, nome: str):
+        self.chamadas = 0
+        original = getattr(objeto, nome)
+
+        async def contar(*args, **kwargs):
+            self.chamadas += 1
+            return await original(*args, **kwargs)
+
+        setattr(objeto, nome, contar)
+
+
+async def requisitar(app: FastAPI, token: str) -> tuple[int, int]:
+    # devolve (status, cookies de autenticação regravados)
+    from util.cookies import NOME_COOKIE_AUTH
+
+    resposta = {"status": 0, "cookies": 0}
+    prefixo = f"{NOME_COOKIE_AUTH}=".encode()
+    desconexao = asyncio.Event()
+    mensagens = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receber():
+        if mensagens:
+            return mensagens.pop()
+        await desconexao.wait()
+        return {"type": "http.disconnect"}
+
+    async def enviar(mensagem):
+        if mensagem["type"] == "http.response.start":
+            resposta["status"] = mensagem["status"]
+            resposta["cookies"] = sum(
+                nome == b"set-cookie" and valor.startswith(prefixo)
+                for nome, valor in mensagem["headers"]
+            )
+
+    await app(montar_escopo(token), receber, enviar)
+    return resposta["status"], resposta["cookies"]
+
+
+async def medir(app: FastAPI, tokens: list[str], leituras: Contador) -> dict:
+    inicio_leituras = leituras.chamadas
+    latencias = []
+    cookies = 0
+    for token in tokens:
+        inicio = time.perf_counter()
+        codigo, regravados = await requisitar(app, token)
+        latencias.append(time.perf_counter() - inicio)
+        if codigo != 200:
+            raise SystemExit(f"resposta inesperada: {codigo}")
+        cookies += regravados
+    latencias.sort()
+    return {
+        "media": statistics.mean(latencias) * 1e6,
+        "p99": latencias[int(len(latencias) * 0.99)] * 1e6,
+        "leituras": (leituras.chamadas - inicio_leituras) / len(tokens),
+        "cookies": cookies / len(tokens),
+    }
+
+
+async def executar(usuarios: int, requisicoes: int):
+    from repositories.sessao_repo import SessaoRepo
+    from repositories.usuario_repo import UsuarioRepo
+    from models.usuario_model import Usuario
+    from util.sessoes import armazenamento_sessoes
+
+    aleatorio = random.Random(42)
+    with sqlite3.connect(os.environ["DB_ARQUIVO"]) as conexao:
+        linhas = conexao.execute(
+            "SELECT id, nome, email, perfil, token FROM usuario WHERE token IS NOT NULL"
+        ).fetchall()
+    tokens_antigos = [linha[4] for linha in linhas]
+
+    tokens_sessao = [
+        await armazenamento_sessoes.criar(
+            Usuario(id=linha[0], nome=linha[1], email=linha[2], perfil=linha[3])
+        )
+        for linha in linhas
+    ]
+    # as sessões recém-criadas ficam no cache; começa frio, como após um
+    # reinício do servidor
+    armazenamento_sessoes.cache.invalidar()
+    sorteio = [aleatorio.randrange(len(linhas)) for _ in range(requisicoes)]
+
+    leituras_antigas = Contador(UsuarioRepo, "aobter_por_token")
+    leituras_sessao = Contador(SessaoRepo, "aobter")
+    resultados = {
+        "anterior": await medir(
+            montar_app("anterior"), [tokens_antigos[i] for i in sorteio], leituras_antigas
+        ),
+        "sessões": await medir(
+            montar_app("sessões"), [tokens_sessao[i] for i in sorteio], leituras_sessao
+        ),
+    }
+    for nome, r in resultados.items():
+        print(
+            f"{nome:9s} média {r['media']:8.1f} µs  p99 {r['p99']:8.1f} µs  "
+            f"leituras do banco/req {r['leituras']:.3f}  cookies regravados/req "
+            f"{r['cookies']:.3f}"
+        )
+    app = montar_app("sessões")
+    segunda = await medir(app, [tokens_sessao[i] for i in sorteio[:2000]], leituras_sessao)
+    print(f"sessões, cache aquecido: leituras do banco/req {segunda['leituras']:.3f}")
+
+    # logout: a sessão deixa de valer já na requisição seguinte
+    token = tokens_sessao[sorteio[0]]
+    await armazenamento_sessoes.encerrar(token)
+    codigo, _ = await requisitar(app, token)
+    print("após o logout:", "recusada (401)" if codigo == 401 else codigo)
+    print("cache:", armazenamento_sessoes.estatisticas())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=5000)
+    parser.add_argument("--requisicoes", type=int, default=20000)
+    args = parser.parse_args()
+    preparar_banco(args.usuarios)
+    asyncio.run(executar(args.usuarios, args.requisicoes))
+
+
+if __name__ == "__main__":
+    main()
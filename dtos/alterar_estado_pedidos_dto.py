@@ -0,0 +1,20 @@
+from pydantic import BaseModel, field_validator
+
+from models.pedido_model import EstadoPedido
+from util.validators import is_greater_than, is_in_range
+
+MAXIMO_PEDIDOS_POR_LOTE = 1000
+
+
+class AlterarEstadoPedidosDto(BaseModel):
+    ids: list[int]
+    estado: EstadoPedido
+
+    @field_validator("ids")
+    def validar_ids(cls, v):
+        msg = is_in_range(len(v), "Ids", 1, MAXIMO_PEDIDOS_POR_LOTE)
+        if msg: raise ValueError(msg)
+        for id in v:
+            msg = is_greater_than(id, "Ids", 0)
+            if msg: raise ValueError(msg)
+        return v
@@ -0,0 +1,51 @@
+from pydantic import BaseModel, field_validator
+
+from util.validators import *
+
+
+class ImportarUsuarioDto(BaseModel):
+    nome: str
+    cpf: str
+    data_nascimento: str
+    endereco: str = ""
+    telefone: str
+    email: str
+    perfil: int = 1
+    # hash bcrypt já calculado ou senha em texto, que recebe hash na importação
+    senha: str
+
+    @field_validator("nome")
+    def validar_nome(cls, v):
+        msg = is_size_between(v, "Nome", 2, 128)
+        if msg: raise ValueError(msg)
+        return v
+
+    @field_validator("cpf")
+    def validar_cpf(cls, v):
+        msg = is_cpf(v, "CPF")
+        if msg: raise ValueError(msg)
+        return v
+
+    @field_validator("data_nascimento")
+    def validar_data_nascimento(cls, v):
+        msg = is_date_valid(v, "Data de Nascimento")
+        if msg: raise ValueError(msg)
+        return v
+
+    @field_validator("email")
+    def validar_email(cls, v):
+        msg = is_email(v, "E-mail")
+        if msg: raise ValueError(msg)
+        return v
+
+    @field_validator("perfil")
+    def validar_perfil(cls, v):
+        msg = is_in_range(v, "Perfil", 0, 1)
+        if msg: raise ValueError(msg)
+        return v
+
+    @field_validator("senha")
+    def validar_senha(cls, v):
+        msg = is_not_empty(v, "Senha")
+        if msg: raise ValueError(msg)
+        return v
@@ -4,25 +4,23 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from repositories.categoria_repo import CategoriaRepo
 from repositories.usuario_repo import UsuarioRepo
-from repositories.item_pedido_repo import ItemPedidoRepo
-from repositories.pedido_repo import PedidoRepo
 from repositories.produto_repo import ProdutoRepo
 from routes import auth_routes, main_routes, cliente_routes, admin_routes
-from util.auth_jwt import (
-    checar_autorizacao,
-    checar_autenticacao,
-    configurar_swagger_auth,
-)
+from util import auth_cookie, auth_jwt
+from util.auth_jwt import checar_autorizacao, configurar_swagger_auth
+from util.limite_taxa import MiddlewareLimiteTaxa, limite_taxa_habilitado
+from util.buffer_carrinho import iniciar_buffer_carrinho, parar_buffer_carrinho
+from util.database import fechar_pool
+from util.senhas import pool_senhas
+from util.sessoes import autenticacao_por_cookie
 from util.exceptions import configurar_excecoes
+from util.migracoes import executar_migracoes
+from util.reservas import iniciar_varredura_reservas, parar_varredura_reservas
 
 load_dotenv()
-ProdutoRepo.criar_tabela()
+executar_migracoes()
 ProdutoRepo.inserir_produtos_json("sql/produtos.json")
-UsuarioRepo.criar_tabela()
 UsuarioRepo.inserir_usuarios_json("sql/usuarios.json")
-PedidoRepo.criar_tabela()
-ItemPedidoRepo.criar_tabela()
-CategoriaRepo.criar_tabela()
 CategoriaRepo.inserir_categorias_json("sql/categorias.json")
 
 
@@ -35,7 +33,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.mount(path="/static", app=StaticFiles(directory="static"), name="static")
-app.middleware("http")(checar_autenticacao)
+if limite_taxa_habilitado():
+    # adicionado antes: fica dentro da autenticação e enxerga o usuário
+    app.add_middleware(MiddlewareLimiteTaxa)
+app.add_middleware(
+    auth_cookie.MiddlewareAutenticacao
+    if autenticacao_por_cookie()
+    else auth_jwt.MiddlewareAutenticacao
+)
+app.add_event_handler("startup", iniciar_varredura_reservas)
+app.add_event_handler("startup", iniciar_buffer_carrinho)
+app.add_event_handler("shutdown", parar_varredura_reservas)
+app.add_event_handler("shutdown", parar_buffer_carrinho)
+app.add_event_handler("shutdown", pool_senhas.fechar)
+app.add_event_handler("shutdown", fechar_pool)
 configurar_excecoes(app)
 app.include_router(main_routes.router)
 app.include_router(cliente_routes.router)
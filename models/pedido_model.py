@@ -5,6 +5,7 @@ from typing import Optional
 
 from models.item_pedido_model import ItemPedido
 from models.usuario_model import Usuario
+from util.data_hora import de_epoch_ms
 
 
 class EstadoPedido(Enum):
@@ -18,6 +19,30 @@ class EstadoPedido(Enum):
     CANCELADO = "cancelado"
 
 
+# estados seguintes permitidos a partir de cada estado: o fluxo normal
+# avança um passo por vez, e o pedido pode ser cancelado até ser entregue
+TRANSICOES_PEDIDO: dict[EstadoPedido, set[EstadoPedido]] = {
+    EstadoPedido.CARRINHO: {EstadoPedido.PENDENTE, EstadoPedido.CANCELADO},
+    EstadoPedido.PENDENTE: {EstadoPedido.PAGO, EstadoPedido.CANCELADO},
+    EstadoPedido.PAGO: {EstadoPedido.FATURADO, EstadoPedido.CANCELADO},
+    EstadoPedido.FATURADO: {EstadoPedido.SEPARADO, EstadoPedido.CANCELADO},
+    EstadoPedido.SEPARADO: {EstadoPedido.ENVIADO, EstadoPedido.CANCELADO},
+    EstadoPedido.ENVIADO: {EstadoPedido.ENTREGUE, EstadoPedido.CANCELADO},
+    EstadoPedido.ENTREGUE: set(),
+    EstadoPedido.CANCELADO: set(),
+}
+
+
+def transicao_permitida(estado_atual: str, novo_estado: str) -> bool:
+    return EstadoPedido(novo_estado) in TRANSICOES_PEDIDO[EstadoPedido(estado_atual)]
+
+
+def proximo_estado(estado_atual: str) -> Optional[str]:
+    # o passo seguinte do fluxo normal; None para entregue e cancelado
+    seguintes = TRANSICOES_PEDIDO[EstadoPedido(estado_atual)] - {EstadoPedido.CANCELADO}
+    return next(iter(seguintes)).value if seguintes else None
+
+
 @dataclass
 class Pedido:
     id: Optional[int] = None
@@ -26,6 +51,10 @@ class Pedido:
     endereco_entrega: Optional[str] = None
     estado: Optional[EstadoPedido] = None
     id_cliente: Optional[int] = None
+    quantidade_itens: Optional[int] = None
     cliente: Optional[Usuario] = None
     itens: Optional[list[ItemPedido]] = None
 
+    def __post_init__(self):
+        # no banco data_hora é um inteiro em milissegundos (util.data_hora)
+        self.data_hora = de_epoch_ms(self.data_hora)
@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+
+from models.pedido_model import EstadoPedido
+
+
+# estados em que o valor do pedido já foi pago pelo cliente
+ESTADOS_GASTO = {
+    EstadoPedido.PAGO.value,
+    EstadoPedido.FATURADO.value,
+    EstadoPedido.SEPARADO.value,
+    EstadoPedido.ENVIADO.value,
+    EstadoPedido.ENTREGUE.value,
+}
+
+
+@dataclass
+class ResumoCliente:
+    quantidade_pedidos: int = 0
+    valor_total_gasto: float = 0.0
+    quantidade_por_estado: dict[str, int] = field(default_factory=dict)
@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from models.usuario_model import Usuario
+
+
+@dataclass
+class Sessao:
+    hash_token: Optional[bytes] = None
+    id_usuario: Optional[int] = None
+    # milissegundos desde a época
+    expira_em: Optional[int] = None
+    usuario: Optional[Usuario] = None
@@ -3,20 +3,25 @@ import sqlite3
 from typing import List, Optional
 from models.categoria_model import Categoria
 from sql.categoria_sql import *
-from util.database import obter_conexao
+from util.cache import com_cache_catalogo, invalidando_cache_catalogo
+from util.database import com_metodos_async, obter_conexao
 
 
+@com_metodos_async
 class CategoriaRepo:
     @classmethod
-    def criar_tabela(cls):
-        with obter_conexao() as conexao:
+    def criar_tabela(cls, conexao: Optional[sqlite3.Connection] = None):
+        with obter_conexao(conexao) as conexao:
             cursor = conexao.cursor()
             cursor.execute(SQL_CRIAR_TABELA)
 
     @classmethod
-    def inserir(cls, categoria: Categoria) -> Optional[Categoria]:
+    @invalidando_cache_catalogo
+    def inserir(
+        cls, categoria: Categoria, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Categoria]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_INSERIR,
@@ -30,9 +35,28 @@ class CategoriaRepo:
             return None
 
     @classmethod
-    def obter_todos(cls) -> List[Categoria]:
+    @invalidando_cache_catalogo
+    def inserir_lote(
+        cls, categorias: List[Categoria], conexao: Optional[sqlite3.Connection] = None
+    ) -> int:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.executemany(
+                    SQL_INSERIR, ((c.nome, c.descricao) for c in categorias)
+                )
+                return cursor.rowcount
+        except sqlite3.Error as ex:
+            print(ex)
+            return 0
+
+    @classmethod
+    @com_cache_catalogo
+    def obter_todos(
+        cls, conexao: Optional[sqlite3.Connection] = None
+    ) -> List[Categoria]:
+        try:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tuplas = cursor.execute(SQL_OBTER_TODOS).fetchall()
                 categorias = [Categoria(*t) for t in tuplas]
@@ -42,9 +66,25 @@ class CategoriaRepo:
             return None
 
     @classmethod
-    def alterar(cls, categoria: Categoria) -> bool:
+    def obter_alterados_desde(
+        cls, versao: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> List[Categoria]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                tuplas = cursor.execute(SQL_OBTER_ALTERADOS_DESDE, (versao,)).fetchall()
+                return [Categoria(*t) for t in tuplas]
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    @invalidando_cache_catalogo
+    def alterar(
+        cls, categoria: Categoria, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
+        try:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_ALTERAR,
@@ -56,9 +96,10 @@ class CategoriaRepo:
             return False
 
     @classmethod
-    def excluir(cls, id: int) -> bool:
+    @invalidando_cache_catalogo
+    def excluir(cls, id: int, conexao: Optional[sqlite3.Connection] = None) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(SQL_EXCLUIR, (id,))
                 return cursor.rowcount > 0
@@ -67,9 +108,12 @@ class CategoriaRepo:
             return False
 
     @classmethod
-    def obter_um(cls, id: int) -> Optional[Categoria]:
+    @com_cache_catalogo
+    def obter_um(
+        cls, id: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Categoria]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(SQL_OBTER_UM, (id,)).fetchone()
                 if not tupla:
@@ -81,9 +125,11 @@ class CategoriaRepo:
             return None
 
     @classmethod
-    def obter_quantidade(cls) -> Optional[int]:
+    def obter_quantidade(
+        cls, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[int]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(SQL_OBTER_QUANTIDADE).fetchone()
                 return int(tupla[0])
@@ -93,7 +139,12 @@ class CategoriaRepo:
 
     @classmethod
     def obter_busca(
-        cls, termo: str, pagina: int, tamanho_pagina: int, ordem: int
+        cls,
+        termo: str,
+        pagina: int,
+        tamanho_pagina: int,
+        ordem: int,
+        conexao: Optional[sqlite3.Connection] = None,
     ) -> List[Categoria]:
         termo = "%" + termo + "%"
         offset = (pagina - 1) * tamanho_pagina
@@ -103,7 +154,7 @@ class CategoriaRepo:
             case _:
                 SQL_OBTER_BUSCA_ORDENADA = SQL_OBTER_BUSCA.replace("#1", "nome")
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tuplas = cursor.execute(
                     SQL_OBTER_BUSCA_ORDENADA, (termo, termo, tamanho_pagina, offset)
@@ -115,10 +166,12 @@ class CategoriaRepo:
             return None
 
     @classmethod
-    def obter_quantidade_busca(cls, termo: str) -> Optional[int]:
+    def obter_quantidade_busca(
+        cls, termo: str, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[int]:
         termo = "%" + termo + "%"
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(
                     SQL_OBTER_QUANTIDADE_BUSCA, (termo, termo)
@@ -133,5 +186,6 @@ class CategoriaRepo:
         if CategoriaRepo.obter_quantidade() == 0:
             with open(arquivo_json, "r", encoding="utf-8") as arquivo:
                 categorias = json.load(arquivo)
-                for categoria in categorias:
-                    CategoriaRepo.inserir(Categoria(**categoria))
+                CategoriaRepo.inserir_lote(
+                    [Categoria(**categoria) for categoria in categorias]
+                )
@@ -0,0 +1,47 @@
+import sqlite3
+from datetime import datetime
+from sql.historico_sql import *
+from util.data_hora import para_epoch_ms
+from util.database import com_metodos_async, iniciar_escrita, obter_conexao
+
+
+@com_metodos_async
+class HistoricoRepo:
+    @classmethod
+    def arquivar_lote(cls, limite: datetime, tamanho_lote: int = 500) -> int:
+        """Move para o histórico até tamanho_lote pedidos entregues ou
+        cancelados anteriores a limite. Devolve quantos foram movidos.
+
+        Com o banco principal em WAL, uma transação que escreve nos dois
+        arquivos não é atômica entre eles; por isso a cópia e a exclusão são
+        duas transações, nessa ordem. Uma interrupção entre elas deixa o
+        pedido nos dois bancos, e a execução seguinte conclui a exclusão."""
+        try:
+            with obter_conexao() as conexao:
+                iniciar_escrita(conexao)
+                cursor = conexao.cursor()
+                ids = [
+                    tupla[0]
+                    for tupla in cursor.execute(
+                        SQL_OBTER_IDS_ARQUIVAVEIS,
+                        (para_epoch_ms(limite), tamanho_lote),
+                    )
+                ]
+                if not ids:
+                    return 0
+                marcadores = ", ".join("?" * len(ids))
+                cursor.execute(SQL_COPIAR_PEDIDOS.replace("#1", marcadores), ids)
+                cursor.execute(SQL_COPIAR_ITENS.replace("#1", marcadores), ids)
+                conexao.commit()
+                iniciar_escrita(conexao)
+                for sql in (
+                    SQL_MANTER_RESUMO_ARQUIVADOS,
+                    SQL_EXCLUIR_PEDIDOS_ARQUIVADOS,
+                    SQL_EXCLUIR_ITENS_ARQUIVADOS,
+                    SQL_EXCLUIR_RESERVAS_ARQUIVADAS,
+                ):
+                    cursor.execute(sql.replace("#1", marcadores), ids)
+                return len(ids)
+        except sqlite3.Error as ex:
+            print(ex)
+            return 0
@@ -2,20 +2,27 @@ import sqlite3
 from typing import List, Optional
 from models.item_pedido_model import ItemPedido
 from sql.item_pedido_sql import *
-from util.database import obter_conexao
+from util.database import com_metodos_async, obter_conexao
 
+# pedidos por consulta IN (...), abaixo do limite de parâmetros de
+# versões antigas do SQLite (999)
+TAMANHO_LOTE_PEDIDOS = 900
 
+
+@com_metodos_async
 class ItemPedidoRepo:
     @classmethod
-    def criar_tabela(cls):
-        with obter_conexao() as conexao:
+    def criar_tabela(cls, conexao: Optional[sqlite3.Connection] = None):
+        with obter_conexao(conexao) as conexao:
             cursor = conexao.cursor()
             cursor.execute(SQL_CRIAR_TABELA)
 
     @classmethod
-    def inserir(cls, item_pedido: ItemPedido) -> Optional[ItemPedido]:
+    def inserir(
+        cls, item_pedido: ItemPedido, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[ItemPedido]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_INSERIR,
@@ -35,9 +42,11 @@ class ItemPedidoRepo:
             return None
 
     @classmethod
-    def obter_por_pedido(cls, id_pedido: int) -> List[ItemPedido]:
+    def obter_por_pedido(
+        cls, id_pedido: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> List[ItemPedido]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tuplas = cursor.execute(
                     SQL_OBTER_POR_PEDIDO,
@@ -49,12 +58,35 @@ class ItemPedidoRepo:
             print(ex)
             return None
 
+    @classmethod
+    def obter_por_pedidos(
+        cls, ids_pedidos: List[int], conexao: Optional[sqlite3.Connection] = None
+    ) -> dict[int, List[ItemPedido]]:
+        # itens de vários pedidos de uma vez, agrupados pelo id do pedido
+        itens_por_pedido = {id_pedido: [] for id_pedido in ids_pedidos}
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                ids = list(itens_por_pedido)
+                for inicio in range(0, len(ids), TAMANHO_LOTE_PEDIDOS):
+                    lote = ids[inicio : inicio + TAMANHO_LOTE_PEDIDOS]
+                    sql = SQL_OBTER_POR_PEDIDOS.replace("#1", ", ".join("?" * len(lote)))
+                    for tupla in cursor.execute(sql, lote):
+                        itens_por_pedido[tupla[0]].append(ItemPedido(*tupla))
+                return itens_por_pedido
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
     @classmethod
     def obter_quantidade_por_produto(
-        cls, id_pedido: int, id_produto: int
+        cls,
+        id_pedido: int,
+        id_produto: int,
+        conexao: Optional[sqlite3.Connection] = None,
     ) -> Optional[int]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(
                     SQL_OBTER_QUANTIDADE_POR_PRODUTO, (id_pedido, id_produto)
@@ -66,9 +98,11 @@ class ItemPedidoRepo:
             return None
 
     @classmethod
-    def obter_quantidade_por_pedido(cls, id_pedido: int) -> Optional[int]:
+    def obter_quantidade_por_pedido(
+        cls, id_pedido: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[int]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(
                     SQL_OBTER_QUANTIDADE_POR_PEDIDO, (id_pedido,)
@@ -80,10 +114,14 @@ class ItemPedidoRepo:
 
     @classmethod
     def alterar_valor_produto(
-        cls, id_pedido: int, id_produto: int, novo_valor: float
+        cls,
+        id_pedido: int,
+        id_produto: int,
+        novo_valor: float,
+        conexao: Optional[sqlite3.Connection] = None,
     ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_ALTERAR_VALOR_PRODUTO,
@@ -100,10 +138,14 @@ class ItemPedidoRepo:
 
     @classmethod
     def alterar_quantidade_produto(
-        cls, id_pedido: int, id_produto: int, nova_quantidade: int
+        cls,
+        id_pedido: int,
+        id_produto: int,
+        nova_quantidade: int,
+        conexao: Optional[sqlite3.Connection] = None,
     ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_ALTERAR_QUANTIDADE_PRODUTO,
@@ -119,9 +161,14 @@ class ItemPedidoRepo:
             return False
 
     @classmethod
-    def aumentar_quantidade_produto(cls, id_pedido: int, id_produto: int) -> bool:
+    def aumentar_quantidade_produto(
+        cls,
+        id_pedido: int,
+        id_produto: int,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_AUMENTAR_QUANTIDADE_PRODUTO,
@@ -136,9 +183,14 @@ class ItemPedidoRepo:
             return False
         
     @classmethod
-    def diminuir_quantidade_produto(cls, id_pedido: int, id_produto: int) -> bool:
+    def diminuir_quantidade_produto(
+        cls,
+        id_pedido: int,
+        id_produto: int,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_DIMINUIR_QUANTIDADE_PRODUTO,
@@ -153,9 +205,14 @@ class ItemPedidoRepo:
             return False
     
     @classmethod
-    def excluir(cls, id_pedido: int, id_produto: int) -> bool:
+    def excluir(
+        cls,
+        id_pedido: int,
+        id_produto: int,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_EXCLUIR,
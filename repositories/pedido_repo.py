@@ -1,29 +1,42 @@
 from datetime import datetime
 import sqlite3
 from typing import List, Optional
+from models.item_pedido_model import ItemPedido
 from models.pedido_model import EstadoPedido, Pedido
-from repositories.item_pedido_repo import ItemPedidoRepo
+from models.usuario_model import Usuario
+from repositories.item_pedido_repo import TAMANHO_LOTE_PEDIDOS, ItemPedidoRepo
+from sql.historico_sql import SQL_EXISTE_NO_PERIODO
 from sql.pedido_sql import *
-from util.database import obter_conexao
+from util.data_hora import para_epoch_ms
+from util.database import com_metodos_async, obter_conexao
+from util.paginacao import (
+    Pagina,
+    decodificar_cursor,
+    montar_filtro_cursor,
+    montar_pagina,
+)
 
 
+@com_metodos_async
 class PedidoRepo:
 
     @classmethod
-    def criar_tabela(cls):
-        with obter_conexao() as conexao:
+    def criar_tabela(cls, conexao: Optional[sqlite3.Connection] = None):
+        with obter_conexao(conexao) as conexao:
             cursor = conexao.cursor()
             cursor.execute(SQL_CRIAR_TABELA)
 
     @classmethod
-    def inserir(cls, pedido: Pedido) -> Optional[Pedido]:
+    def inserir(
+        cls, pedido: Pedido, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Pedido]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_INSERIR,
                     (
-                        pedido.data_hora,
+                        para_epoch_ms(pedido.data_hora),
                         pedido.valor_total,
                         pedido.endereco_entrega,
                         pedido.estado,
@@ -38,14 +51,19 @@ class PedidoRepo:
             return None
 
     @classmethod
-    def alterar_data_hora(cls, id: int, nova_data_hora: datetime) -> bool:
+    def alterar_data_hora(
+        cls,
+        id: int,
+        nova_data_hora: datetime,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_ALTERAR_DATA_HORA,
                     (
-                        nova_data_hora,
+                        para_epoch_ms(nova_data_hora),
                         id,
                     ),
                 )
@@ -55,9 +73,11 @@ class PedidoRepo:
             return False
 
     @classmethod
-    def alterar_estado(cls, id: int, novo_estado: str) -> bool:
+    def alterar_estado(
+        cls, id: int, novo_estado: str, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_ALTERAR_ESTADO,
@@ -71,53 +91,101 @@ class PedidoRepo:
             print(ex)
             return False
 
+    @classmethod
+    def alterar_estados(
+        cls,
+        alteracoes: List[tuple[int, str, str]],
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> int:
+        # alteracoes: (id, estado atual, novo estado); devolve quantos mudaram
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.executemany(
+                    SQL_ALTERAR_ESTADO_SE_ATUAL,
+                    ((novo, id, atual) for id, atual, novo in alteracoes),
+                )
+                return cursor.rowcount
+        except sqlite3.Error as ex:
+            print(ex)
+            return 0
+
+    @classmethod
+    def obter_estados(
+        cls, ids: List[int], conexao: Optional[sqlite3.Connection] = None
+    ) -> dict[int, str]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                estados = {}
+                for inicio in range(0, len(ids), TAMANHO_LOTE_PEDIDOS):
+                    lote = ids[inicio : inicio + TAMANHO_LOTE_PEDIDOS]
+                    sql = SQL_OBTER_ESTADOS.replace("#1", ", ".join("?" * len(lote)))
+                    estados.update(cursor.execute(sql, lote).fetchall())
+                return estados
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
     @classmethod
     def atualizar_para_fechar(
-        cls, id: int, endereco_entrega: str, valor_total: float
+        cls,
+        id: int,
+        endereco_entrega: str,
+        conexao: Optional[sqlite3.Connection] = None,
     ) -> bool:
+        # valor_total já é mantido pelos gatilhos de item_pedido
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
-                cursor.execute(
-                    SQL_ATUALIZAR_PARA_FECHAR,
-                    (
-                        endereco_entrega,
-                        valor_total,
-                        id,
-                    ),
-                )
+                cursor.execute(SQL_ATUALIZAR_PARA_FECHAR, (endereco_entrega, id))
                 return cursor.rowcount > 0
         except sqlite3.Error as ex:
             print(ex)
             return False
-        
+
     @classmethod
-    def atualizar_valor_total(
-        cls, id: int, valor_total: float = 0
+    def recalcular_totais(
+        cls, id: int, conexao: Optional[sqlite3.Connection] = None
     ) -> bool:
-        if not valor_total:
-            itens = ItemPedidoRepo.obter_por_pedido(id)
-            if itens:
-                valor_total = sum([item.valor_item for item in itens])
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
-                cursor.execute(
-                    SQL_ATUALIZAR_VALOR_TOTAL,
-                    (
-                        valor_total,
-                        id,
-                    ),
-                )
+                cursor.execute(SQL_RECALCULAR_TOTAIS, (id,))
                 return cursor.rowcount > 0
         except sqlite3.Error as ex:
             print(ex)
             return False
 
     @classmethod
-    def excluir(cls, id: int) -> bool:
+    def obter_totais_inconsistentes(
+        cls, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[List[tuple]]:
+        """Devolve (id, valor_total, quantidade_itens, valor calculado,
+        quantidade calculada) dos pedidos cujos totais divergem dos itens."""
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                return cursor.execute(SQL_OBTER_TOTAIS_INCONSISTENTES).fetchall()
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def corrigir_totais(cls, conexao: Optional[sqlite3.Connection] = None) -> int:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(SQL_CORRIGIR_TOTAIS_INCONSISTENTES)
+                return cursor.rowcount
+        except sqlite3.Error as ex:
+            print(ex)
+            return 0
+
+    @classmethod
+    def excluir(cls, id: int, conexao: Optional[sqlite3.Connection] = None) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(SQL_EXCLUIR, (id,))
                 return cursor.rowcount > 0
@@ -126,9 +194,11 @@ class PedidoRepo:
             return False
 
     @classmethod
-    def obter_por_id(cls, id: int) -> Optional[Pedido]:
+    def obter_por_id(
+        cls, id: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Pedido]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(SQL_OBTER_POR_ID, (id,)).fetchone()
                 if not tupla: return None
@@ -139,61 +209,123 @@ class PedidoRepo:
             return None
 
     @classmethod
-    def obter_quantidade(cls, id_cliente: int) -> Optional[int]:
+    def obter_detalhado(
+        cls, id: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Pedido]:
+        # pedido com cliente e itens, montado a partir de um único JOIN
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
-                tupla = cursor.execute(SQL_OBTER_QUANTIDADE, (id_cliente,)).fetchone()
-                return int(tupla[0])
+                tuplas = cursor.execute(SQL_OBTER_DETALHADO_POR_ID, (id,)).fetchall()
+                if not tuplas:
+                    # pedidos encerrados antigos estão no banco de histórico
+                    tuplas = cursor.execute(
+                        SQL_OBTER_DETALHADO_POR_ID_HISTORICO, (id,)
+                    ).fetchall()
+                if not tuplas: return None
+                pedido = Pedido(*tuplas[0][:7])
+                if tuplas[0][7] is not None:
+                    pedido.cliente = Usuario(*tuplas[0][7:15])
+                pedido.itens = [ItemPedido(*t[15:]) for t in tuplas if t[15] is not None]
+                return pedido
         except sqlite3.Error as ex:
             print(ex)
             return None
 
     @classmethod
-    def obter_por_periodo(
-        cls, id_cliente: int, data_inicial: datetime, data_final: datetime
+    def _incluir_itens(
+        cls, pedidos: List[Pedido], conexao: sqlite3.Connection
     ) -> List[Pedido]:
+        # uma consulta IN (...) para os itens de todos os pedidos, em vez de
+        # uma por pedido
+        itens = ItemPedidoRepo.obter_por_pedidos(
+            [pedido.id for pedido in pedidos], conexao=conexao
+        ) or {}
+        for pedido in pedidos:
+            pedido.itens = itens.get(pedido.id, [])
+        return pedidos
+
+    @classmethod
+    def obter_quantidade(
+        cls, id_cliente: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[int]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
-                tuplas = cursor.execute(
-                    SQL_OBTER_POR_PERIODO,
-                    (
-                        id_cliente,
-                        data_inicial,
-                        data_final,
-                    ),
-                ).fetchall()
-                pedidos = [Pedido(*t) for t in tuplas]
-                return pedidos
+                tupla = cursor.execute(SQL_OBTER_QUANTIDADE, (id_cliente,)).fetchone()
+                return int(tupla[0])
         except sqlite3.Error as ex:
             print(ex)
             return None
 
     @classmethod
-    def obter_quantidade_por_periodo(
-        cls, id_cliente: int, data_inicial: datetime, data_final: datetime
-    ) -> Optional[int]:
+    def _consulta_periodo(
+        cls,
+        cursor: sqlite3.Cursor,
+        sql: str,
+        sql_com_historico: str,
+        parametros: tuple,
+    ) -> str:
+        # o histórico só entra no UNION ALL se o cliente tiver pedidos
+        # arquivados no período (consulta pelo índice do histórico)
+        if cursor.execute(SQL_EXISTE_NO_PERIODO, parametros).fetchone()[0]:
+            return sql_com_historico
+        return sql
+
+    @classmethod
+    def obter_pagina_por_periodo(
+        cls,
+        id_cliente: int,
+        data_inicial: datetime,
+        data_final: datetime,
+        tamanho_pagina: int,
+        cursor: Optional[str] = None,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pagina]:
+        # sem total: a quantidade de pedidos do cliente vem de resumo_cliente
+        contexto = f"pedido:cliente:{id_cliente}"
+        colunas = ["data_hora", "id"]
+        dados_cursor = decodificar_cursor(cursor, contexto, len(colunas))
+        filtro, ordenacao, parametros = montar_filtro_cursor(
+            colunas, True, dados_cursor
+        )
+        periodo = (
+            id_cliente,
+            para_epoch_ms(data_inicial),
+            para_epoch_ms(data_final),
+        )
         try:
-            with obter_conexao() as conexao:
-                cursor = conexao.cursor()
-                tupla = cursor.execute(
-                    SQL_OBTER_QUANTIDADE_POR_PERIODO,
-                    (
-                        id_cliente,
-                        data_inicial,
-                        data_final,
-                    ),
-                ).fetchone()
-                return int(tupla[0])
+            with obter_conexao(conexao) as conexao:
+                cursor_bd = conexao.cursor()
+                sql = cls._consulta_periodo(
+                    cursor_bd,
+                    SQL_OBTER_PAGINA_POR_PERIODO,
+                    SQL_OBTER_PAGINA_POR_PERIODO_COM_HISTORICO,
+                    periodo,
+                )
+                partes = 2 if sql == SQL_OBTER_PAGINA_POR_PERIODO_COM_HISTORICO else 1
+                sql = sql.replace("#1", filtro).replace("#2", ordenacao)
+                tuplas = cursor_bd.execute(
+                    sql, [*periodo, *parametros] * partes + [tamanho_pagina + 1]
+                ).fetchall()
+                return montar_pagina(
+                    [Pedido(*t) for t in tuplas],
+                    [[t[1], t[0]] for t in tuplas],
+                    None,
+                    tamanho_pagina,
+                    dados_cursor,
+                    contexto,
+                )
         except sqlite3.Error as ex:
             print(ex)
             return None
 
     @classmethod
-    def obter_por_estado(cls, id_cliente: int, estado: int) -> List[Pedido]:
+    def obter_por_estado(
+        cls, id_cliente: int, estado: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> List[Pedido]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tuplas = cursor.execute(
                     SQL_OBTER_POR_ESTADO,
@@ -209,15 +341,97 @@ class PedidoRepo:
             return None
         
     @classmethod
-    def obter_todos_por_estado(cls, estado: int) -> List[Pedido]:
+    def obter_todos_por_estado(
+        cls,
+        estado: int,
+        com_itens: bool = False,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> List[Pedido]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tuplas = cursor.execute(
                     SQL_OBTER_TODOS_POR_ESTADO, (estado,),
                 ).fetchall()
                 pedidos = [Pedido(*t) for t in tuplas]
+                if com_itens:
+                    cls._incluir_itens(pedidos, conexao)
                 return pedidos
         except sqlite3.Error as ex:
             print(ex)
-            return None
\ No newline at end of file
+            return None
+    @classmethod
+    def obter_pagina_por_estado(
+        cls,
+        estado: str,
+        tamanho_pagina: int,
+        cursor: Optional[str] = None,
+        com_itens: bool = False,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pagina]:
+        contexto = f"pedido:{estado}"
+        colunas = ["id"]
+        dados_cursor = decodificar_cursor(cursor, contexto, len(colunas))
+        filtro, ordenacao, parametros = montar_filtro_cursor(
+            colunas, False, dados_cursor
+        )
+        sql = SQL_OBTER_PAGINA_POR_ESTADO.replace("#1", filtro).replace(
+            "#2", ordenacao
+        )
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor_bd = conexao.cursor()
+                tuplas = cursor_bd.execute(
+                    sql, [estado, *parametros, tamanho_pagina + 1]
+                ).fetchall()
+                pagina = montar_pagina(
+                    [Pedido(*t) for t in tuplas],
+                    [[t[0]] for t in tuplas],
+                    None,
+                    tamanho_pagina,
+                    dados_cursor,
+                    contexto,
+                )
+                if com_itens:
+                    cls._incluir_itens(pagina.itens, conexao)
+                return pagina
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def obter_ids_saidos_do_estado_desde(
+        cls, estado: str, versao: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> List[int]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                tuplas = cursor.execute(
+                    SQL_OBTER_IDS_SAIDOS_DO_ESTADO_DESDE, (estado, versao)
+                ).fetchall()
+                return [t[0] for t in tuplas]
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def obter_alterados_por_estado_desde(
+        cls,
+        estado: str,
+        versao: int,
+        com_itens: bool = False,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> List[Pedido]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                tuplas = cursor.execute(
+                    SQL_OBTER_ALTERADOS_POR_ESTADO_DESDE, (estado, versao)
+                ).fetchall()
+                pedidos = [Pedido(*t) for t in tuplas]
+                if com_itens:
+                    cls._incluir_itens(pedidos, conexao)
+                return pedidos
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
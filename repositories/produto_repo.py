@@ -3,22 +3,43 @@ import sqlite3
 from typing import List, Optional
 from models.produto_model import Produto
 from sql.produto_sql import *
-from util.database import obter_conexao
+from util.cache import com_cache_catalogo, invalidando_cache_catalogo
+from util.database import com_metodos_async, iniciar_escrita, obter_conexao
+from util.paginacao import (
+    Cursor,
+    Pagina,
+    decodificar_cursor,
+    montar_filtro_cursor,
+    montar_pagina,
+)
+import re
 import shutil
 from pathlib import Path
 
 
+def montar_consulta_fts(termo: str) -> str:
+    # cada palavra vira um prefixo entre aspas ("rel"* casa com relógio),
+    # o que também neutraliza a sintaxe do FTS5 digitada pelo usuário; só o
+    # começo das palavras casa: "ouse" não encontra mouse, como o LIKE fazia
+    palavras = re.findall(r"\w+", termo or "")
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+
+@com_metodos_async
 class ProdutoRepo:
     @classmethod
-    def criar_tabela(cls):
-        with obter_conexao() as conexao:
+    def criar_tabela(cls, conexao: Optional[sqlite3.Connection] = None):
+        with obter_conexao(conexao) as conexao:
             cursor = conexao.cursor()
             cursor.execute(SQL_CRIAR_TABELA)
 
     @classmethod
-    def inserir(cls, produto: Produto) -> Optional[Produto]:
+    @invalidando_cache_catalogo
+    def inserir(
+        cls, produto: Produto, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Produto]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_INSERIR,
@@ -32,9 +53,49 @@ class ProdutoRepo:
             return None
 
     @classmethod
-    def obter_todos(cls) -> List[Produto]:
+    @invalidando_cache_catalogo
+    def inserir_lote(
+        cls, produtos: List[Produto], conexao: Optional[sqlite3.Connection] = None
+    ) -> int:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
+                # a transação (com o lock de escrita) precisa estar aberta
+                # antes do DROP TRIGGER: no modo legado do sqlite3 o Python
+                # não abre transação para DDL, e o DROP seria confirmado na
+                # hora. Assim, uma falha desfaz a exclusão junto com o resto,
+                # e nenhuma outra conexão insere enquanto os gatilhos estão
+                # ausentes
+                iniciar_escrita(conexao)
+                cursor = conexao.cursor()
+                gatilhos = dict(cursor.execute(SQL_OBTER_GATILHOS_INSERIR).fetchall())
+                maior_id = cursor.execute(SQL_OBTER_MAIOR_ID).fetchone()[0]
+                for nome in gatilhos:
+                    cursor.execute(SQL_EXCLUIR_GATILHO.replace("#1", nome))
+                cursor.executemany(
+                    SQL_INSERIR,
+                    (
+                        (p.id_categoria, p.nome, p.preco, p.descricao, p.estoque)
+                        for p in produtos
+                    ),
+                )
+                inseridos = cursor.rowcount
+                if "produto_fts_apos_inserir" in gatilhos:
+                    cursor.execute(SQL_INDEXAR_FTS_APOS_ID, (maior_id,))
+                if "produto_versao_apos_insert" in gatilhos:
+                    cursor.execute(SQL_INCREMENTAR_VERSAO)
+                    cursor.execute(SQL_REGISTRAR_VERSAO_APOS_ID, (maior_id,))
+                for sql in gatilhos.values():
+                    cursor.execute(sql)
+                return inseridos
+        except sqlite3.Error as ex:
+            print(ex)
+            return 0
+
+    @classmethod
+    @com_cache_catalogo
+    def obter_todos(cls, conexao: Optional[sqlite3.Connection] = None) -> List[Produto]:
+        try:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tuplas = cursor.execute(SQL_OBTER_TODOS).fetchall()
                 produtos = [Produto(*t) for t in tuplas]
@@ -44,9 +105,25 @@ class ProdutoRepo:
             return None
 
     @classmethod
-    def alterar(cls, produto: Produto) -> bool:
+    def obter_alterados_desde(
+        cls, versao: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> List[Produto]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                tuplas = cursor.execute(SQL_OBTER_ALTERADOS_DESDE, (versao,)).fetchall()
+                return [Produto(*t) for t in tuplas]
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    @invalidando_cache_catalogo
+    def alterar(
+        cls, produto: Produto, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
+        try:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_ALTERAR,
@@ -65,9 +142,10 @@ class ProdutoRepo:
             return False
 
     @classmethod
-    def excluir(cls, id: int) -> bool:
+    @invalidando_cache_catalogo
+    def excluir(cls, id: int, conexao: Optional[sqlite3.Connection] = None) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(SQL_EXCLUIR, (id,))
                 return cursor.rowcount > 0
@@ -76,9 +154,12 @@ class ProdutoRepo:
             return False
 
     @classmethod
-    def obter_um(cls, id: int) -> Optional[Produto]:
+    @com_cache_catalogo
+    def obter_um(
+        cls, id: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Produto]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(SQL_OBTER_UM, (id,)).fetchone()
                 if not tupla: return None
@@ -89,9 +170,11 @@ class ProdutoRepo:
             return None
 
     @classmethod
-    def obter_quantidade(cls) -> Optional[int]:
+    def obter_quantidade(
+        cls, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[int]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(SQL_OBTER_QUANTIDADE).fetchone()
                 return int(tupla[0])
@@ -100,42 +183,61 @@ class ProdutoRepo:
             return None
 
     @classmethod
-    def obter_busca(
-        cls, termo: str, pagina: int, tamanho_pagina: int, ordem: int
-    ) -> List[Produto]:
-        termo = "%" + termo + "%"
-        offset = (pagina - 1) * tamanho_pagina
+    def obter_busca_cursor(
+        cls,
+        termo: str,
+        tamanho_pagina: int,
+        ordem: int,
+        cursor: Optional[str] = None,
+        pagina: int = 1,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pagina]:
+        # sem cursor, pagina > 1 (links antigos com ?p=) sai uma vez por
+        # OFFSET, já com os cursores; a navegação dali em diante é por chave
+        consulta = montar_consulta_fts(termo)
         match (ordem):
-            case 1:
-                SQL_OBTER_BUSCA_ORDENADA = SQL_OBTER_BUSCA.replace("#1", "nome")
             case 2:
-                SQL_OBTER_BUSCA_ORDENADA = SQL_OBTER_BUSCA.replace("#1", "preco ASC")
+                coluna, decrescente = "p.preco", False
             case 3:
-                SQL_OBTER_BUSCA_ORDENADA = SQL_OBTER_BUSCA.replace("#1", "preco DESC")
+                coluna, decrescente = "p.preco", True
+            case 4 if consulta:
+                coluna, decrescente = "f.rank", False
             case _:
-                SQL_OBTER_BUSCA_ORDENADA = SQL_OBTER_BUSCA.replace("#1", "nome")
-        try:
-            with obter_conexao() as conexao:
-                cursor = conexao.cursor()
-                tuplas = cursor.execute(
-                    SQL_OBTER_BUSCA_ORDENADA, (termo, termo, tamanho_pagina, offset)
-                ).fetchall()
-                produtos = [Produto(*t) for t in tuplas]
-                return produtos
-        except sqlite3.Error as ex:
-            print(ex)
-            return None
-
-    @classmethod
-    def obter_quantidade_busca(cls, termo: str) -> Optional[int]:
-        termo = "%" + termo + "%"
+                coluna, decrescente = "p.nome", False
+        contexto = f"produto:{ordem}:{consulta}"
+        colunas = [coluna, "p.id"]
+        dados_cursor = decodificar_cursor(cursor, contexto, len(colunas))
+        filtro, ordenacao, parametros = montar_filtro_cursor(
+            colunas, decrescente, dados_cursor
+        )
+        sql = SQL_OBTER_BUSCA_CURSOR_FTS if consulta else SQL_OBTER_BUSCA_CURSOR
+        sql = (
+            sql.replace("#1", coluna)
+            .replace("#2", "NULL" if dados_cursor else "COUNT(*) OVER ()")
+            .replace("#3", filtro)
+            .replace("#4", ordenacao)
+        )
+        if consulta:
+            parametros.insert(0, consulta)
+        pular = (pagina - 1) * tamanho_pagina if not dados_cursor and pagina > 1 else 0
+        parametros += [tamanho_pagina + 1, pular]
         try:
-            with obter_conexao() as conexao:
-                cursor = conexao.cursor()
-                tupla = cursor.execute(
-                    SQL_OBTER_QUANTIDADE_BUSCA, (termo, termo)
-                ).fetchone()
-                return int(tupla[0])
+            with obter_conexao(conexao) as conexao:
+                cursor_bd = conexao.cursor()
+                tuplas = cursor_bd.execute(sql, parametros).fetchall()
+                # a primeira página traz o total em todas as linhas; sem
+                # resultados, o total é zero
+                total = tuplas[0][7] if tuplas and not dados_cursor else 0
+                if pular:
+                    dados_cursor = Cursor([], "p", pagina, total, contexto)
+                return montar_pagina(
+                    [Produto(*t[:6]) for t in tuplas],
+                    [[t[6], t[0]] for t in tuplas],
+                    total,
+                    tamanho_pagina,
+                    dados_cursor,
+                    contexto,
+                )
         except sqlite3.Error as ex:
             print(ex)
             return None
@@ -145,8 +247,7 @@ class ProdutoRepo:
         if ProdutoRepo.obter_quantidade() == 0:
             with open(arquivo_json, "r", encoding="utf-8") as arquivo:
                 produtos = json.load(arquivo)
-                for produto in produtos:
-                    ProdutoRepo.inserir(Produto(**produto))
+                ProdutoRepo.inserir_lote([Produto(**produto) for produto in produtos])
             cls.transferir_imagens("static/img/produtos/inserir", "static/img/produtos")
 
     @classmethod
@@ -165,10 +266,13 @@ class ProdutoRepo:
                 shutil.copy2(arquivo_imagem, path_arquivo_destino)
 
     @classmethod
-    def obter_todos_por_categoria(cls, id_categoria: int):
+    @com_cache_catalogo
+    def obter_todos_por_categoria(
+        cls, id_categoria: int, conexao: Optional[sqlite3.Connection] = None
+    ):
         try:
             query = SQL_OBTER_POR_CATEGORIA
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 produtos = cursor.execute(query, (id_categoria,)).fetchall()
                 produtos = [Produto(*produto) for produto in produtos]
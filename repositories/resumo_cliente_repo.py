@@ -0,0 +1,57 @@
+import sqlite3
+from typing import List, Optional
+from models.resumo_cliente_model import ESTADOS_GASTO, ResumoCliente
+from sql.resumo_cliente_sql import *
+from util.database import com_metodos_async, iniciar_escrita, obter_conexao
+
+
+@com_metodos_async
+class ResumoClienteRepo:
+    @classmethod
+    def obter(
+        cls, id_cliente: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[ResumoCliente]:
+        # uma leitura pela chave primária (id_cliente, estado)
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                resumo = ResumoCliente()
+                for estado, quantidade, valor_total in cursor.execute(
+                    SQL_OBTER_POR_CLIENTE, (id_cliente,)
+                ):
+                    resumo.quantidade_por_estado[estado] = quantidade
+                    resumo.quantidade_pedidos += quantidade
+                    if estado in ESTADOS_GASTO:
+                        resumo.valor_total_gasto += valor_total
+                resumo.valor_total_gasto = round(resumo.valor_total_gasto, 2)
+                return resumo
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def obter_inconsistentes(
+        cls, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[List[tuple]]:
+        """Devolve (id_cliente, estado, quantidade, valor_total, quantidade
+        calculada, valor calculado) dos resumos que divergem dos pedidos."""
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                return cursor.execute(SQL_OBTER_INCONSISTENTES).fetchall()
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def recalcular(cls, conexao: Optional[sqlite3.Connection] = None) -> bool:
+        try:
+            with obter_conexao(conexao) as conexao:
+                iniciar_escrita(conexao)
+                cursor = conexao.cursor()
+                for sql in SQL_RECALCULAR:
+                    cursor.execute(sql)
+                return True
+        except sqlite3.Error as ex:
+            print(ex)
+            return False
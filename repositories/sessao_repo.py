@@ -0,0 +1,83 @@
+import sqlite3
+from typing import Optional
+from models.sessao_model import Sessao
+from models.usuario_model import Usuario
+from sql.sessao_sql import *
+from util.database import com_metodos_async, iniciar_escrita, obter_conexao
+
+
+@com_metodos_async
+class SessaoRepo:
+    @classmethod
+    def inserir(
+        cls, sessao: Sessao, agora: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
+        # aproveita a escrita para apagar as sessões vencidas (índice por
+        # expira_em), em vez de uma varredura periódica
+        try:
+            with obter_conexao(conexao) as conexao:
+                iniciar_escrita(conexao)
+                cursor = conexao.cursor()
+                cursor.execute(SQL_EXCLUIR_EXPIRADAS, (agora,))
+                cursor.execute(
+                    SQL_INSERIR, (sessao.hash_token, sessao.id_usuario, sessao.expira_em)
+                )
+                return cursor.rowcount > 0
+        except sqlite3.Error as ex:
+            print(ex)
+            return False
+
+    @classmethod
+    def obter(
+        cls, hash_token: bytes, agora: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Sessao]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                tupla = cursor.execute(SQL_OBTER, (hash_token, agora)).fetchone()
+                if not tupla:
+                    return None
+                usuario = Usuario(*tupla[1:])
+                return Sessao(hash_token, usuario.id, tupla[0], usuario)
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def renovar(
+        cls, hash_token: bytes, expira_em: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(SQL_RENOVAR, (expira_em, hash_token, expira_em))
+                return cursor.rowcount > 0
+        except sqlite3.Error as ex:
+            print(ex)
+            return False
+
+    @classmethod
+    def excluir(
+        cls, hash_token: bytes, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(SQL_EXCLUIR, (hash_token,))
+                return cursor.rowcount > 0
+        except sqlite3.Error as ex:
+            print(ex)
+            return False
+
+    @classmethod
+    def excluir_por_usuario(
+        cls, id_usuario: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> int:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(SQL_EXCLUIR_POR_USUARIO, (id_usuario,))
+                return cursor.rowcount
+        except sqlite3.Error as ex:
+            print(ex)
+            return 0
@@ -3,21 +3,30 @@ import sqlite3
 from typing import List, Optional
 from models.usuario_model import Usuario
 from sql.usuario_sql import *
-from util.database import obter_conexao
+from util.database import com_metodos_async, obter_conexao
+from util.paginacao import (
+    Pagina,
+    decodificar_cursor,
+    montar_filtro_cursor,
+    montar_pagina,
+)
 
 
+@com_metodos_async
 class UsuarioRepo:
 
     @classmethod
-    def criar_tabela(cls):
-        with obter_conexao() as conexao:
+    def criar_tabela(cls, conexao: Optional[sqlite3.Connection] = None):
+        with obter_conexao(conexao) as conexao:
             cursor = conexao.cursor()
             cursor.execute(SQL_CRIAR_TABELA)
 
     @classmethod
-    def inserir(cls, usuario: Usuario) -> Optional[Usuario]:
+    def inserir(
+        cls, usuario: Usuario, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Usuario]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_INSERIR,
@@ -40,9 +49,39 @@ class UsuarioRepo:
             return None
 
     @classmethod
-    def obter_todos_por_perfil(cls, perfil: int = 1) -> List[Usuario]:
+    def inserir_lote(
+        cls, usuarios: List[Usuario], conexao: Optional[sqlite3.Connection] = None
+    ) -> int:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.executemany(
+                    SQL_INSERIR,
+                    (
+                        (
+                            u.nome,
+                            u.cpf,
+                            u.data_nascimento,
+                            u.endereco,
+                            u.telefone,
+                            u.email,
+                            u.perfil,
+                            u.senha,
+                        )
+                        for u in usuarios
+                    ),
+                )
+                return cursor.rowcount
+        except sqlite3.Error as ex:
+            print(ex)
+            return 0
+
+    @classmethod
+    def obter_todos_por_perfil(
+        cls, perfil: int = 1, conexao: Optional[sqlite3.Connection] = None
+    ) -> List[Usuario]:
+        try:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tuplas = cursor.execute(SQL_OBTER_TODOS_POR_PERFIL, (perfil,)).fetchall()
                 usuarios = [Usuario(*t) for t in tuplas]
@@ -52,9 +91,9 @@ class UsuarioRepo:
             return None
         
     @classmethod
-    def obter_todos(cls) -> List[Usuario]:
+    def obter_todos(cls, conexao: Optional[sqlite3.Connection] = None) -> List[Usuario]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tuplas = cursor.execute(SQL_OBTER_TODOS).fetchall()
                 usuarios = [Usuario(*t) for t in tuplas]
@@ -64,9 +103,56 @@ class UsuarioRepo:
             return None
 
     @classmethod
-    def alterar(cls, usuario: Usuario) -> bool:
+    def obter_pagina(
+        cls,
+        tamanho_pagina: int,
+        cursor: Optional[str] = None,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pagina]:
+        contexto = "usuario:id"
+        colunas = ["id"]
+        dados_cursor = decodificar_cursor(cursor, contexto, len(colunas))
+        filtro, ordenacao, parametros = montar_filtro_cursor(
+            colunas, False, dados_cursor
+        )
+        sql = SQL_OBTER_PAGINA.replace("#1", filtro).replace("#2", ordenacao)
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor_bd = conexao.cursor()
+                tuplas = cursor_bd.execute(
+                    sql, [*parametros, tamanho_pagina + 1]
+                ).fetchall()
+                return montar_pagina(
+                    [Usuario(*t) for t in tuplas],
+                    [[t[0]] for t in tuplas],
+                    None,
+                    tamanho_pagina,
+                    dados_cursor,
+                    contexto,
+                )
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def obter_alterados_desde(
+        cls, versao: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> List[Usuario]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                tuplas = cursor.execute(SQL_OBTER_ALTERADOS_DESDE, (versao,)).fetchall()
+                return [Usuario(*t) for t in tuplas]
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def alterar(
+        cls, usuario: Usuario, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(
                     SQL_ALTERAR,
@@ -86,9 +172,9 @@ class UsuarioRepo:
             return False
 
     @classmethod
-    def excluir(cls, id: int) -> bool:
+    def excluir(cls, id: int, conexao: Optional[sqlite3.Connection] = None) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(SQL_EXCLUIR, (id,))
                 return cursor.rowcount > 0
@@ -97,9 +183,11 @@ class UsuarioRepo:
             return False
 
     @classmethod
-    def obter_por_id(cls, id: int) -> Optional[Usuario]:
+    def obter_por_id(
+        cls, id: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Usuario]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(SQL_OBTER_POR_ID, (id,)).fetchone()
                 usuario = Usuario(*tupla)
@@ -109,9 +197,11 @@ class UsuarioRepo:
             return None
 
     @classmethod
-    def obter_quantidade_por_perfil(cls, perfil: int = 1) -> Optional[int]:
+    def obter_quantidade_por_perfil(
+        cls, perfil: int = 1, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[int]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(SQL_OBTER_QUANTIDADE_POR_PERFIL, (perfil,)).fetchone()
                 return int(tupla[0])
@@ -123,44 +213,56 @@ class UsuarioRepo:
     def inserir_usuarios_json(cls, arquivo_json: str):
         if UsuarioRepo.obter_quantidade_por_perfil() == 0:
             with open(arquivo_json, "r", encoding="utf-8") as arquivo:
+                # as senhas do arquivo já vêm com hash bcrypt
                 usuarios = json.load(arquivo)
-                for usuario in usuarios:
-                    UsuarioRepo.inserir(Usuario(**usuario))
+                UsuarioRepo.inserir_lote([Usuario(**usuario) for usuario in usuarios])
 
     @classmethod
-    def obter_busca(cls, termo: str, pagina: int, tamanho_pagina: int) -> List[Usuario]:
-        termo = "%" + termo + "%"
-        offset = (pagina - 1) * tamanho_pagina
+    def obter_busca_cursor(
+        cls,
+        termo: str,
+        tamanho_pagina: int,
+        cursor: Optional[str] = None,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pagina]:
+        contexto = f"usuario:{termo}"
+        colunas = ["nome", "id"]
+        dados_cursor = decodificar_cursor(cursor, contexto, len(colunas))
+        filtro, ordenacao, parametros = montar_filtro_cursor(
+            colunas, False, dados_cursor
+        )
+        sql = (
+            SQL_OBTER_BUSCA_CURSOR.replace(
+                "#1", "NULL" if dados_cursor else "COUNT(*) OVER ()"
+            )
+            .replace("#2", filtro)
+            .replace("#3", ordenacao)
+        )
+        termo_like = "%" + termo + "%"
+        parametros = [termo_like, termo_like, *parametros, tamanho_pagina + 1]
         try:
-            with obter_conexao() as conexao:
-                cursor = conexao.cursor()
-                tuplas = cursor.execute(
-                    SQL_OBTER_BUSCA, (termo, termo, tamanho_pagina, offset)
-                ).fetchall()
-                usuarios = [Usuario(*t) for t in tuplas]
-                return usuarios
-        except sqlite3.Error as ex:
-            print(ex)
-            return None
-
-    @classmethod
-    def obter_quantidade_busca(cls, termo: str) -> Optional[int]:
-        termo = "%" + termo + "%"
-        try:
-            with obter_conexao() as conexao:
-                cursor = conexao.cursor()
-                tupla = cursor.execute(
-                    SQL_OBTER_QUANTIDADE_BUSCA, (termo, termo)
-                ).fetchone()
-                return int(tupla[0])
+            with obter_conexao(conexao) as conexao:
+                cursor_bd = conexao.cursor()
+                tuplas = cursor_bd.execute(sql, parametros).fetchall()
+                total = tuplas[0][7] if tuplas and not dados_cursor else 0
+                return montar_pagina(
+                    [Usuario(*t[:7]) for t in tuplas],
+                    [[t[1], t[0]] for t in tuplas],
+                    total,
+                    tamanho_pagina,
+                    dados_cursor,
+                    contexto,
+                )
         except sqlite3.Error as ex:
             print(ex)
             return None
 
     @classmethod
-    def obter_por_email(cls, email: str) -> Optional[Usuario]:
+    def obter_por_email(
+        cls, email: str, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Usuario]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(SQL_OBTER_POR_EMAIL, (email,)).fetchone()
                 if tupla:
@@ -173,9 +275,11 @@ class UsuarioRepo:
             return None
 
     @classmethod
-    def alterar_token(cls, id: int, token: str) -> bool:
+    def alterar_token(
+        cls, id: int, token: str, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(SQL_ALTERAR_TOKEN, (token, id))
                 return cursor.rowcount > 0
@@ -184,9 +288,11 @@ class UsuarioRepo:
             return False
 
     @classmethod
-    def obter_por_token(cls, token: str) -> Optional[Usuario]:
+    def obter_por_token(
+        cls, token: str, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[Usuario]:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 tupla = cursor.execute(SQL_OBTER_POR_TOKEN, (token,)).fetchone()
                 if tupla:
@@ -199,9 +305,11 @@ class UsuarioRepo:
             return None
 
     @classmethod
-    def alterar_senha(cls, id: int, senha: str) -> bool:
+    def alterar_senha(
+        cls, id: int, senha: str, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
         try:
-            with obter_conexao() as conexao:
+            with obter_conexao(conexao) as conexao:
                 cursor = conexao.cursor()
                 cursor.execute(SQL_ALTERAR_SENHA, (senha, id))
                 return cursor.rowcount > 0
@@ -0,0 +1,35 @@
+import sqlite3
+from typing import List, Optional
+from sql.versao_sql import *
+from util.database import com_metodos_async, obter_conexao
+
+
+@com_metodos_async
+class VersaoRepo:
+    @classmethod
+    def obter_versao(
+        cls, tabela: str, conexao: Optional[sqlite3.Connection] = None
+    ) -> Optional[tuple[int, int]]:
+        """Devolve (versão, instante da última alteração em segundos)."""
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                return cursor.execute(SQL_OBTER_VERSAO, (tabela,)).fetchone()
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def obter_ids_alterados_desde(
+        cls, tabela: str, versao: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> List[int]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                tuplas = cursor.execute(
+                    SQL_OBTER_IDS_ALTERADOS_DESDE, (tabela, versao)
+                ).fetchall()
+                return [t[0] for t in tuplas]
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
@@ -1,35 +1,68 @@
 import asyncio
+import sqlite3
+from dataclasses import asdict
 from io import BytesIO
 from PIL import Image
 from typing import List, Optional
-from fastapi import APIRouter, Body, File, Form, Path, UploadFile
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    Form,
+    Path,
+    Query,
+    Request,
+    UploadFile,
+)
 from fastapi.responses import JSONResponse
 
+from dtos.alterar_estado_pedidos_dto import AlterarEstadoPedidosDto
 from dtos.alterar_pedido_dto import AlterarPedidoDto
 from dtos.alterar_produto_dto import AlterarProdutoDto
 from dtos.inserir_categoria_dto import InserirCategoriaDto
 from dtos.inserir_produto_dto import InserirProdutoDto
 from dtos.problem_details_dto import ProblemDetailsDto
 from models.categoria_model import Categoria
-from models.pedido_model import EstadoPedido
+from models.pedido_model import EstadoPedido, proximo_estado
 from models.produto_model import Produto
 from models.usuario_model import Usuario
 from repositories.categoria_repo import CategoriaRepo
-from repositories.item_pedido_repo import ItemPedidoRepo
 from repositories.pedido_repo import PedidoRepo
 from repositories.produto_repo import ProdutoRepo
 from repositories.usuario_repo import UsuarioRepo
+from services.pedido_service import (
+    ERRO_ESTOQUE_INSUFICIENTE,
+    ERRO_PEDIDO_NAO_ENCONTRADO,
+    PedidoService,
+)
+from util.cache import cache_catalogo, cache_paginas
+from util.database import obter_conexao_requisicao, obter_estatisticas_pool
+from util.importacao import ErroImportacao, aimportar_binario, detectar_formato
 from util.images import transformar_em_quadrada
+from util.limite_taxa import limite_taxa
+from util.senhas import pool_senhas
+from util.listagem_condicional import (
+    TAMANHO_PAGINA_MAXIMO,
+    pedir_ndjson,
+    responder_listagem,
+    responder_listagem_paginada,
+)
 
 SLEEP_TIME = 0.2
 router = APIRouter(prefix="/admin")
 
 
 @router.get("/obter_produtos")
-async def obter_produtos():
+async def obter_produtos(request: Request, since: Optional[int] = Query(None)):
     await asyncio.sleep(SLEEP_TIME)
-    produtos = ProdutoRepo.obter_todos()
-    return produtos
+    return await responder_listagem(
+        request,
+        "produto",
+        ProdutoRepo.aobter_todos,
+        ProdutoRepo.aobter_alterados_desde,
+        since,
+    )
 
 
 @router.post("/inserir_produto", status_code=201)
@@ -61,7 +94,7 @@ async def inserir_produto(nome: str = Form(...),
         return JSONResponse(pd.to_dict(), status_code=422)
     await asyncio.sleep(SLEEP_TIME)
     novo_produto = Produto(None, produto_dto.id_categoria, produto_dto.nome, produto_dto.preco, produto_dto.descricao, produto_dto.estoque)
-    novo_produto = ProdutoRepo.inserir(novo_produto)
+    novo_produto = await ProdutoRepo.ainserir(novo_produto)
     if novo_produto:
         imagem_quadrada = transformar_em_quadrada(imagem)
         imagem_quadrada.save("static/img/produtos/{id:04d}.jpg", "JPEG", optimize=True)
@@ -77,7 +110,7 @@ async def inserir_produto(nome: str = Form(...),
 @router.post("/excluir_produto", status_code=204)
 async def excluir_produto(id_produto: int = Form(..., title="Id do Produto", ge=1)):
     await asyncio.sleep(SLEEP_TIME)
-    if ProdutoRepo.excluir(id_produto):
+    if await ProdutoRepo.aexcluir(id_produto):
         return None
     pd = ProblemDetailsDto(
         "int",
@@ -91,7 +124,7 @@ async def excluir_produto(id_produto: int = Form(..., title="Id do Produto", ge=
 @router.get("/obter_produto/{id_produto}")
 async def obter_produto(id_produto: int = Path(..., title="Id do Produto", ge=1)):
     await asyncio.sleep(SLEEP_TIME)
-    produto = ProdutoRepo.obter_um(id_produto)
+    produto = await ProdutoRepo.aobter_um(id_produto)
     if produto:
         return produto
     pd = ProblemDetailsDto(
@@ -109,7 +142,7 @@ async def alterar_produto(inputDto: AlterarProdutoDto):
     produto = Produto(
         inputDto.id, inputDto.id_categoria, inputDto.nome, inputDto.preco, inputDto.descricao, inputDto.estoque
     )
-    if ProdutoRepo.alterar(produto):
+    if await ProdutoRepo.aalterar(produto):
         return None
     pd = ProblemDetailsDto(
         "int",
@@ -120,38 +153,104 @@ async def alterar_produto(inputDto: AlterarProdutoDto):
     return JSONResponse(pd.to_dict(), status_code=404)
 
 
-@router.post("/alterar_pedido", status_code=204)
-async def alterar_pedido(inputDto: AlterarPedidoDto):
-    await asyncio.sleep(SLEEP_TIME)
-    if PedidoRepo.alterar_estado(inputDto.id, inputDto.estado.value):
+async def _alterar_estado_pedido(
+    id_pedido: int, estado: str, conexao: sqlite3.Connection
+) -> Optional[JSONResponse]:
+    # um pedido só, pela mesma máquina de estados da alteração em lote:
+    # None (204) se alterado; senão 404, 422 ou 500
+    resultados = await PedidoService.aalterar_estados(
+        [id_pedido], estado, conexao=conexao
+    )
+    if resultados is None:
+        pd = ProblemDetailsDto(
+            "int",
+            f"Não foi possível alterar o estado do pedido <b>{id_pedido}</b>.",
+            "state_change_failed",
+            ["body", "id"],
+        )
+        return JSONResponse(pd.to_dict(), status_code=500)
+    resultado = resultados[0]
+    if resultado.alterado:
         return None
+    if resultado.erro == ERRO_PEDIDO_NAO_ENCONTRADO:
+        pd = ProblemDetailsDto(
+            "int",
+            f"O pedido com id <b>{id_pedido}</b> não foi encontrado.",
+            "value_not_found",
+            ["body", "id"],
+        )
+        return JSONResponse(pd.to_dict(), status_code=404)
+    if resultado.erro == ERRO_ESTOQUE_INSUFICIENTE:
+        pd = ProblemDetailsDto(
+            "int",
+            f"Não há estoque suficiente para os itens do pedido <b>{id_pedido}</b>.",
+            "stock_insufficient",
+            ["body", "id"],
+        )
+        return JSONResponse(pd.to_dict(), status_code=422)
     pd = ProblemDetailsDto(
         "int",
-        f"O pedido com id <b>{inputDto.id}</b> não foi encontrado.",
-        "value_not_found",
+        f"O pedido com id <b>{id_pedido}</b> não pode passar de "
+        f"<b>{resultado.estado_anterior}</b> para <b>{estado}</b>.",
+        "state_change_invalid",
         ["body", "id"],
     )
-    return JSONResponse(pd.to_dict(), status_code=404)
+    return JSONResponse(pd.to_dict(), status_code=422)
+
+
+@router.post("/alterar_pedido", status_code=204)
+async def alterar_pedido(
+    inputDto: AlterarPedidoDto,
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
+    await asyncio.sleep(SLEEP_TIME)
+    return await _alterar_estado_pedido(inputDto.id, inputDto.estado.value, conexao)
+
+
+@router.post("/alterar_estado_pedidos")
+async def alterar_estado_pedidos(
+    inputDto: AlterarEstadoPedidosDto,
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
+    await asyncio.sleep(SLEEP_TIME)
+    resultados = await PedidoService.aalterar_estados(
+        inputDto.ids, inputDto.estado.value, conexao=conexao
+    )
+    if resultados is None:
+        pd = ProblemDetailsDto(
+            "int",
+            "Não foi possível alterar o estado dos pedidos; nenhum foi alterado.",
+            "state_change_failed",
+            ["body", "ids"],
+        )
+        return JSONResponse(pd.to_dict(), status_code=500)
+    alterados = sum(1 for resultado in resultados if resultado.alterado)
+    return {
+        "estado": inputDto.estado.value,
+        "alterados": alterados,
+        "rejeitados": len(resultados) - alterados,
+        "resultados": resultados,
+    }
 
 
 @router.post("/cancelar_pedido", status_code=204)
-async def cancelar_pedido(id_pedido: int = Form(..., title="Id do Pedido", ge=1)):
+async def cancelar_pedido(
+    id_pedido: int = Form(..., title="Id do Pedido", ge=1),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
     await asyncio.sleep(SLEEP_TIME)
-    if PedidoRepo.alterar_estado(id_pedido, EstadoPedido.CANCELADO.value):
-        return None
-    pd = ProblemDetailsDto(
-        "int",
-        f"O pedido com id <b>{id_pedido}</b> não foi encontrado.",
-        "value_not_found",
-        ["body", "id"],
+    return await _alterar_estado_pedido(
+        id_pedido, EstadoPedido.CANCELADO.value, conexao
     )
-    return JSONResponse(pd.to_dict(), status_code=404)
 
 
 @router.post("/evoluir_pedido", status_code=204)
-async def evoluir_pedido(id_pedido: int = Form(..., title="Id do Pedido", ge=1)):
+async def evoluir_pedido(
+    id_pedido: int = Form(..., title="Id do Pedido", ge=1),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
     await asyncio.sleep(SLEEP_TIME)
-    pedido = PedidoRepo.obter_por_id(id_pedido)
+    pedido = await PedidoRepo.aobter_por_id(id_pedido, conexao=conexao)
     if not pedido:
         pd = ProblemDetailsDto(
             "int",
@@ -160,33 +259,24 @@ async def evoluir_pedido(id_pedido: int = Form(..., title="Id do Pedido", ge=1))
             ["body", "id"],
         )
         return JSONResponse(pd.to_dict(), status_code=404)
-    estado_atual = pedido.estado
-    estados = [e.value for e in list(EstadoPedido) if e != EstadoPedido.CANCELADO]
-    indice = estados.index(estado_atual)
-    indice += 1
-    if indice < len(estados):
-        novo_estado = estados[indice]
-        if PedidoRepo.alterar_estado(id_pedido, novo_estado):
-            return None
-    pd = ProblemDetailsDto(
-        "int",
-        f"O pedido com id <b>{id_pedido}</b> não pode ter seu estado evoluído para <b>cancelado</b>.",
-        "state_change_invalid",
-        ["body", "id"],
-    )
-    return JSONResponse(pd.to_dict(), status_code=404)
+    novo_estado = proximo_estado(pedido.estado)
+    if novo_estado is None:
+        pd = ProblemDetailsDto(
+            "int",
+            f"O pedido com id <b>{id_pedido}</b> está <b>{pedido.estado}</b> e não pode ter seu estado evoluído.",
+            "state_change_invalid",
+            ["body", "id"],
+        )
+        return JSONResponse(pd.to_dict(), status_code=422)
+    return await _alterar_estado_pedido(id_pedido, novo_estado, conexao)
 
 
 @router.get("/obter_pedido/{id_pedido}")
 async def obter_pedido(id_pedido: int = Path(..., title="Id do Pedido", ge=1)):
     # TODO: refatorar criando Dto com resultado específico
     await asyncio.sleep(SLEEP_TIME)
-    pedido = PedidoRepo.obter_por_id(id_pedido)
+    pedido = await PedidoRepo.aobter_detalhado(id_pedido)
     if pedido:
-        itens = ItemPedidoRepo.obter_por_pedido(pedido.id)
-        cliente = UsuarioRepo.obter_por_id(pedido.id_cliente)
-        pedido.itens = itens
-        pedido.cliente = cliente
         return pedido
     pd = ProblemDetailsDto(
         "int",
@@ -199,24 +289,85 @@ async def obter_pedido(id_pedido: int = Path(..., title="Id do Pedido", ge=1)):
 
 @router.get("/obter_pedidos_por_estado/{estado}")
 async def obter_pedidos_por_estado(
-    estado: EstadoPedido = Path(..., title="Estado do Pedido")
+    request: Request,
+    estado: EstadoPedido = Path(..., title="Estado do Pedido"),
+    since: Optional[int] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=TAMANHO_PAGINA_MAXIMO),
+    cursor: Optional[str] = Query(None),
+    formato: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
 ):
     await asyncio.sleep(SLEEP_TIME)
-    pedidos = PedidoRepo.obter_todos_por_estado(estado.value)
-    return pedidos
+    ndjson = pedir_ndjson(request, formato)
+    if limit or cursor or ndjson:
+        return await responder_listagem_paginada(
+            request,
+            "pedido",
+            lambda tamanho, cursor: PedidoRepo.aobter_pagina_por_estado(
+                estado.value, tamanho, cursor, com_itens=True
+            ),
+            limit,
+            cursor,
+            ndjson,
+        )
+    return await responder_listagem(
+        request,
+        "pedido",
+        lambda: PedidoRepo.aobter_todos_por_estado(estado.value, com_itens=True),
+        lambda desde: PedidoRepo.aobter_alterados_por_estado_desde(
+            estado.value, desde, com_itens=True
+        ),
+        since,
+        lambda desde: PedidoRepo.aobter_ids_saidos_do_estado_desde(
+            estado.value, desde
+        ),
+    )
 
 
 @router.get("/obter_usuarios")
-async def obter_usuarios() -> List[Usuario]:
+async def obter_usuarios(
+    request: Request,
+    since: Optional[int] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=TAMANHO_PAGINA_MAXIMO),
+    cursor: Optional[str] = Query(None),
+    formato: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    q: Optional[str] = Query(None, max_length=128),
+):
     await asyncio.sleep(SLEEP_TIME)
-    usuarios = UsuarioRepo.obter_todos()
-    return usuarios
+    ndjson = pedir_ndjson(request, formato)
+    if q is not None:
+        # busca por nome ou CPF, sempre em páginas por (nome, id)
+        return await responder_listagem_paginada(
+            request,
+            "usuario",
+            lambda tamanho, cursor: UsuarioRepo.aobter_busca_cursor(
+                q, tamanho, cursor
+            ),
+            limit,
+            cursor,
+            ndjson,
+        )
+    if limit or cursor or ndjson:
+        return await responder_listagem_paginada(
+            request,
+            "usuario",
+            UsuarioRepo.aobter_pagina,
+            limit,
+            cursor,
+            ndjson,
+        )
+    return await responder_listagem(
+        request,
+        "usuario",
+        UsuarioRepo.aobter_todos,
+        UsuarioRepo.aobter_alterados_desde,
+        since,
+    )
 
 
 @router.post("/excluir_usuario", status_code=204)
 async def excluir_usuario(id_usuario: int = Form(...)):
     await asyncio.sleep(SLEEP_TIME)
-    if UsuarioRepo.excluir(id_usuario):
+    if await UsuarioRepo.aexcluir(id_usuario):
         return None
     pd = ProblemDetailsDto(
         "int",
@@ -227,15 +378,20 @@ async def excluir_usuario(id_usuario: int = Form(...)):
     return JSONResponse(pd.to_dict(), status_code=404)
 
 @router.get("/obter_categorias")
-async def obter_categorias() -> List[Categoria]:
+async def obter_categorias(request: Request, since: Optional[int] = Query(None)):
     await asyncio.sleep(SLEEP_TIME)
-    categorias = CategoriaRepo.obter_todos()
-    return categorias
+    return await responder_listagem(
+        request,
+        "categoria",
+        CategoriaRepo.aobter_todos,
+        CategoriaRepo.aobter_alterados_desde,
+        since,
+    )
 
 @router.post("/excluir_categoria", status_code=204)
 async def excluir_categoria(id_categoria: int = Form(...)):
     await asyncio.sleep(SLEEP_TIME)
-    if CategoriaRepo.excluir(id_categoria):
+    if await CategoriaRepo.aexcluir(id_categoria):
         return None
     pd = ProblemDetailsDto(
         "int",
@@ -254,7 +410,7 @@ async def inserir_produto(nome: str = Form(...),
          descricao= descricao
     )
     nova_categoria = Categoria(None, categoria_dto.nome, categoria_dto.descricao)
-    nova_categoria = CategoriaRepo.inserir(nova_categoria)
+    nova_categoria = await CategoriaRepo.ainserir(nova_categoria)
     if nova_categoria:
         return nova_categoria
     pd = ProblemDetailsDto(
@@ -268,7 +424,7 @@ async def inserir_produto(nome: str = Form(...),
 @router.get("/obter_categoria/{id_categoria}")
 async def obter_categoria(id_categoria: int = Path(..., title="Id da Categoria", ge=1)):
     await asyncio.sleep(SLEEP_TIME)
-    categoria = CategoriaRepo.obter_um(id_categoria)
+    categoria = await CategoriaRepo.aobter_um(id_categoria)
     return categoria
     
 @router.post("/alterar_categoria", status_code=204)
@@ -279,7 +435,7 @@ async def alterar_categoria(
 ):
     await asyncio.sleep(SLEEP_TIME)
     categoria = Categoria(id, nome, descricao)
-    if CategoriaRepo.alterar(categoria):
+    if await CategoriaRepo.aalterar(categoria):
         return None
     pd = ProblemDetailsDto(
         "int",
@@ -287,4 +443,42 @@ async def alterar_categoria(
         "value_not_found",
         ["body", "id"],
     )
-    return JSONResponse(pd.to_dict(), status_code=404)
\ No newline at end of file
+    return JSONResponse(pd.to_dict(), status_code=404)
+
+
+@router.get("/obter_estatisticas_pool")
+async def obter_estatisticas_conexoes():
+    return obter_estatisticas_pool()
+
+
+@router.post("/importar/{tabela}")
+async def importar_registros(
+    tabela: str,
+    arquivo: UploadFile = File(...),
+    formato: Optional[str] = Form(None),
+):
+    try:
+        formato = formato or detectar_formato(arquivo.filename or "")
+        resultado = await aimportar_binario(tabela, arquivo.file, formato)
+    except ErroImportacao as ex:
+        pd = ProblemDetailsDto("str", str(ex), "invalid_import", ["body", "arquivo"])
+        return JSONResponse(pd.to_dict(), status_code=422)
+    return asdict(resultado)
+
+
+@router.get("/obter_estatisticas_senhas")
+async def obter_estatisticas_senhas():
+    return pool_senhas.estatisticas()
+
+
+@router.get("/obter_estatisticas_limite_taxa")
+async def obter_estatisticas_limite_taxa():
+    return limite_taxa.estatisticas()
+
+
+@router.get("/obter_estatisticas_cache")
+async def obter_estatisticas_cache():
+    return {
+        "catalogo": cache_catalogo.estatisticas(),
+        "paginas": cache_paginas.estatisticas(),
+    }
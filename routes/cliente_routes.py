@@ -1,20 +1,44 @@
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Form, HTTPException, Path, Query, Request, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Form,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    status,
+)
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 import mercadopago as mp
 import os
+import sqlite3
+from typing import Optional
 
 from dtos.alterar_usuario_dto import AlterarUsuarioDTO
 from dtos.alterar_senha_dto import AlterarSenhaDTO
 from models.usuario_model import Usuario
-from models.item_pedido_model import ItemPedido
 from models.pedido_model import EstadoPedido, Pedido
 from repositories.usuario_repo import UsuarioRepo
 from repositories.item_pedido_repo import ItemPedidoRepo
 from repositories.pedido_repo import PedidoRepo
-from repositories.produto_repo import ProdutoRepo
-from util.auth_cookie import conferir_senha, obter_hash_senha
+from repositories.resumo_cliente_repo import ResumoClienteRepo
+from services.carrinho_service import CarrinhoService
+from services.estoque_service import EstoqueService
+from services.pedido_service import PedidoService
+from util.buffer_carrinho import (
+    alterar_quantidade,
+    aplicar_pendentes,
+    buffer_carrinho,
+    buffer_carrinho_habilitado,
+    gravar_buffer_carrinho,
+)
+from util.database import executar_no_banco, obter_conexao_requisicao
+from util.senhas import aconferir_senha, aobter_hash_senha
+from util.sessoes import armazenamento_sessoes, autenticacao_por_cookie
 from util.cookies import (
+    NOME_COOKIE_AUTH,
+    adicionar_cookie_auth,
     adicionar_mensagem_alerta,
     adicionar_mensagem_erro,
     adicionar_mensagem_sucesso,
@@ -26,8 +50,15 @@ router = APIRouter(prefix="/cliente", include_in_schema=False)
 templates = obter_jinja_templates("templates/cliente")
 
 
+TAMANHO_PAGINA_PEDIDOS = 10
+
+
 @router.get("/pedidos")
-async def get_pedidos(request: Request, periodo: str = Query("todos")):
+async def get_pedidos(
+    request: Request,
+    periodo: str = Query("todos"),
+    cursor: Optional[str] = Query(None),
+):
     data_inicial = datetime(1900, 1, 1)
     data_final = datetime.now()
     match periodo:
@@ -37,10 +68,23 @@ async def get_pedidos(request: Request, periodo: str = Query("todos")):
             data_inicial = data_final - timedelta(days=60)
         case "90":
             data_inicial = data_final - timedelta(days=90)
-    pedidos = PedidoRepo.obter_por_periodo(request.state.usuario.id, data_inicial, data_final)
+    id_cliente = request.state.usuario.id
+    # o resumo vem pronto de resumo_cliente; a lista é paginada por cursor
+    resumo = await ResumoClienteRepo.aobter(id_cliente)
+    pagina = await PedidoRepo.aobter_pagina_por_periodo(
+        id_cliente, data_inicial, data_final, TAMANHO_PAGINA_PEDIDOS, cursor
+    )
     return templates.TemplateResponse(
         "pages/pedidos.html",
-        {"request": request, "pedidos": pedidos},
+        {
+            "request": request,
+            "resumo": resumo,
+            "pedidos": pagina.itens if pagina else [],
+            "periodo": periodo,
+            "pagina_atual": pagina.numero if pagina else 1,
+            "cursor_anterior": pagina.cursor_anterior if pagina else None,
+            "cursor_proximo": pagina.cursor_proximo if pagina else None,
+        },
     )
 
 
@@ -59,7 +103,7 @@ async def post_cadastro(request: Request, alterar_dto: AlterarUsuarioDTO):
     id = request.state.usuario.id
     cliente_data = alterar_dto.model_dump()
     response = JSONResponse({"redirect": {"url": "/cliente/cadastro"}})
-    if UsuarioRepo.alterar(Usuario(id, **cliente_data)):
+    if await UsuarioRepo.aalterar(Usuario(id, **cliente_data)):
         adicionar_mensagem_sucesso(response, "Cadastro alterado com sucesso!")
     else:
         adicionar_mensagem_erro(
@@ -79,13 +123,21 @@ async def get_senha(request: Request):
 @router.post("/post_senha", response_class=JSONResponse)
 async def post_senha(request: Request, alterar_dto: AlterarSenhaDTO):
     email = request.state.usuario.email
-    cliente_bd = UsuarioRepo.obter_por_email(email)
-    nova_senha_hash = obter_hash_senha(alterar_dto.nova_senha)
+    cliente_bd = await UsuarioRepo.aobter_por_email(email)
     response = JSONResponse({"redirect": {"url": "/cliente/senha"}})
-    if not conferir_senha(alterar_dto.senha, cliente_bd.senha):
+    if not await aconferir_senha(alterar_dto.senha, cliente_bd.senha):
         adicionar_mensagem_erro(response, "Senha atual incorreta!")
         return response
-    if UsuarioRepo.alterar_senha(cliente_bd.id, nova_senha_hash):
+    # o hash da nova senha só é calculado depois de conferir a atual
+    nova_senha_hash = await aobter_hash_senha(alterar_dto.nova_senha)
+    if await UsuarioRepo.aalterar_senha(cliente_bd.id, nova_senha_hash):
+        # encerra as sessões abertas com a senha antiga, inclusive em outros
+        # navegadores; este segue logado com uma sessão nova
+        await armazenamento_sessoes.encerrar_do_usuario(cliente_bd.id)
+        if autenticacao_por_cookie():
+            token = await armazenamento_sessoes.criar(cliente_bd)
+            if token:
+                adicionar_cookie_auth(response, token, armazenamento_sessoes.duracao)
         adicionar_mensagem_sucesso(response, "Senha alterada com sucesso!")
     else:
         adicionar_mensagem_erro(response, "Não foi possível alterar sua senha!")
@@ -94,8 +146,11 @@ async def post_senha(request: Request, alterar_dto: AlterarSenhaDTO):
 
 @router.get("/sair", response_class=RedirectResponse)
 async def get_sair(request: Request):
-    if request.state.usuario:
-        UsuarioRepo.alterar_token(request.state.usuario.email, "")
+    # na autenticação por cookie encerra a sessão no banco e no cache; no
+    # modo JWT não há sessão e a exclusão não encontra nada
+    token = request.cookies.get(NOME_COOKIE_AUTH, "").strip()
+    if token:
+        await armazenamento_sessoes.encerrar(token)
     response = RedirectResponse("/", status.HTTP_303_SEE_OTHER)
     excluir_cookie_auth(response)
     adicionar_mensagem_sucesso(response, "Saída realizada com sucesso!")
@@ -104,48 +159,61 @@ async def get_sair(request: Request):
 
 @router.get("/carrinho")
 async def get_carrinho(request: Request):
-    pedidos = PedidoRepo.obter_por_estado(
+    pedidos = await PedidoRepo.aobter_por_estado(
         request.state.usuario.id, EstadoPedido.CARRINHO.value
     )
     pedido_carrinho = pedidos[0] if pedidos else None
-    if pedido_carrinho:
-        itens_pedido = ItemPedidoRepo.obter_por_pedido(pedido_carrinho.id)
-    if not pedido_carrinho or not itens_pedido:
+    if not pedido_carrinho or not pedido_carrinho.quantidade_itens:
         response = RedirectResponse("/", status.HTTP_303_SEE_OTHER)
         adicionar_mensagem_alerta(
             response,
             "Seu carrinho está vazio. Adicione produtos para continuar."
         )
         return response
-    total_pedido = sum([item.valor_item for item in itens_pedido])
+    itens_pedido = await ItemPedidoRepo.aobter_por_pedido(pedido_carrinho.id)
+    # cliques ainda no buffer aparecem sem forçar a gravação
+    valor_total = pedido_carrinho.valor_total + aplicar_pendentes(itens_pedido)
     return templates.TemplateResponse(
         "pages/carrinho.html",
-        {"request": request, "itens": itens_pedido, "valor_total": total_pedido},
+        {
+            "request": request,
+            "itens": itens_pedido,
+            "valor_total": valor_total,
+        },
     )
 
 
 @router.get("/confirmacaopedido")
-async def get_confirmacaopedido(request: Request):
-    pedidos = PedidoRepo.obter_por_estado(
-        request.state.usuario.id, EstadoPedido.CARRINHO.value
+async def get_confirmacaopedido(
+    request: Request,
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
+    pedidos = await PedidoRepo.aobter_por_estado(
+        request.state.usuario.id, EstadoPedido.CARRINHO.value, conexao=conexao
     )
     pedido_carrinho = pedidos[0] if pedidos else None
-    if not pedido_carrinho:
-        return RedirectResponse("/cliente/carrinho", status.HTTP_303_SEE_OTHER)
-    itens_pedido = ItemPedidoRepo.obter_por_pedido(pedido_carrinho.id)
-    if not itens_pedido:
+    # o pedido é fechado com as quantidades que ainda estão no buffer
+    if pedido_carrinho:
+        await gravar_buffer_carrinho(pedido_carrinho.id)
+    if not pedido_carrinho or not pedido_carrinho.quantidade_itens:
         return RedirectResponse("/cliente/carrinho", status.HTTP_303_SEE_OTHER)
-    valor_total = sum([item.valor_produto * item.quantidade for item in itens_pedido])
-    usuario = UsuarioRepo.obter_por_id(request.state.usuario.id)
-    PedidoRepo.atualizar_para_fechar(
-        pedido_carrinho.id, usuario.endereco, valor_total
+    usuario = await UsuarioRepo.aobter_por_id(request.state.usuario.id, conexao=conexao)
+    await PedidoRepo.aatualizar_para_fechar(
+        pedido_carrinho.id, usuario.endereco, conexao=conexao
     )
     return RedirectResponse(f"/cliente/detalhespedido/{pedido_carrinho.id}")
 
 
 @router.get("/pagamentopedido/{id_pedido:int}", response_class=HTMLResponse)
-async def get_pagamento(request: Request, id_pedido: int = Path(...)):
-    pedido = PedidoRepo.obter_por_id(id_pedido)
+async def get_pagamento(
+    request: Request,
+    id_pedido: int = Path(...),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
+    # grava o buffer deste worker; o que outro worker ainda tiver deste
+    # carrinho é descartado quando ele deixa de ser carrinho
+    await gravar_buffer_carrinho(id_pedido)
+    pedido = await PedidoRepo.aobter_por_id(id_pedido, conexao=conexao)
     # se o pedido não existe, ou não pertence ao cliente logado
     if not pedido or (pedido and (pedido.id_cliente != request.state.usuario.id)):
         response = RedirectResponse(
@@ -164,13 +232,35 @@ async def get_pagamento(request: Request, id_pedido: int = Path(...)):
             response, "O pedido em questão não está apto a receber pagamento."
         )
         return response
+    # reserva o estoque de todos os itens antes de enviar para pagamento;
+    # um pedido pendente que volta aqui só tem a reserva prorrogada
+    if not await EstoqueService.areservar(id_pedido, conexao=conexao):
+        indisponiveis = await EstoqueService.aobter_itens_indisponiveis(
+            id_pedido, conexao=conexao
+        )
+        url = (
+            "/cliente/carrinho"
+            if pedido.estado == EstadoPedido.CARRINHO.value
+            else f"/cliente/detalhespedido/{id_pedido}"
+        )
+        response = RedirectResponse(url=url, status_code=status.HTTP_302_FOUND)
+        adicionar_mensagem_erro(
+            response,
+            "Não há estoque suficiente para: <b>"
+            + ", ".join(indisponiveis)
+            + "</b>. Ajuste as quantidades e tente novamente.",
+        )
+        return response
     # muda o estado do pedido para PENDENTE
-    PedidoRepo.alterar_estado(id_pedido, EstadoPedido.PENDENTE.value)
+    await PedidoRepo.aalterar_estado(
+        id_pedido, EstadoPedido.PENDENTE.value, conexao=conexao
+    )
     # captura os itens do pedido
-    itens = ItemPedidoRepo.obter_por_pedido(pedido.id)
-    total_pedido = sum([item.valor_item for item in itens])
-    pedido.itens = itens
-    PedidoRepo.atualizar_para_fechar(pedido.id, pedido.endereco_entrega, total_pedido)
+    pedido.itens = await ItemPedidoRepo.aobter_por_pedido(pedido.id, conexao=conexao)
+    total_pedido = pedido.valor_total
+    # confirma a transação antes de chamar o Mercado Pago, para não manter
+    # o banco bloqueado para escrita durante a requisição externa
+    await executar_no_banco(conexao.commit)
     # access_token = os.getenv("ACCESS_TOKEN_MP_PROD")
     access_token = os.getenv("ACCESS_TOKEN_MP_TEST")
     print(f"\n\n\nTOKEN: {access_token}\n\n\n")
@@ -211,13 +301,51 @@ async def get_pagamento(request: Request, id_pedido: int = Path(...)):
         )
 
 
+async def _pagar_pedido(
+    pedido: Pedido, conexao: sqlite3.Connection
+) -> Optional[RedirectResponse]:
+    # leva o pedido a PAGO com a baixa definitiva do estoque; devolve None se
+    # deu certo ou o redirecionamento com o erro. O retorno do Mercado Pago
+    # pode chegar mais de uma vez, então um pedido já pago fica como está
+    if pedido.estado == EstadoPedido.PAGO.value:
+        return None
+    resultados = await PedidoService.aalterar_estados(
+        [pedido.id], EstadoPedido.PAGO.value, conexao=conexao
+    )
+    if resultados and resultados[0].alterado:
+        return None
+    # a reserva venceu e o estoque acabou: o pedido continua pendente
+    indisponiveis = await EstoqueService.aobter_itens_indisponiveis(
+        pedido.id, conexao=conexao
+    )
+    response = RedirectResponse(
+        url=f"/cliente/detalhespedido/{pedido.id}", status_code=status.HTTP_302_FOUND
+    )
+    if indisponiveis:
+        mensagem = (
+            f"Não foi possível confirmar o pedido {pedido.id:06d}: não há mais "
+            "estoque suficiente para <b>"
+            + ", ".join(indisponiveis)
+            + "</b>. Entre em contato com a loja para o estorno do pagamento."
+        )
+    else:
+        mensagem = f"Não foi possível confirmar o pagamento do pedido {pedido.id:06d}."
+    adicionar_mensagem_erro(response, mensagem)
+    return response
+
+
 @router.get("/mp/sucesso/{id_pedido:int}", response_class=HTMLResponse)
 async def get_mp_sucesso(
     request: Request,
     id_pedido: int = Path(...),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
 ):
-    pedido = PedidoRepo.obter_por_id(id_pedido)
-    PedidoRepo.alterar_estado(id_pedido, EstadoPedido.PAGO.value)
+    pedido = await PedidoRepo.aobter_por_id(id_pedido, conexao=conexao)
+    if not pedido or pedido.id_cliente != request.state.usuario.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    response = await _pagar_pedido(pedido, conexao)
+    if response:
+        return response
     return RedirectResponse(f"/cliente/pedidoconfirmado/{id_pedido}")
 
 
@@ -238,139 +366,123 @@ async def get_mp_falha(
 async def get_mp_pendente(
     request: Request,
     id_pedido: int = Path(...),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
 ):
-    pedido = PedidoRepo.obter_por_id(id_pedido)
-    PedidoRepo.alterar_estado(id_pedido, EstadoPedido.PAGO.value)
+    pedido = await PedidoRepo.aobter_por_id(id_pedido, conexao=conexao)
+    if not pedido or pedido.id_cliente != request.state.usuario.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    response = await _pagar_pedido(pedido, conexao)
+    if response:
+        return response
     return RedirectResponse(f"/cliente/detalhespedido/{id_pedido}")
 
 
 @router.post("/post_adicionar_carrinho", response_class=RedirectResponse)
-async def post_adicionar_carrinho(request: Request, id_produto: int = Form(...)):
-    produto = ProdutoRepo.obter_um(id_produto)
-    mensagem = f"O produto <b>{produto.nome}</b> foi adicionado ao carrinho."
-    pedidos = PedidoRepo.obter_por_estado(
-        request.state.usuario.id, EstadoPedido.CARRINHO.value
+async def post_adicionar_carrinho(
+    request: Request,
+    id_produto: int = Form(...),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
+    pedido_carrinho = await CarrinhoService.aadicionar(
+        request.state.usuario.id, id_produto, conexao=conexao
     )
-    pedido_carrinho = pedidos[0] if pedidos else None
-    usuario = UsuarioRepo.obter_por_id(request.state.usuario.id)
-    if pedido_carrinho == None:
-        pedido_carrinho = Pedido(
-            0,  # id
-            datetime.now(),
-            0,  # valor_total
-            usuario.endereco,
-            EstadoPedido.CARRINHO.value,
-            request.state.usuario.id,
-        )
-        pedido_carrinho = PedidoRepo.inserir(pedido_carrinho)
-    qtde = ItemPedidoRepo.obter_quantidade_por_produto(pedido_carrinho.id, id_produto)
-    if qtde == 0:
-        item_pedido = ItemPedido(
-            pedido_carrinho.id, id_produto, produto.nome, produto.preco, 1, 0
-        )
-        ItemPedidoRepo.inserir(item_pedido)
-    else:
-        ItemPedidoRepo.aumentar_quantidade_produto(pedido_carrinho.id, id_produto)
-        mensagem = f"O produto <b>{produto.nome}</b> já estava no carrinho e teve sua quantidade aumentada."
-    PedidoRepo.atualizar_valor_total(pedido_carrinho.id)
     response = RedirectResponse("/cliente/carrinho", status.HTTP_303_SEE_OTHER)
+    item = pedido_carrinho and CarrinhoService.obter_item(pedido_carrinho, id_produto)
+    if not item:
+        adicionar_mensagem_alerta(response, "Produto não encontrado.")
+        return response
+    if item.quantidade == 1:
+        mensagem = f"O produto <b>{item.nome_produto}</b> foi adicionado ao carrinho."
+    else:
+        mensagem = f"O produto <b>{item.nome_produto}</b> já estava no carrinho e teve sua quantidade aumentada."
     adicionar_mensagem_sucesso(response, mensagem)
     return response
 
 
 @router.post("/post_aumentar_item", response_class=RedirectResponse)
-async def post_aumentar_item(request: Request, id_produto: int = Form(0)):
-    produto = ProdutoRepo.obter_um(id_produto)
-    pedidos = PedidoRepo.obter_por_estado(
-        request.state.usuario.id, EstadoPedido.CARRINHO.value
-    )
-    pedido_carrinho = pedidos[0] if pedidos else None
-    if pedido_carrinho == None:
-        response = RedirectResponse(
-            f"/produto?id={id_produto}", status.HTTP_303_SEE_OTHER
+async def post_aumentar_item(
+    request: Request,
+    id_produto: int = Form(0),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
+    if buffer_carrinho_habilitado():
+        item = await alterar_quantidade(request.state.usuario.id, id_produto, 1)
+    else:
+        pedido_carrinho = await CarrinhoService.aaumentar(
+            request.state.usuario.id, id_produto, conexao=conexao
         )
-        adicionar_mensagem_alerta(
-            f"Seu carrinho não foi encontrado. Adicione este produto ao carrinho novamente."
+        item = pedido_carrinho and CarrinhoService.obter_item(
+            pedido_carrinho, id_produto
         )
-        return response
-    qtde = ItemPedidoRepo.obter_quantidade_por_produto(pedido_carrinho.id, id_produto)
-    if qtde == 0:
+    if not item:
         response = RedirectResponse(
-            f"/produto?id={id_produto}", status.HTTP_303_SEE_OTHER
+            f"/produto/{id_produto}", status.HTTP_303_SEE_OTHER
         )
         adicionar_mensagem_alerta(
-            f"Este produto não foi encontrado em seu carrinho. Adicione-o novamente."
+            response,
+            f"Este produto não foi encontrado em seu carrinho. Adicione-o novamente.",
         )
         return response
-    ItemPedidoRepo.aumentar_quantidade_produto(pedido_carrinho.id, id_produto)
     response = RedirectResponse("/cliente/carrinho", status.HTTP_303_SEE_OTHER)
     adicionar_mensagem_sucesso(
         response,
-        f"O produto <b>{produto.nome}</b> teve sua quantidade aumentada para <b>{qtde+1}</b>.",
+        f"O produto <b>{item.nome_produto}</b> teve sua quantidade aumentada para <b>{item.quantidade}</b>.",
     )
-    PedidoRepo.atualizar_valor_total(pedido_carrinho.id)
     return response
 
 
 @router.post("/post_reduzir_item", response_class=RedirectResponse)
-async def post_reduzir_item(request: Request, id_produto: int = Form(0)):
-    produto = ProdutoRepo.obter_um(id_produto)
-    pedidos = PedidoRepo.obter_por_estado(
-        request.state.usuario.id, EstadoPedido.CARRINHO.value
-    )
-    pedido_carrinho = pedidos[0] if pedidos else None
+async def post_reduzir_item(
+    request: Request,
+    id_produto: int = Form(0),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
     response = RedirectResponse("/cliente/carrinho", status.HTTP_303_SEE_OTHER)
-    if pedido_carrinho == None:
-        adicionar_mensagem_alerta(f"Seu carrinho não foi encontrado.")
-        return response
-    qtde = ItemPedidoRepo.obter_quantidade_por_produto(pedido_carrinho.id, id_produto)
-    if qtde == 0:
+    if buffer_carrinho_habilitado():
+        item = await alterar_quantidade(request.state.usuario.id, id_produto, -1)
+        encontrado = item is not None
+    else:
+        pedido_carrinho = await CarrinhoService.adiminuir(
+            request.state.usuario.id, id_produto, conexao=conexao
+        )
+        encontrado = pedido_carrinho is not None
+        item = pedido_carrinho and CarrinhoService.obter_item(
+            pedido_carrinho, id_produto
+        )
+    if not encontrado:
         adicionar_mensagem_alerta(
-            f"O produto {id_produto} não foi encontrado em seu carrinho."
+            response, f"O produto {id_produto} não foi encontrado em seu carrinho."
         )
         return response
-    if qtde == 1:
-        ItemPedidoRepo.excluir(pedido_carrinho.id, id_produto)
-        adicionar_mensagem_sucesso(
-            response, f"O produto <b>{produto.nome}</b> foi excluído do carrinho."
-        )
+    if not item or item.quantidade == 0:
+        adicionar_mensagem_sucesso(response, "O produto foi excluído do carrinho.")
         return response
-    ItemPedidoRepo.diminuir_quantidade_produto(pedido_carrinho.id, id_produto)
     adicionar_mensagem_sucesso(
         response,
-        f"O produto <b>{produto.nome}</b> teve sua quantidade diminuída para <b>{qtde-1}</b>.",
+        f"O produto <b>{item.nome_produto}</b> teve sua quantidade diminuída para <b>{item.quantidade}</b>.",
     )
-    PedidoRepo.atualizar_valor_total(pedido_carrinho.id)
     return response
 
 
 @router.post("/post_remover_item", response_class=RedirectResponse)
-async def post_remover_item(request: Request, id_produto: int = Form(0)):
+async def post_remover_item(
+    request: Request,
+    id_produto: int = Form(0),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
+    response = RedirectResponse("/cliente/carrinho", status.HTTP_303_SEE_OTHER)
     if not id_produto:
-        return RedirectResponse("/cliente/carrinho", status.HTTP_304_NOT_MODIFIED)
-    produto = ProdutoRepo.obter_um(id_produto)
-    if not produto:
-        response = RedirectResponse("/cliente/carrinho", status.HTTP_304_NOT_MODIFIED)
-        adicionar_mensagem_alerta(response, "Produto não encontrado.")
         return response
-    pedidos = PedidoRepo.obter_por_estado(
-        request.state.usuario.id, EstadoPedido.CARRINHO.value
+    pedido_carrinho = await CarrinhoService.aremover(
+        request.state.usuario.id, id_produto, conexao=conexao
     )
-    pedido_carrinho = pedidos[0] if pedidos else None
-    response = RedirectResponse("/cliente/carrinho", status.HTTP_303_SEE_OTHER)
-    if pedido_carrinho == None:
-        adicionar_mensagem_alerta(f"Seu carrinho não foi encontrado.")
-        return response
-    qtde = ItemPedidoRepo.obter_quantidade_por_produto(pedido_carrinho.id, id_produto)
-    if qtde == 0:
+    if not pedido_carrinho:
         adicionar_mensagem_alerta(
-            f"O produto {id_produto} não foi encontrado em seu carrinho."
+            response, f"O produto {id_produto} não foi encontrado em seu carrinho."
         )
         return response
-    ItemPedidoRepo.excluir(pedido_carrinho.id, id_produto)
-    response = RedirectResponse("/cliente/carrinho", status.HTTP_303_SEE_OTHER)
+    buffer_carrinho.descartar(pedido_carrinho.id, id_produto)
     adicionar_mensagem_sucesso(response, "Item excluído com sucesso.")
-    PedidoRepo.atualizar_valor_total(pedido_carrinho.id)
     return response
 
 
@@ -378,11 +490,14 @@ async def post_remover_item(request: Request, id_produto: int = Form(0)):
 async def get_pedidoconfirmado(
     request: Request,
     id_pedido: int = Path(...),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
 ):
-    pedido = PedidoRepo.obter_por_id(id_pedido)
-    if pedido.id_cliente != request.state.usuario.id:
+    pedido = await PedidoRepo.aobter_por_id(id_pedido, conexao=conexao)
+    if not pedido or pedido.id_cliente != request.state.usuario.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    PedidoRepo.alterar_estado(id_pedido, EstadoPedido.PAGO.value)
+    response = await _pagar_pedido(pedido, conexao)
+    if response:
+        return response
     return templates.TemplateResponse(
         "pages/pedidoconfirmado.html",
         {"request": request, "pedido": pedido},
@@ -394,15 +509,13 @@ async def get_detalhespedido(
     request: Request,
     id_pedido: int = Path(...),
 ):
-    pedido = PedidoRepo.obter_por_id(id_pedido)
-    if pedido.id_cliente != request.state.usuario.id:
+    pedido = await PedidoRepo.aobter_detalhado(id_pedido)
+    if not pedido or pedido.id_cliente != request.state.usuario.id:
         response = RedirectResponse(url="/pedidos", status_code=status.HTTP_302_FOUND)
         return adicionar_mensagem_erro(
             response,
             "Pedido não encontrado. Verifique o número do pedido e tente novamente.",
         )
-    itens = ItemPedidoRepo.obter_por_pedido(pedido.id)
-    pedido.itens = itens
     return templates.TemplateResponse(
         "pages/detalhespedido.html",
         {"request": request, "pedido": pedido},
@@ -410,15 +523,33 @@ async def get_detalhespedido(
 
 
 @router.post("/post_cancelar_pedido", response_class=RedirectResponse)
-async def post_cancelar_pedido(request: Request, id_pedido: int = Form(0)):
-    pedido = PedidoRepo.obter_por_id(id_pedido)
+async def post_cancelar_pedido(
+    request: Request,
+    id_pedido: int = Form(0),
+    conexao: sqlite3.Connection = Depends(obter_conexao_requisicao),
+):
+    pedido = await PedidoRepo.aobter_por_id(id_pedido, conexao=conexao)
     if not pedido or pedido.id_cliente != request.state.usuario.id:
         response = RedirectResponse(url="/cliente/pedidos", status_code=status.HTTP_302_FOUND)
         return adicionar_mensagem_erro(
             response,
             "Pedido não encontrado. Verifique o número do pedido e tente novamente.",
         )
-    PedidoRepo.alterar_estado(id_pedido, EstadoPedido.CANCELADO.value)
+    # o cliente só cancela o que ainda aguarda pagamento (o botão só aparece
+    # aí); a partir de pago, o cancelamento é com a loja
+    resultados = None
+    if pedido.estado == EstadoPedido.PENDENTE.value:
+        resultados = await PedidoService.aalterar_estados(
+            [id_pedido], EstadoPedido.CANCELADO.value, conexao=conexao
+        )
+    if not resultados or not resultados[0].alterado:
+        response = RedirectResponse(
+            url=f"/cliente/detalhespedido/{id_pedido}",
+            status_code=status.HTTP_303_SEE_OTHER,
+        )
+        return adicionar_mensagem_erro(
+            response, "Este pedido não pode mais ser cancelado pelo site."
+        )
     response = RedirectResponse(url="/cliente/pedidos", status_code=status.HTTP_303_SEE_OTHER)
     adicionar_mensagem_sucesso(response, "Pedido cancelado com sucesso.")
     return response
\ No newline at end of file
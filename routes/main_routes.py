@@ -1,5 +1,6 @@
 import asyncio
-import math
+from sqlite3 import DatabaseError
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Query, Request, status
 from fastapi.responses import HTMLResponse, JSONResponse
 
@@ -11,13 +12,13 @@ from dtos.inserir_usuario_dto import InserirUsuarioDTO
 from models.usuario_model import Usuario
 from repositories.usuario_repo import UsuarioRepo
 from repositories.produto_repo import ProdutoRepo
-from util.auth_jwt import (
-    conferir_senha,
-    criar_token,
-    obter_hash_senha,
-)
+from util.cache import com_cache_pagina
+from util.auth_jwt import criar_token
+from util.senhas import aconferir_senha, aobter_hash_senha
+from util.sessoes import armazenamento_sessoes, autenticacao_por_cookie
 
 from util.cookies import TEMPO_COOKIE_AUTH, adicionar_cookie_auth, adicionar_mensagem_sucesso
+from util.paginacao import Pagina
 from util.pydantic import create_validation_errors
 from util.templates import obter_jinja_templates
 
@@ -33,9 +34,10 @@ async def get_html(arquivo: str):
 
 
 @router.get("/")
+@com_cache_pagina
 async def get_root(request: Request):
-    produtos = ProdutoRepo.obter_todos()
-    categorias = CategoriaRepo.obter_todos()
+    produtos = await ProdutoRepo.aobter_todos()
+    categorias = await CategoriaRepo.aobter_todos()
     return templates.TemplateResponse(
         "pages/index.html",
         {
@@ -66,8 +68,8 @@ async def get_cadastro(request: Request):
 @router.post("/post_cadastro", response_class=JSONResponse)
 async def post_cadastro(cliente_dto: InserirUsuarioDTO):
     cliente_data = cliente_dto.model_dump(exclude={"confirmacao_senha"})
-    cliente_data["senha"] = obter_hash_senha(cliente_data["senha"])
-    novo_cliente = UsuarioRepo.inserir(Usuario(**cliente_data))
+    cliente_data["senha"] = await aobter_hash_senha(cliente_data["senha"])
+    novo_cliente = await UsuarioRepo.ainserir(Usuario(**cliente_data))
     if not novo_cliente or not novo_cliente.id:
         raise HTTPException(status_code=400, detail="Erro ao cadastrar cliente.")
     return {"redirect": {"url": "/cadastro_realizado"}}
@@ -97,11 +99,11 @@ async def get_entrar(
 
 @router.post("/post_entrar", response_class=JSONResponse)
 async def post_entrar(entrar_dto: EntrarDto):
-    cliente_entrou = UsuarioRepo.obter_por_email(entrar_dto.email)
+    cliente_entrou = await UsuarioRepo.aobter_por_email(entrar_dto.email)
     if (
         (not cliente_entrou)
         or (not cliente_entrou.senha)
-        or (not conferir_senha(entrar_dto.senha, cliente_entrou.senha))
+        or (not await aconferir_senha(entrar_dto.senha, cliente_entrou.senha))
     ):
         return JSONResponse(
             content=create_validation_errors(
@@ -111,12 +113,15 @@ async def post_entrar(entrar_dto: EntrarDto):
             ),
             status_code=status.HTTP_404_NOT_FOUND,
         )
-    token = criar_token(cliente_entrou.id, cliente_entrou.nome, cliente_entrou.email, cliente_entrou.perfil)
-    # O código a seguir é apenas para autenticação baseada em cookies
-    # if not UsuarioRepo.alterar_token(cliente_entrou.id, token):
-    #     raise DatabaseError(
-    #         "Não foi possível alterar o token do cliente no banco de dados."
-    #     )
+    if autenticacao_por_cookie():
+        # o token do cookie passa a ser o da sessão (util.auth_cookie)
+        token = await armazenamento_sessoes.criar(cliente_entrou)
+        if not token:
+            raise DatabaseError(
+                "Não foi possível criar a sessão do cliente no banco de dados."
+            )
+    else:
+        token = criar_token(cliente_entrou.id, cliente_entrou.nome, cliente_entrou.email, cliente_entrou.perfil)
     response = JSONResponse(content={"redirect": {"url": entrar_dto.return_url}})
     adicionar_mensagem_sucesso(
         response,
@@ -127,8 +132,9 @@ async def post_entrar(entrar_dto: EntrarDto):
 
 
 @router.get("/produto/{id:int}")
+@com_cache_pagina
 async def get_produto(request: Request, id: int):
-    produto = ProdutoRepo.obter_um(id)
+    produto = await ProdutoRepo.aobter_um(id)
     return templates.TemplateResponse(
         "pages/produto.html",
         {
@@ -139,35 +145,39 @@ async def get_produto(request: Request, id: int):
 
 
 @router.get("/buscar")
+@com_cache_pagina
 async def get_buscar(
     request: Request,
     q: str,
-    p: int = 1,
     tp: int = 6,
     o: int = 1,
+    c: Optional[str] = None,
+    p: int = 1,
 ):
-    produtos = ProdutoRepo.obter_busca(q, p, tp, o)
-    qtde_produtos = ProdutoRepo.obter_quantidade_busca(q)
-    qtde_paginas = math.ceil(qtde_produtos / float(tp))
+    # erro no banco: página vazia em vez de 500
+    pagina = await ProdutoRepo.aobter_busca_cursor(q, tp, o, c, p) or Pagina()
     return templates.TemplateResponse(
         "pages/buscar.html",
         {
             "request": request,
-            "produtos": produtos,
-            "quantidade_paginas": qtde_paginas,
+            "produtos": pagina.itens,
+            "quantidade_paginas": pagina.quantidade_paginas,
             "tamanho_pagina": tp,
-            "pagina_atual": p,
+            "pagina_atual": pagina.numero,
             "termo_busca": q,
             "ordem": o,
+            "cursor_anterior": pagina.cursor_anterior,
+            "cursor_proximo": pagina.cursor_proximo,
         },
     )
 
 
 @router.get("/obter_produtos_por_categoria/{id_categoria}")
+@com_cache_pagina
 async def obter_produtos_por_categoria(request: Request, id_categoria: int):
     await asyncio.sleep(SLEEP_TIME)
-    produtos = ProdutoRepo.obter_todos_por_categoria(id_categoria)
-    categoria = CategoriaRepo.obter_um(id_categoria)
+    produtos = await ProdutoRepo.aobter_todos_por_categoria(id_categoria)
+    categoria = await CategoriaRepo.aobter_um(id_categoria)
 
     mensagem = None
 
@@ -179,7 +189,7 @@ async def obter_produtos_por_categoria(request: Request, id_categoria: int):
         {
             "request": request,
             "produtos": produtos,
-            "categorias": CategoriaRepo.obter_todos(),
+            "categorias": await CategoriaRepo.aobter_todos(),
             "categoria_selecionada": id_categoria,
             "mensagem": mensagem, 
         },
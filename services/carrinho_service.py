@@ -0,0 +1,202 @@
+import sqlite3
+from datetime import datetime
+from typing import Callable, Optional
+from models.item_pedido_model import ItemPedido
+from models.pedido_model import Pedido
+from sql.carrinho_sql import *
+from util.data_hora import para_epoch_ms
+from util.database import com_metodos_async, iniciar_escrita, obter_conexao
+
+
+@com_metodos_async
+class CarrinhoService:
+    """Operações do carrinho, cada uma em uma única transação e sem leituras
+    prévias: o item é criado ou alterado com INSERT ... ON CONFLICT DO
+    UPDATE, e o total do pedido é mantido pelos gatilhos de item_pedido.
+
+    Todas devolvem o carrinho já alterado, com os itens, ou None se nada
+    foi alterado (carrinho, produto ou item não encontrado)."""
+
+    @classmethod
+    def _obter_carrinho(
+        cls, cursor: sqlite3.Cursor, id_cliente: int
+    ) -> Optional[Pedido]:
+        tupla = cursor.execute(SQL_OBTER_CARRINHO, (id_cliente,)).fetchone()
+        if not tupla:
+            return None
+        pedido = Pedido(*tupla)
+        tuplas = cursor.execute(SQL_OBTER_ITENS, (pedido.id,)).fetchall()
+        pedido.itens = [ItemPedido(*t) for t in tuplas]
+        return pedido
+
+    @classmethod
+    def _gravar_item(
+        cls,
+        sql: str,
+        id_cliente: int,
+        id_produto: int,
+        quantidade: int,
+        conexao: Optional[sqlite3.Connection],
+    ) -> Optional[Pedido]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(
+                    SQL_CRIAR_CARRINHO_SE_NAO_EXISTIR,
+                    (para_epoch_ms(datetime.now()), id_cliente),
+                )
+                id_pedido = cursor.execute(
+                    SQL_OBTER_ID_CARRINHO, (id_cliente,)
+                ).fetchone()[0]
+                if id_pedido is None:
+                    return None
+                cursor.execute(sql, (id_pedido, quantidade, id_produto))
+                if cursor.rowcount == 0:
+                    return None
+                return cls._obter_carrinho(cursor, id_cliente)
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def _alterar_item(
+        cls,
+        sql: str,
+        id_cliente: int,
+        id_produto: int,
+        conexao: Optional[sqlite3.Connection],
+    ) -> Optional[Pedido]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(sql, (id_cliente, id_produto))
+                if cursor.rowcount == 0:
+                    return None
+                return cls._obter_carrinho(cursor, id_cliente)
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def adicionar(
+        cls,
+        id_cliente: int,
+        id_produto: int,
+        quantidade: int = 1,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pedido]:
+        return cls._gravar_item(
+            SQL_ADICIONAR_ITEM, id_cliente, id_produto, quantidade, conexao
+        )
+
+    @classmethod
+    def definir_quantidade(
+        cls,
+        id_cliente: int,
+        id_produto: int,
+        quantidade: int,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pedido]:
+        if quantidade <= 0:
+            return cls.remover(id_cliente, id_produto, conexao=conexao)
+        return cls._gravar_item(
+            SQL_DEFINIR_QUANTIDADE_ITEM, id_cliente, id_produto, quantidade, conexao
+        )
+
+    @classmethod
+    def aumentar(
+        cls,
+        id_cliente: int,
+        id_produto: int,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pedido]:
+        return cls._alterar_item(SQL_AUMENTAR_ITEM, id_cliente, id_produto, conexao)
+
+    @classmethod
+    def diminuir(
+        cls,
+        id_cliente: int,
+        id_produto: int,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pedido]:
+        # com quantidade 1, diminuir remove o item do carrinho
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                cursor.execute(SQL_DIMINUIR_ITEM, (id_cliente, id_produto))
+                if cursor.rowcount == 0:
+                    cursor.execute(SQL_EXCLUIR_ITEM_UNITARIO, (id_cliente, id_produto))
+                    if cursor.rowcount == 0:
+                        return None
+                return cls._obter_carrinho(cursor, id_cliente)
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def remover(
+        cls,
+        id_cliente: int,
+        id_produto: int,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[Pedido]:
+        return cls._alterar_item(SQL_EXCLUIR_ITEM, id_cliente, id_produto, conexao)
+
+    @classmethod
+    def obter_item_carrinho(
+        cls,
+        id_cliente: int,
+        id_produto: int,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[ItemPedido]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                tupla = cursor.execute(
+                    SQL_OBTER_ITEM, (id_cliente, id_produto)
+                ).fetchone()
+                return ItemPedido(*tupla) if tupla else None
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
+
+    @classmethod
+    def aplicar_variacoes(
+        cls,
+        variacoes: dict[tuple[int, int], int],
+        conexao: Optional[sqlite3.Connection] = None,
+        ao_concluir: Optional[Callable[[bool], None]] = None,
+    ) -> bool:
+        """Grava em uma única transação as variações de quantidade
+        acumuladas, {(id_pedido, id_produto): variação}; itens que chegam a
+        zero são excluídos. Variações de pedidos que já deixaram de ser
+        carrinho são ignoradas.
+
+        ao_concluir(gravado) roda na mesma thread logo depois do commit (ou
+        da falha), antes de a chamada voltar; é usada sem conexão
+        compartilhada, quando o commit acontece aqui."""
+        chaves = [chave for chave, variacao in variacoes.items() if variacao]
+        gravado = True
+        if chaves:
+            try:
+                with obter_conexao(conexao) as conexao:
+                    iniciar_escrita(conexao)
+                    cursor = conexao.cursor()
+                    cursor.executemany(
+                        SQL_APLICAR_VARIACAO_ITEM,
+                        ((variacoes[chave], *chave) for chave in chaves),
+                    )
+                    cursor.executemany(SQL_EXCLUIR_ITEM_ZERADO, chaves)
+            except sqlite3.Error as ex:
+                print(ex)
+                gravado = False
+        if ao_concluir:
+            ao_concluir(gravado)
+        return gravado
+
+    @staticmethod
+    def obter_item(pedido: Pedido, id_produto: int) -> Optional[ItemPedido]:
+        for item in pedido.itens or []:
+            if item.id_produto == id_produto:
+                return item
+        return None
@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import time
+from typing import Optional
+from models.pedido_model import EstadoPedido
+from sql.estoque_sql import *
+from util.cache import cache_catalogo
+from util.database import (
+    apos_confirmar,
+    com_metodos_async,
+    iniciar_escrita,
+    obter_conexao,
+)
+
+
+def obter_validade_reserva() -> int:
+    # segundos que um pedido pendente segura o estoque aguardando pagamento
+    return int(os.getenv("RESERVA_ESTOQUE_MINUTOS", "15")) * 60
+
+
+@com_metodos_async
+class EstoqueService:
+    """Reserva e baixa de estoque dos pedidos.
+
+    A reserva decrementa o estoque de todos os itens do pedido em uma única
+    transação, com UPDATE condicional (estoque >= quantidade): se algum item
+    não tiver estoque, nada é baixado. Reservas de pedidos pendentes vencem
+    (liberar_expiradas) e o cancelamento devolve o estoque."""
+
+    @classmethod
+    def _reservar(
+        cls, cursor: sqlite3.Cursor, id_pedido: int, expira_em: Optional[int]
+    ) -> bool:
+        if cursor.execute(SQL_OBTER_RESERVA, (id_pedido,)).fetchone():
+            cursor.execute(SQL_PRORROGAR_RESERVA, (expira_em, id_pedido))
+            return True
+        itens = cursor.execute(SQL_OBTER_ITENS_RESERVA, (id_pedido,)).fetchall()
+        if not itens:
+            return False
+        cursor.execute("SAVEPOINT reserva_estoque")
+        cursor.executemany(SQL_RESERVAR_ITEM, itens)
+        if cursor.rowcount != len(itens):
+            cursor.execute("ROLLBACK TO reserva_estoque")
+            cursor.execute("RELEASE reserva_estoque")
+            return False
+        cursor.execute("RELEASE reserva_estoque")
+        cursor.execute(SQL_INSERIR_RESERVA, (id_pedido, expira_em))
+        apos_confirmar(cursor.connection, cache_catalogo.invalidar)
+        return True
+
+    @classmethod
+    def reservar(
+        cls, id_pedido: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
+        # se o pedido já tem reserva, apenas prorroga a validade
+        try:
+            with obter_conexao(conexao) as conexao:
+                iniciar_escrita(conexao)
+                expira_em = int(time.time()) + obter_validade_reserva()
+                return cls._reservar(conexao.cursor(), id_pedido, expira_em)
+        except sqlite3.Error as ex:
+            print(ex)
+            return False
+
+    @classmethod
+    def confirmar(
+        cls, id_pedido: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
+        # torna a reserva definitiva; se ela já venceu, tenta reservar de novo
+        try:
+            with obter_conexao(conexao) as conexao:
+                iniciar_escrita(conexao)
+                cursor = conexao.cursor()
+                cursor.execute(SQL_CONFIRMAR_RESERVA, (id_pedido,))
+                if cursor.rowcount > 0:
+                    return True
+                if cls._reservar(cursor, id_pedido, None):
+                    return True
+                print(f"Estoque insuficiente para confirmar o pedido {id_pedido}.")
+                return False
+        except sqlite3.Error as ex:
+            print(ex)
+            return False
+
+    @classmethod
+    def liberar(
+        cls, id_pedido: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
+        try:
+            with obter_conexao(conexao) as conexao:
+                iniciar_escrita(conexao)
+                cursor = conexao.cursor()
+                cursor.execute(SQL_EXCLUIR_RESERVA, (id_pedido,))
+                if cursor.rowcount == 0:
+                    return False
+                cursor.execute(SQL_DEVOLVER_ESTOQUE, (id_pedido,))
+                apos_confirmar(conexao, cache_catalogo.invalidar)
+                return True
+        except sqlite3.Error as ex:
+            print(ex)
+            return False
+
+    @classmethod
+    def liberar_expiradas(
+        cls, agora: Optional[int] = None, conexao: Optional[sqlite3.Connection] = None
+    ) -> int:
+        agora = agora if agora is not None else int(time.time())
+        try:
+            with obter_conexao(conexao) as conexao:
+                iniciar_escrita(conexao)
+                cursor = conexao.cursor()
+                cursor.execute(SQL_DEVOLVER_ESTOQUE_EXPIRADO, (agora,))
+                cursor.execute(SQL_EXCLUIR_RESERVAS_EXPIRADAS, (agora,))
+                if cursor.rowcount > 0:
+                    apos_confirmar(conexao, cache_catalogo.invalidar)
+                return cursor.rowcount
+        except sqlite3.Error as ex:
+            print(ex)
+            return 0
+
+    @staticmethod
+    def altera_estoque(estado_atual: str, novo_estado: str) -> bool:
+        # o estoque só muda quando o pedido passa entre livre (carrinho ou
+        # cancelado), reservado (pendente) e baixado (pago em diante)
+        def situacao(estado: str) -> int:
+            if estado in (EstadoPedido.CARRINHO.value, EstadoPedido.CANCELADO.value):
+                return 0
+            return 1 if estado == EstadoPedido.PENDENTE.value else 2
+
+        return situacao(estado_atual) != situacao(novo_estado)
+
+    @classmethod
+    def aplicar_estado(
+        cls, id_pedido: int, estado: str, conexao: Optional[sqlite3.Connection] = None
+    ) -> bool:
+        # efeito no estoque da mudança do pedido para o estado informado
+        if estado in (EstadoPedido.CARRINHO.value, EstadoPedido.CANCELADO.value):
+            cls.liberar(id_pedido, conexao=conexao)
+            return True
+        if estado == EstadoPedido.PENDENTE.value:
+            return cls.reservar(id_pedido, conexao=conexao)
+        return cls.confirmar(id_pedido, conexao=conexao)
+
+    @classmethod
+    def obter_itens_indisponiveis(
+        cls, id_pedido: int, conexao: Optional[sqlite3.Connection] = None
+    ) -> list[str]:
+        try:
+            with obter_conexao(conexao) as conexao:
+                cursor = conexao.cursor()
+                tuplas = cursor.execute(
+                    SQL_OBTER_ITENS_INDISPONIVEIS, (id_pedido,)
+                ).fetchall()
+                return [tupla[0] for tupla in tuplas]
+        except sqlite3.Error as ex:
+            print(ex)
+            return []
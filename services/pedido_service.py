@@ -0,0 +1,79 @@
+import sqlite3
+from dataclasses import dataclass
+from typing import List, Optional
+from models.pedido_model import transicao_permitida
+from repositories.pedido_repo import PedidoRepo
+from services.estoque_service import EstoqueService
+from util.database import com_metodos_async, iniciar_escrita, obter_conexao
+
+
+ERRO_PEDIDO_NAO_ENCONTRADO = "Pedido não encontrado."
+ERRO_ESTOQUE_INSUFICIENTE = "Estoque insuficiente."
+
+
+@dataclass
+class ResultadoTransicao:
+    id: int
+    alterado: bool
+    estado_anterior: Optional[str] = None
+    erro: Optional[str] = None
+
+
+@com_metodos_async
+class PedidoService:
+    @classmethod
+    def alterar_estados(
+        cls,
+        ids: List[int],
+        estado: str,
+        conexao: Optional[sqlite3.Connection] = None,
+    ) -> Optional[List[ResultadoTransicao]]:
+        """Leva vários pedidos ao mesmo estado em uma única transação.
+
+        Os estados atuais são lidos com uma consulta, cada transição é
+        validada pela máquina de estados (TRANSICOES_PEDIDO) e as válidas
+        são gravadas juntas com executemany. Pedidos inexistentes, transições
+        não permitidas e falta de estoque são relatados por id, sem impedir
+        os demais."""
+        try:
+            with obter_conexao(conexao) as conexao:
+                iniciar_escrita(conexao)
+                estados = PedidoRepo.obter_estados(ids, conexao=conexao)
+                if estados is None:
+                    return None
+                resultados = []
+                alteracoes = []
+                for id in dict.fromkeys(ids):
+                    atual = estados.get(id)
+                    if atual is None:
+                        resultados.append(
+                            ResultadoTransicao(id, False, erro=ERRO_PEDIDO_NAO_ENCONTRADO)
+                        )
+                    elif not transicao_permitida(atual, estado):
+                        resultados.append(
+                            ResultadoTransicao(
+                                id,
+                                False,
+                                atual,
+                                f"Transição de {atual} para {estado} não permitida.",
+                            )
+                        )
+                    elif EstoqueService.altera_estoque(
+                        atual, estado
+                    ) and not EstoqueService.aplicar_estado(id, estado, conexao=conexao):
+                        resultados.append(
+                            ResultadoTransicao(id, False, atual, ERRO_ESTOQUE_INSUFICIENTE)
+                        )
+                    else:
+                        alteracoes.append((id, atual, estado))
+                        resultados.append(ResultadoTransicao(id, True, atual))
+                if alteracoes:
+                    alterados = PedidoRepo.alterar_estados(alteracoes, conexao=conexao)
+                    if alterados != len(alteracoes):
+                        raise sqlite3.DatabaseError(
+                            f"{alterados} de {len(alteracoes)} pedidos alterados."
+                        )
+                return resultados
+        except sqlite3.Error as ex:
+            print(ex)
+            return None
@@ -0,0 +1,102 @@
+# o carrinho do cliente é o pedido mais antigo no estado "carrinho"
+_CARRINHO_DO_CLIENTE = """(
+        SELECT id FROM pedido
+        WHERE id_cliente = ? AND estado = 'carrinho'
+        ORDER BY id
+        LIMIT 1)"""
+
+# cria o carrinho só se o cliente ainda não tiver um; por ser o primeiro
+# comando da transação, a verificação e a inserção acontecem sob o mesmo
+# lock de escrita, e cliques simultâneos não criam dois carrinhos
+SQL_CRIAR_CARRINHO_SE_NAO_EXISTIR = """
+    INSERT INTO pedido(data_hora, valor_total, endereco_entrega, estado, id_cliente)
+    SELECT ?, 0, u.endereco, 'carrinho', u.id
+    FROM usuario u
+    WHERE u.id = ? AND NOT EXISTS (
+        SELECT 1 FROM pedido
+        WHERE id_cliente = u.id AND estado = 'carrinho')
+"""
+
+SQL_OBTER_ID_CARRINHO = f"""
+    SELECT {_CARRINHO_DO_CLIENTE}
+"""
+
+SQL_ADICIONAR_ITEM = """
+    INSERT INTO item_pedido(id_pedido, id_produto, nome_produto, valor_produto, quantidade)
+    SELECT ?, p.id, p.nome, p.preco, ?
+    FROM produto p
+    WHERE p.id = ?
+    ON CONFLICT (id_pedido, id_produto) DO UPDATE
+    SET quantidade = quantidade + excluded.quantidade
+"""
+
+SQL_DEFINIR_QUANTIDADE_ITEM = """
+    INSERT INTO item_pedido(id_pedido, id_produto, nome_produto, valor_produto, quantidade)
+    SELECT ?, p.id, p.nome, p.preco, ?
+    FROM produto p
+    WHERE p.id = ?
+    ON CONFLICT (id_pedido, id_produto) DO UPDATE
+    SET quantidade = excluded.quantidade
+"""
+
+SQL_AUMENTAR_ITEM = f"""
+    UPDATE item_pedido
+    SET quantidade = quantidade + 1
+    WHERE id_pedido = {_CARRINHO_DO_CLIENTE} AND id_produto = ?
+"""
+
+SQL_DIMINUIR_ITEM = f"""
+    UPDATE item_pedido
+    SET quantidade = quantidade - 1
+    WHERE id_pedido = {_CARRINHO_DO_CLIENTE} AND id_produto = ? AND quantidade > 1
+"""
+
+# usado quando diminuir levaria a quantidade a zero
+SQL_EXCLUIR_ITEM_UNITARIO = f"""
+    DELETE FROM item_pedido
+    WHERE id_pedido = {_CARRINHO_DO_CLIENTE} AND id_produto = ? AND quantidade <= 1
+"""
+
+SQL_EXCLUIR_ITEM = f"""
+    DELETE FROM item_pedido
+    WHERE id_pedido = {_CARRINHO_DO_CLIENTE} AND id_produto = ?
+"""
+
+# alterações de quantidade acumuladas pelo buffer do carrinho
+# (util.buffer_carrinho): parâmetros (variação, id_pedido, id_produto). A
+# variação só vale enquanto o pedido ainda é um carrinho; depois que ele foi
+# fechado, a que sobrou no buffer de outro worker é descartada, e não
+# aplicada ao próximo carrinho do cliente
+_CARRINHO_ABERTO = """(
+        SELECT id FROM pedido
+        WHERE id = ? AND estado = 'carrinho')"""
+
+SQL_APLICAR_VARIACAO_ITEM = f"""
+    UPDATE item_pedido
+    SET quantidade = quantidade + ?
+    WHERE id_pedido = {_CARRINHO_ABERTO} AND id_produto = ?
+"""
+
+SQL_EXCLUIR_ITEM_ZERADO = f"""
+    DELETE FROM item_pedido
+    WHERE id_pedido = {_CARRINHO_ABERTO} AND id_produto = ? AND quantidade <= 0
+"""
+
+SQL_OBTER_ITEM = f"""
+    SELECT id_pedido, id_produto, nome_produto, valor_produto, quantidade, valor_item
+    FROM item_pedido
+    WHERE id_pedido = {_CARRINHO_DO_CLIENTE} AND id_produto = ?
+"""
+
+SQL_OBTER_CARRINHO = f"""
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
+    FROM pedido
+    WHERE id = {_CARRINHO_DO_CLIENTE}
+"""
+
+SQL_OBTER_ITENS = """
+    SELECT id_pedido, id_produto, nome_produto, valor_produto, quantidade, valor_item
+    FROM item_pedido
+    WHERE id_pedido = ?
+"""
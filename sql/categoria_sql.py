@@ -49,4 +49,13 @@ SQL_OBTER_BUSCA = """
 SQL_OBTER_QUANTIDADE_BUSCA = """
     SELECT COUNT(*) FROM categoria
     WHERE nome LIKE ? OR descricao LIKE ?
-"""
\ No newline at end of file
+"""
+
+SQL_OBTER_ALTERADOS_DESDE = """
+    SELECT id, nome, descricao
+    FROM categoria
+    WHERE id IN (
+        SELECT id_registro FROM alteracao
+        WHERE tabela = 'categoria' AND versao > ? AND excluido = 0)
+    ORDER BY nome
+"""
@@ -0,0 +1,99 @@
+# reserva de estoque de um pedido: expira_em (epoch, em segundos) marca as
+# reservas de pedidos pendentes; NULL indica estoque já baixado em definitivo
+SQL_CRIAR_TABELA_RESERVA = """
+    CREATE TABLE IF NOT EXISTS reserva_estoque (
+        id_pedido INTEGER PRIMARY KEY,
+        expira_em INTEGER)
+"""
+
+SQL_CRIAR_INDICE_EXPIRACAO = """
+    CREATE INDEX IF NOT EXISTS idx_reserva_estoque_expira_em
+    ON reserva_estoque(expira_em)
+    WHERE expira_em IS NOT NULL
+"""
+
+# pedidos já pagos antes das reservas não devem baixar o estoque de novo
+# ao evoluir de estado
+SQL_MARCAR_PEDIDOS_CONFIRMADOS = """
+    INSERT OR IGNORE INTO reserva_estoque(id_pedido, expira_em)
+    SELECT id, NULL
+    FROM pedido
+    WHERE estado NOT IN ('carrinho', 'pendente', 'cancelado')
+"""
+
+SQL_OBTER_ITENS_RESERVA = """
+    SELECT quantidade, id_produto, quantidade
+    FROM item_pedido
+    WHERE id_pedido = ?
+"""
+
+# só baixa se houver estoque suficiente; quem chega depois vê o valor já
+# decrementado, pois o comando roda sob o lock de escrita
+SQL_RESERVAR_ITEM = """
+    UPDATE produto
+    SET estoque = estoque - ?
+    WHERE id = ? AND estoque >= ?
+"""
+
+SQL_INSERIR_RESERVA = """
+    INSERT INTO reserva_estoque(id_pedido, expira_em)
+    VALUES (?, ?)
+    ON CONFLICT (id_pedido) DO UPDATE
+    SET expira_em = excluded.expira_em
+"""
+
+SQL_OBTER_RESERVA = """
+    SELECT expira_em
+    FROM reserva_estoque
+    WHERE id_pedido = ?
+"""
+
+SQL_PRORROGAR_RESERVA = """
+    UPDATE reserva_estoque
+    SET expira_em = ?
+    WHERE id_pedido = ? AND expira_em IS NOT NULL
+"""
+
+SQL_CONFIRMAR_RESERVA = """
+    UPDATE reserva_estoque
+    SET expira_em = NULL
+    WHERE id_pedido = ?
+"""
+
+SQL_EXCLUIR_RESERVA = """
+    DELETE FROM reserva_estoque
+    WHERE id_pedido = ?
+"""
+
+SQL_DEVOLVER_ESTOQUE = """
+    UPDATE produto
+    SET estoque = estoque + i.quantidade
+    FROM item_pedido i
+    WHERE i.id_pedido = ? AND produto.id = i.id_produto
+"""
+
+# devolve de uma vez o estoque de todas as reservas vencidas até ?
+SQL_DEVOLVER_ESTOQUE_EXPIRADO = """
+    UPDATE produto
+    SET estoque = estoque + t.quantidade
+    FROM (
+        SELECT i.id_produto, SUM(i.quantidade) AS quantidade
+        FROM reserva_estoque r
+        INNER JOIN item_pedido i ON i.id_pedido = r.id_pedido
+        WHERE r.expira_em <= ?
+        GROUP BY i.id_produto) AS t
+    WHERE produto.id = t.id_produto
+"""
+
+SQL_EXCLUIR_RESERVAS_EXPIRADAS = """
+    DELETE FROM reserva_estoque
+    WHERE expira_em <= ?
+"""
+
+SQL_OBTER_ITENS_INDISPONIVEIS = """
+    SELECT i.nome_produto
+    FROM item_pedido i
+    LEFT JOIN produto p ON p.id = i.id_produto
+    WHERE i.id_pedido = ? AND COALESCE(p.estoque, 0) < i.quantidade
+    ORDER BY i.nome_produto
+"""
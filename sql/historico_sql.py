@@ -0,0 +1,99 @@
+# banco de histórico, anexado a cada conexão do pool com o nome "historico":
+# pedidos entregues ou cancelados antigos saem de pedido e item_pedido e
+# vêm para cá, mantendo as tabelas principais (e seus índices) pequenas
+ESQUEMA = "historico"
+
+SQL_CRIAR_ESQUEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS historico.pedido (
+        id INTEGER PRIMARY KEY,
+        data_hora INTEGER NOT NULL,
+        valor_total FLOAT NOT NULL,
+        endereco_entrega TEXT NOT NULL,
+        estado TEXT NOT NULL,
+        id_cliente INTEGER NOT NULL,
+        quantidade_itens INTEGER NOT NULL DEFAULT 0)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS historico.item_pedido (
+        id_pedido INTEGER NOT NULL,
+        id_produto INTEGER NOT NULL,
+        nome_produto TEXT NOT NULL,
+        valor_produto FLOAT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        valor_item AS (valor_produto * quantidade),
+        PRIMARY KEY(id_pedido, id_produto))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS historico.idx_pedido_cliente_data_hora_desc
+    ON pedido(id_cliente, data_hora DESC)
+    """,
+]
+
+ESTADOS_ENCERRADOS = ("entregue", "cancelado")
+
+SQL_OBTER_IDS_ARQUIVAVEIS = f"""
+    SELECT id
+    FROM main.pedido
+    WHERE estado IN {ESTADOS_ENCERRADOS} AND data_hora < ?
+    ORDER BY id
+    LIMIT ?
+"""
+
+# #1: um marcador ? por pedido; INSERT OR IGNORE torna a cópia repetível
+# se uma execução anterior parou entre a cópia e a exclusão
+SQL_COPIAR_PEDIDOS = """
+    INSERT OR IGNORE INTO historico.pedido(
+        id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens)
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
+    FROM main.pedido
+    WHERE id IN (#1)
+"""
+
+SQL_COPIAR_ITENS = """
+    INSERT OR IGNORE INTO historico.item_pedido(
+        id_pedido, id_produto, nome_produto, valor_produto, quantidade)
+    SELECT id_pedido, id_produto, nome_produto, valor_produto, quantidade
+    FROM main.item_pedido
+    WHERE id_pedido IN (#1)
+"""
+
+# o gatilho de exclusão de pedido desconta o pedido de resumo_cliente, mas
+# o resumo inclui os pedidos arquivados: antes da exclusão, devolve a ele
+# exatamente o que será excluído
+SQL_MANTER_RESUMO_ARQUIVADOS = """
+    INSERT INTO main.resumo_cliente(id_cliente, estado, quantidade, valor_total)
+    SELECT id_cliente, estado, COUNT(*), ROUND(SUM(valor_total), 2)
+    FROM main.pedido
+    WHERE id IN (#1) AND id IN (SELECT id FROM historico.pedido)
+        AND estado <> 'carrinho'
+    GROUP BY id_cliente, estado
+    ON CONFLICT (id_cliente, estado) DO UPDATE
+    SET quantidade = quantidade + excluded.quantidade,
+        valor_total = ROUND(valor_total + excluded.valor_total, 2)
+"""
+
+# só exclui o que já está gravado no histórico; o pedido sai antes dos
+# itens para que os gatilhos de total dos itens não tenham o que atualizar
+SQL_EXCLUIR_PEDIDOS_ARQUIVADOS = """
+    DELETE FROM main.pedido
+    WHERE id IN (#1) AND id IN (SELECT id FROM historico.pedido)
+"""
+
+SQL_EXCLUIR_ITENS_ARQUIVADOS = """
+    DELETE FROM main.item_pedido
+    WHERE id_pedido IN (#1) AND id_pedido IN (SELECT id FROM historico.pedido)
+"""
+
+SQL_EXCLUIR_RESERVAS_ARQUIVADAS = """
+    DELETE FROM main.reserva_estoque
+    WHERE id_pedido IN (#1) AND id_pedido IN (SELECT id FROM historico.pedido)
+"""
+
+SQL_EXISTE_NO_PERIODO = """
+    SELECT EXISTS (
+        SELECT 1 FROM historico.pedido
+        WHERE id_cliente = ? AND data_hora BETWEEN ? AND ?)
+"""
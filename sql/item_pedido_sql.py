@@ -22,6 +22,14 @@ SQL_OBTER_POR_PEDIDO = """
     WHERE id_pedido=?
 """
 
+# #1: um marcador ? por pedido
+SQL_OBTER_POR_PEDIDOS = """
+    SELECT id_pedido, id_produto, nome_produto, valor_produto, quantidade, valor_item
+    FROM item_pedido
+    WHERE id_pedido IN (#1)
+    ORDER BY id_pedido, rowid
+"""
+
 SQL_OBTER_QUANTIDADE_POR_PRODUTO = """
     SELECT quantidade
     FROM item_pedido
@@ -61,3 +69,39 @@ SQL_OBTER_QUANTIDADE_POR_PEDIDO = """
     SELECT COUNT(*) FROM item_pedido
     WHERE id_pedido=?
 """
+
+# mantêm pedido.valor_total e pedido.quantidade_itens a cada alteração dos
+# itens, sem reler os demais itens do pedido
+SQL_CRIAR_GATILHOS_TOTAL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS item_pedido_total_apos_inserir
+    AFTER INSERT ON item_pedido BEGIN
+        UPDATE pedido
+        SET valor_total = ROUND(valor_total + new.valor_item, 2),
+            quantidade_itens = quantidade_itens + 1
+        WHERE id = new.id_pedido;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_pedido_total_apos_alterar
+    AFTER UPDATE OF id_pedido, valor_produto, quantidade ON item_pedido BEGIN
+        UPDATE pedido
+        SET valor_total = ROUND(valor_total - old.valor_item, 2),
+            quantidade_itens = quantidade_itens - 1
+        WHERE id = old.id_pedido;
+        UPDATE pedido
+        SET valor_total = ROUND(valor_total + new.valor_item, 2),
+            quantidade_itens = quantidade_itens + 1
+        WHERE id = new.id_pedido;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_pedido_total_apos_excluir
+    AFTER DELETE ON item_pedido BEGIN
+        UPDATE pedido
+        SET valor_total = ROUND(valor_total - old.valor_item, 2),
+            quantidade_itens = quantidade_itens - 1
+        WHERE id = old.id_pedido;
+    END
+    """,
+]
@@ -0,0 +1,43 @@
+# baldes do limite de taxa compartilhados entre workers. Ficam em um
+# arquivo próprio (LIMITE_TAXA_ARQUIVO), fora do dados.db, para que a
+# contagem não dispute o lock de escrita do banco da loja; o arquivo pode
+# ser apagado a qualquer momento (todos os baldes voltam cheios)
+SQL_CRIAR_TABELA = """
+    CREATE TABLE IF NOT EXISTS balde (
+        chave TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        atualizado_em REAL NOT NULL,
+        aceito INTEGER NOT NULL)
+    WITHOUT ROWID
+"""
+
+SQL_CRIAR_INDICE_ATUALIZADO_EM = """
+    CREATE INDEX IF NOT EXISTS idx_balde_atualizado_em
+    ON balde(atualizado_em)
+"""
+
+# reabastece o balde pelo tempo decorrido e consome um token se houver,
+# tudo em um comando (atômico entre processos). No SET todas as expressões
+# veem os valores antigos da linha
+SQL_CONSUMIR = """
+    INSERT INTO balde(chave, tokens, atualizado_em, aceito)
+    VALUES (:chave, :capacidade - 1, :agora, 1)
+    ON CONFLICT (chave) DO UPDATE SET
+        tokens = MIN(:capacidade, tokens + MAX(0, :agora - atualizado_em) * :taxa)
+            - (MIN(:capacidade, tokens + MAX(0, :agora - atualizado_em) * :taxa) >= 1),
+        aceito = MIN(:capacidade, tokens + MAX(0, :agora - atualizado_em) * :taxa) >= 1,
+        atualizado_em = MAX(atualizado_em, :agora)
+    RETURNING aceito, tokens
+"""
+
+# parado há mais tempo do que leva para encher, o balde está cheio: igual a
+# não existir
+SQL_EXCLUIR_OCIOSOS = """
+    DELETE FROM balde
+    WHERE atualizado_em < ?
+"""
+
+SQL_OBTER_QUANTIDADE = """
+    SELECT COUNT(*)
+    FROM balde
+"""
@@ -0,0 +1,222 @@
+from sql import (
+    categoria_sql,
+    estoque_sql,
+    item_pedido_sql,
+    pedido_sql,
+    produto_sql,
+    resumo_cliente_sql,
+    sessao_sql,
+    usuario_sql,
+    versao_sql,
+)
+
+SQL_CRIAR_TABELA = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        versao INTEGER PRIMARY KEY,
+        descricao TEXT NOT NULL,
+        aplicada_em TEXT NOT NULL)
+"""
+
+SQL_OBTER_VERSAO_ATUAL = """
+    SELECT COALESCE(MAX(versao), 0)
+    FROM schema_version
+"""
+
+SQL_OBTER_TODAS = """
+    SELECT versao, descricao, aplicada_em
+    FROM schema_version
+    ORDER BY versao
+"""
+
+SQL_INSERIR = """
+    INSERT INTO schema_version(versao, descricao, aplicada_em)
+    VALUES (?, ?, ?)
+"""
+
+# Migrações em ordem crescente de versão. Uma migração já aplicada em
+# produção nunca deve ser alterada: mudanças no esquema entram sempre como
+# uma nova versão no final da lista.
+MIGRACOES = [
+    (
+        1,
+        "Tabelas iniciais",
+        [
+            produto_sql.SQL_CRIAR_TABELA,
+            usuario_sql.SQL_CRIAR_TABELA,
+            pedido_sql.SQL_CRIAR_TABELA,
+            item_pedido_sql.SQL_CRIAR_TABELA,
+            categoria_sql.SQL_CRIAR_TABELA,
+        ],
+    ),
+    (
+        2,
+        "Índices das consultas mais frequentes",
+        [
+            # SQL_OBTER_POR_ESTADO (carrinho do cliente)
+            """
+            CREATE INDEX IF NOT EXISTS idx_pedido_cliente_estado
+            ON pedido(id_cliente, estado)
+            """,
+            # SQL_OBTER_PAGINA_POR_PERIODO
+            """
+            CREATE INDEX IF NOT EXISTS idx_pedido_cliente_data_hora
+            ON pedido(id_cliente, data_hora)
+            """,
+            # SQL_OBTER_TODOS_POR_ESTADO (administração)
+            """
+            CREATE INDEX IF NOT EXISTS idx_pedido_estado
+            ON pedido(estado)
+            """,
+            # SQL_OBTER_POR_CATEGORIA, já na ordem do ORDER BY nome
+            """
+            CREATE INDEX IF NOT EXISTS idx_produto_categoria_nome
+            ON produto(id_categoria, nome)
+            """,
+            # SQL_OBTER_TODOS e busca ordenada por nome
+            """
+            CREATE INDEX IF NOT EXISTS idx_produto_nome
+            ON produto(nome)
+            """,
+            # SQL_OBTER_POR_TOKEN (autenticação por cookie)
+            """
+            CREATE INDEX IF NOT EXISTS idx_usuario_token
+            ON usuario(token) WHERE token IS NOT NULL
+            """,
+            # SQL_OBTER_TODOS_POR_PERFIL e contagem por perfil (cobertura)
+            """
+            CREATE INDEX IF NOT EXISTS idx_usuario_perfil_nome
+            ON usuario(perfil, nome)
+            """,
+            # itens que referenciam um produto (alteração/exclusão de produto)
+            """
+            CREATE INDEX IF NOT EXISTS idx_item_pedido_produto
+            ON item_pedido(id_produto)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_categoria_nome
+            ON categoria(nome)
+            """,
+            "ANALYZE",
+        ],
+    ),
+    (
+        3,
+        "Busca textual de produtos (FTS5)",
+        [
+            # índice externo: o texto fica só em produto, produto_fts guarda
+            # apenas os tokens (sem acentos) e prefixos de 2 e 3 letras
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS produto_fts USING fts5(
+                nome,
+                descricao,
+                content='produto',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3')
+            """,
+            # relevância (rank) pondera o nome 10x mais que a descrição
+            """
+            INSERT INTO produto_fts(produto_fts, rank)
+            VALUES ('rank', 'bm25(10.0, 1.0)')
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS produto_fts_apos_inserir
+            AFTER INSERT ON produto BEGIN
+                INSERT INTO produto_fts(rowid, nome, descricao)
+                VALUES (new.id, new.nome, new.descricao);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS produto_fts_apos_excluir
+            AFTER DELETE ON produto BEGIN
+                INSERT INTO produto_fts(produto_fts, rowid, nome, descricao)
+                VALUES ('delete', old.id, old.nome, old.descricao);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS produto_fts_apos_alterar
+            AFTER UPDATE OF nome, descricao ON produto BEGIN
+                INSERT INTO produto_fts(produto_fts, rowid, nome, descricao)
+                VALUES ('delete', old.id, old.nome, old.descricao);
+                INSERT INTO produto_fts(rowid, nome, descricao)
+                VALUES (new.id, new.nome, new.descricao);
+            END
+            """,
+            "INSERT INTO produto_fts(produto_fts) VALUES ('rebuild')",
+        ],
+    ),
+    (
+        4,
+        "Contadores de alteração por tabela para as listagens do admin",
+        [
+            versao_sql.SQL_CRIAR_TABELA,
+            versao_sql.SQL_CRIAR_TABELA_ALTERACAO,
+            versao_sql.SQL_CRIAR_INDICE_ALTERACAO,
+            versao_sql.SQL_INSERIR_TABELAS,
+        ]
+        + [
+            gatilho
+            for tabela in versao_sql.TABELAS_VERSIONADAS
+            for gatilho in versao_sql.montar_gatilhos(tabela)
+        ],
+    ),
+    (
+        5,
+        "Total e quantidade de itens do pedido mantidos por gatilhos",
+        [
+            """
+            ALTER TABLE pedido
+            ADD COLUMN quantidade_itens INTEGER NOT NULL DEFAULT 0
+            """,
+            pedido_sql.SQL_CORRIGIR_TOTAIS_INCONSISTENTES,
+        ]
+        + item_pedido_sql.SQL_CRIAR_GATILHOS_TOTAL,
+    ),
+    (
+        6,
+        "Reservas de estoque dos pedidos",
+        [
+            estoque_sql.SQL_CRIAR_TABELA_RESERVA,
+            estoque_sql.SQL_CRIAR_INDICE_EXPIRACAO,
+            estoque_sql.SQL_MARCAR_PEDIDOS_CONFIRMADOS,
+        ],
+    ),
+    (
+        7,
+        "Data e hora dos pedidos em milissegundos e índice por cliente e data",
+        [
+            pedido_sql.SQL_CONVERTER_DATA_HORA_EPOCH_MS.replace("#1", "pedido"),
+            pedido_sql.SQL_CONVERTER_DATA_HORA_EPOCH_MS.replace(
+                "#1", "historico.pedido"
+            ),
+            "DROP INDEX IF EXISTS idx_pedido_cliente_data_hora",
+            "DROP INDEX IF EXISTS historico.idx_pedido_cliente_data_hora",
+            pedido_sql.SQL_CRIAR_INDICE_CLIENTE_DATA_HORA,
+        ],
+    ),
+    (
+        8,
+        "Resumo dos pedidos por cliente e estado mantido por gatilhos",
+        [resumo_cliente_sql.SQL_CRIAR_TABELA]
+        + resumo_cliente_sql.SQL_CRIAR_GATILHOS
+        + resumo_cliente_sql.SQL_RECALCULAR,
+    ),
+    (
+        9,
+        "Sessões da autenticação por cookie com hash do token",
+        [
+            sessao_sql.SQL_CRIAR_TABELA,
+            sessao_sql.SQL_CRIAR_INDICE_USUARIO,
+            sessao_sql.SQL_CRIAR_INDICE_EXPIRACAO,
+        ],
+    ),
+    (
+        10,
+        "Saídas de estado dos pedidos para o modo delta da listagem por estado",
+        [
+            pedido_sql.SQL_CRIAR_TABELA_SAIDA_ESTADO,
+            pedido_sql.SQL_CRIAR_INDICE_SAIDA_ESTADO,
+        ]
+        + pedido_sql.SQL_CRIAR_GATILHOS_SAIDA_ESTADO,
+    ),
+]
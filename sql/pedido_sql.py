@@ -9,6 +9,21 @@ SQL_CRIAR_TABELA = """
         FOREIGN KEY (id_cliente) REFERENCES cliente(id))
 """
 
+# data_hora passou a ser gravada em milissegundos desde a época (migração
+# 7); o texto antigo de str(datetime) está em horário local, daí o 'utc'.
+# #1: tabela (pedido ou historico.pedido)
+SQL_CONVERTER_DATA_HORA_EPOCH_MS = """
+    UPDATE #1
+    SET data_hora = CAST(
+        round((julianday(data_hora, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+    WHERE typeof(data_hora) = 'text'
+"""
+
+SQL_CRIAR_INDICE_CLIENTE_DATA_HORA = """
+    CREATE INDEX IF NOT EXISTS idx_pedido_cliente_data_hora_desc
+    ON pedido(id_cliente, data_hora DESC)
+"""
+
 SQL_INSERIR = """
     INSERT INTO pedido(data_hora, valor_total, endereco_entrega, estado, id_cliente)
     VALUES (?, ?, ?, ?, ?)
@@ -26,15 +41,34 @@ SQL_ALTERAR_ESTADO = """
     WHERE id=?
 """
 
+# só altera se o pedido ainda estiver no estado validado
+SQL_ALTERAR_ESTADO_SE_ATUAL = """
+    UPDATE pedido
+    SET estado=?
+    WHERE id=? AND estado=?
+"""
+
+# #1: um marcador ? por pedido
+SQL_OBTER_ESTADOS = """
+    SELECT id, estado
+    FROM pedido
+    WHERE id IN (#1)
+"""
+
 SQL_ATUALIZAR_PARA_FECHAR = """
     UPDATE pedido
-    SET endereco_entrega=?, valor_total=?
+    SET endereco_entrega=?
     WHERE id=?
 """
 
-SQL_ATUALIZAR_VALOR_TOTAL = """
+SQL_RECALCULAR_TOTAIS = """
     UPDATE pedido
-    SET valor_total=?
+    SET valor_total = COALESCE((
+            SELECT ROUND(SUM(valor_item), 2) FROM item_pedido
+            WHERE id_pedido = pedido.id), 0),
+        quantidade_itens = (
+            SELECT COUNT(*) FROM item_pedido
+            WHERE id_pedido = pedido.id)
     WHERE id=?
 """
 
@@ -44,38 +78,169 @@ SQL_EXCLUIR = """
 """
 
 SQL_OBTER_POR_ID = """
-    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
     FROM pedido
     WHERE id=?
 """
 
+# pedido, cliente e itens em uma única consulta: uma linha por item (ou
+# uma só linha, com as colunas do item nulas, se o pedido não tiver itens)
+SQL_OBTER_DETALHADO_POR_ID = """
+    SELECT p.id, p.data_hora, p.valor_total, p.endereco_entrega, p.estado,
+        p.id_cliente, p.quantidade_itens,
+        u.id, u.nome, u.cpf, u.data_nascimento, u.endereco, u.telefone,
+        u.email, u.perfil,
+        i.id_pedido, i.id_produto, i.nome_produto, i.valor_produto,
+        i.quantidade, i.valor_item
+    FROM pedido p
+    LEFT JOIN usuario u ON u.id = p.id_cliente
+    LEFT JOIN item_pedido i ON i.id_pedido = p.id
+    WHERE p.id=?
+    ORDER BY i.rowid
+"""
+
+SQL_OBTER_DETALHADO_POR_ID_HISTORICO = SQL_OBTER_DETALHADO_POR_ID.replace(
+    "FROM pedido p", "FROM historico.pedido p"
+).replace("JOIN item_pedido i", "JOIN historico.item_pedido i")
+
 SQL_OBTER_QUANTIDADE = """
     SELECT COUNT(*) 
     FROM pedido
     WHERE id_cliente=?
 """
 
-SQL_OBTER_POR_PERIODO = """
-    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente
+# página de "Meus Pedidos": sem o carrinho, por chave (data_hora, id) no
+# índice (id_cliente, data_hora DESC); #1: filtro do cursor, #2: ordenação
+SQL_OBTER_PAGINA_POR_PERIODO = """
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
     FROM pedido
     WHERE (id_cliente = ?) AND (data_hora BETWEEN ? AND ?)
-    ORDER BY data_hora DESC
+        AND estado <> 'carrinho' AND #1
+    ORDER BY #2
+    LIMIT ?
 """
 
-SQL_OBTER_QUANTIDADE_POR_PERIODO = """
-    SELECT COUNT(*) 
-    FROM pedido
+SQL_OBTER_PAGINA_POR_PERIODO_COM_HISTORICO = """
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
+    FROM main.pedido
     WHERE (id_cliente = ?) AND (data_hora BETWEEN ? AND ?)
+        AND estado <> 'carrinho' AND #1
+    UNION ALL
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
+    FROM historico.pedido
+    WHERE (id_cliente = ?) AND (data_hora BETWEEN ? AND ?) AND #1
+    ORDER BY #2
+    LIMIT ?
 """
 
 SQL_OBTER_POR_ESTADO = """
-    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
     FROM pedido
     WHERE (id_cliente = ?) AND (estado = ?)
 """
 
 SQL_OBTER_TODOS_POR_ESTADO = """
-    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
     FROM pedido
     WHERE (estado = ?)
-"""
\ No newline at end of file
+"""
+
+# listagem do admin em páginas ou em fluxo, na ordem do id, que o índice
+# idx_pedido_estado já entrega sem ordenação
+# #1: filtro do cursor, #2: ordenação
+SQL_OBTER_PAGINA_POR_ESTADO = """
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
+    FROM pedido
+    WHERE estado = ? AND #1
+    ORDER BY #2
+    LIMIT ?
+"""
+
+SQL_OBTER_ALTERADOS_POR_ESTADO_DESDE = """
+    SELECT id, data_hora, valor_total, endereco_entrega, estado, id_cliente,
+        quantidade_itens
+    FROM pedido
+    WHERE (estado = ?) AND id IN (
+        SELECT id_registro FROM alteracao
+        WHERE tabela = 'pedido' AND versao > ? AND excluido = 0)
+"""
+
+# última versão em que cada pedido saiu de cada estado (mudou de estado,
+# foi excluído ou arquivado): no modo delta da listagem por estado, só
+# esses ids vão em "excluidos". O gatilho roda antes do que incrementa a
+# versão da tabela e grava a versão anterior à mudança, daí o >= na consulta
+SQL_CRIAR_TABELA_SAIDA_ESTADO = """
+    CREATE TABLE IF NOT EXISTS saida_estado_pedido (
+        estado TEXT NOT NULL,
+        id_pedido INTEGER NOT NULL,
+        versao INTEGER NOT NULL,
+        PRIMARY KEY (estado, id_pedido)) WITHOUT ROWID
+"""
+
+SQL_CRIAR_INDICE_SAIDA_ESTADO = """
+    CREATE INDEX IF NOT EXISTS idx_saida_estado_pedido_estado_versao
+    ON saida_estado_pedido(estado, versao)
+"""
+
+SQL_CRIAR_GATILHOS_SAIDA_ESTADO = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS pedido_saida_estado_apos_{evento.lower()}
+    AFTER {evento} ON pedido {condicao} BEGIN
+        INSERT INTO saida_estado_pedido(estado, id_pedido, versao)
+        VALUES (
+            old.estado,
+            old.id,
+            (SELECT versao FROM versao_tabela WHERE tabela = 'pedido'))
+        ON CONFLICT (estado, id_pedido) DO UPDATE
+        SET versao = excluded.versao;
+    END
+    """
+    for evento, condicao in (
+        ("UPDATE", "WHEN old.estado <> new.estado"),
+        ("DELETE", ""),
+    )
+]
+
+SQL_OBTER_IDS_SAIDOS_DO_ESTADO_DESDE = """
+    SELECT id_pedido
+    FROM saida_estado_pedido
+    WHERE estado = ? AND versao >= ?
+"""
+
+# verificação de consistência: totais gravados que divergem dos itens, em
+# uma única passada agrupada sobre item_pedido
+_TOTAIS_CALCULADOS = """
+    SELECT p.id, p.valor_total, p.quantidade_itens,
+        COALESCE(t.valor_total, 0) AS valor_calculado,
+        COALESCE(t.quantidade_itens, 0) AS quantidade_calculada
+    FROM pedido p
+    LEFT JOIN (
+        SELECT id_pedido, ROUND(SUM(valor_item), 2) AS valor_total,
+            COUNT(*) AS quantidade_itens
+        FROM item_pedido
+        GROUP BY id_pedido) t ON t.id_pedido = p.id
+"""
+
+SQL_OBTER_TOTAIS_INCONSISTENTES = f"""
+    SELECT id, valor_total, quantidade_itens, valor_calculado, quantidade_calculada
+    FROM ({_TOTAIS_CALCULADOS})
+    WHERE ABS(valor_total - valor_calculado) >= 0.005
+        OR quantidade_itens <> quantidade_calculada
+    ORDER BY id
+"""
+
+SQL_CORRIGIR_TOTAIS_INCONSISTENTES = f"""
+    UPDATE pedido
+    SET valor_total = c.valor_calculado, quantidade_itens = c.quantidade_calculada
+    FROM ({_TOTAIS_CALCULADOS}) c
+    WHERE c.id = pedido.id
+        AND (ABS(c.valor_total - c.valor_calculado) >= 0.005
+            OR c.quantidade_itens <> c.quantidade_calculada)
+"""
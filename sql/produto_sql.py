@@ -42,22 +42,78 @@ SQL_OBTER_QUANTIDADE = """
     SELECT COUNT(*) FROM produto
 """
 
-SQL_OBTER_BUSCA = """
+SQL_OBTER_POR_CATEGORIA = """
     SELECT p.id, p.id_categoria, p.nome, p.preco, p.descricao, p.estoque
     FROM produto p
-    WHERE p.nome LIKE ? OR p.descricao LIKE ?
-    ORDER BY #1
+    WHERE p.id_categoria=?
+    ORDER BY p.nome
+"""
+
+# #1: coluna da chave de ordenação, #2: total (COUNT(*) OVER () só na
+# primeira página), #3: filtro do cursor, #4: ordenação
+SQL_OBTER_BUSCA_CURSOR = """
+    SELECT p.id, p.id_categoria, p.nome, p.preco, p.descricao, p.estoque,
+        #1, #2
+    FROM produto p
+    WHERE #3
+    ORDER BY #4
     LIMIT ? OFFSET ?
 """
 
-SQL_OBTER_QUANTIDADE_BUSCA = """
-    SELECT COUNT(*) FROM produto
-    WHERE nome LIKE ? OR descricao LIKE ?
+SQL_OBTER_BUSCA_CURSOR_FTS = """
+    SELECT p.id, p.id_categoria, p.nome, p.preco, p.descricao, p.estoque,
+        #1, #2
+    FROM produto_fts f
+    INNER JOIN produto p ON p.id = f.rowid
+    WHERE produto_fts MATCH ? AND #3
+    ORDER BY #4
+    LIMIT ? OFFSET ?
 """
 
-SQL_OBTER_POR_CATEGORIA = """
-    SELECT p.id, p.id_categoria, p.nome, p.preco, p.descricao, p.estoque
-    FROM produto p
-    WHERE p.id_categoria=?
-    ORDER BY p.nome
-"""
\ No newline at end of file
+
+# carga em lote: os gatilhos que indexam o FTS e registram a versão linha a
+# linha são suspensos, e as linhas novas (id acima do maior anterior) são
+# tratadas de uma só vez
+SQL_OBTER_MAIOR_ID = """
+    SELECT COALESCE(MAX(id), 0) FROM produto
+"""
+
+SQL_OBTER_GATILHOS_INSERIR = """
+    SELECT name, sql FROM sqlite_master
+    WHERE type = 'trigger'
+        AND name IN ('produto_fts_apos_inserir', 'produto_versao_apos_insert')
+"""
+
+SQL_EXCLUIR_GATILHO = """
+    DROP TRIGGER #1
+"""
+
+SQL_INDEXAR_FTS_APOS_ID = """
+    INSERT INTO produto_fts(rowid, nome, descricao)
+    SELECT id, nome, descricao FROM produto WHERE id > ?
+"""
+
+SQL_INCREMENTAR_VERSAO = """
+    UPDATE versao_tabela
+    SET versao = versao + 1,
+        alterada_em = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE tabela = 'produto'
+"""
+
+SQL_REGISTRAR_VERSAO_APOS_ID = """
+    INSERT INTO alteracao(tabela, id_registro, versao, excluido)
+    SELECT 'produto', id,
+        (SELECT versao FROM versao_tabela WHERE tabela = 'produto'), 0
+    FROM produto WHERE id > ?
+    ON CONFLICT (tabela, id_registro) DO UPDATE
+    SET versao = excluded.versao, excluido = 0
+"""
+
+SQL_OBTER_ALTERADOS_DESDE = """
+    SELECT id, id_categoria, nome, preco, descricao, estoque
+    FROM produto
+    WHERE id IN (
+        SELECT id_registro FROM alteracao
+        WHERE tabela = 'produto' AND versao > ? AND excluido = 0)
+    ORDER BY nome
+"""
@@ -0,0 +1,89 @@
+# resumo dos pedidos de cada cliente por estado, mantido pelos gatilhos de
+# pedido: a página "Meus Pedidos" lê só as linhas do cliente, sem percorrer
+# o histórico. O carrinho não conta como pedido e fica de fora, de modo que
+# as alterações de itens do carrinho não escrevem aqui.
+SQL_CRIAR_TABELA = """
+    CREATE TABLE IF NOT EXISTS resumo_cliente (
+        id_cliente INTEGER NOT NULL,
+        estado TEXT NOT NULL,
+        quantidade INTEGER NOT NULL DEFAULT 0,
+        valor_total FLOAT NOT NULL DEFAULT 0,
+        PRIMARY KEY (id_cliente, estado))
+    WITHOUT ROWID
+"""
+
+SQL_CRIAR_GATILHOS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS pedido_resumo_apos_inserir
+    AFTER INSERT ON pedido WHEN new.estado <> 'carrinho' BEGIN
+        INSERT INTO resumo_cliente(id_cliente, estado, quantidade, valor_total)
+        VALUES (new.id_cliente, new.estado, 1, new.valor_total)
+        ON CONFLICT (id_cliente, estado) DO UPDATE
+        SET quantidade = quantidade + 1,
+            valor_total = ROUND(valor_total + excluded.valor_total, 2);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pedido_resumo_apos_alterar
+    AFTER UPDATE OF id_cliente, estado, valor_total ON pedido
+    WHEN old.estado <> 'carrinho' OR new.estado <> 'carrinho' BEGIN
+        UPDATE resumo_cliente
+        SET quantidade = quantidade - 1,
+            valor_total = ROUND(valor_total - old.valor_total, 2)
+        WHERE id_cliente = old.id_cliente AND estado = old.estado;
+        INSERT INTO resumo_cliente(id_cliente, estado, quantidade, valor_total)
+        SELECT new.id_cliente, new.estado, 1, new.valor_total
+        WHERE new.estado <> 'carrinho'
+        ON CONFLICT (id_cliente, estado) DO UPDATE
+        SET quantidade = quantidade + 1,
+            valor_total = ROUND(valor_total + excluded.valor_total, 2);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pedido_resumo_apos_excluir
+    AFTER DELETE ON pedido WHEN old.estado <> 'carrinho' BEGIN
+        UPDATE resumo_cliente
+        SET quantidade = quantidade - 1,
+            valor_total = ROUND(valor_total - old.valor_total, 2)
+        WHERE id_cliente = old.id_cliente AND estado = old.estado;
+    END
+    """,
+]
+
+# resumo calculado a partir dos pedidos, inclusive os arquivados
+_SQL_CALCULADO = """
+    SELECT id_cliente, estado, COUNT(*) AS quantidade,
+        ROUND(SUM(valor_total), 2) AS valor_total
+    FROM (
+        SELECT id_cliente, estado, valor_total FROM main.pedido
+        UNION ALL
+        SELECT id_cliente, estado, valor_total FROM historico.pedido)
+    WHERE estado <> 'carrinho'
+    GROUP BY id_cliente, estado
+"""
+
+SQL_RECALCULAR = [
+    "DELETE FROM resumo_cliente",
+    f"""
+    INSERT INTO resumo_cliente(id_cliente, estado, quantidade, valor_total)
+    {_SQL_CALCULADO}
+    """,
+]
+
+SQL_OBTER_POR_CLIENTE = """
+    SELECT estado, quantidade, valor_total
+    FROM resumo_cliente
+    WHERE id_cliente = ? AND quantidade > 0
+"""
+
+SQL_OBTER_INCONSISTENTES = f"""
+    SELECT COALESCE(r.id_cliente, c.id_cliente), COALESCE(r.estado, c.estado),
+        COALESCE(r.quantidade, 0), COALESCE(r.valor_total, 0),
+        COALESCE(c.quantidade, 0), COALESCE(c.valor_total, 0)
+    FROM (SELECT * FROM resumo_cliente WHERE quantidade <> 0) r
+    FULL OUTER JOIN ({_SQL_CALCULADO}) c
+        ON c.id_cliente = r.id_cliente AND c.estado = r.estado
+    WHERE r.id_cliente IS NULL OR c.id_cliente IS NULL
+        OR r.quantidade <> c.quantidade
+        OR ABS(r.valor_total - c.valor_total) > 0.005
+"""
@@ -0,0 +1,55 @@
+# sessões da autenticação por cookie: o cookie leva o token e o banco guarda
+# só o hash SHA-256 dele (chave primária), de modo que uma cópia do banco
+# não serve para entrar como outro usuário. expira_em em milissegundos
+# desde a época
+SQL_CRIAR_TABELA = """
+    CREATE TABLE IF NOT EXISTS sessao (
+        hash_token BLOB PRIMARY KEY,
+        id_usuario INTEGER NOT NULL,
+        expira_em INTEGER NOT NULL)
+    WITHOUT ROWID
+"""
+
+SQL_CRIAR_INDICE_USUARIO = """
+    CREATE INDEX IF NOT EXISTS idx_sessao_id_usuario
+    ON sessao(id_usuario)
+"""
+
+SQL_CRIAR_INDICE_EXPIRACAO = """
+    CREATE INDEX IF NOT EXISTS idx_sessao_expira_em
+    ON sessao(expira_em)
+"""
+
+SQL_INSERIR = """
+    INSERT INTO sessao(hash_token, id_usuario, expira_em)
+    VALUES (?, ?, ?)
+"""
+
+SQL_OBTER = """
+    SELECT s.expira_em, u.id, u.nome, u.cpf, u.data_nascimento, u.endereco,
+        u.telefone, u.email, u.perfil
+    FROM sessao s
+    INNER JOIN usuario u ON u.id = s.id_usuario
+    WHERE s.hash_token = ? AND s.expira_em > ?
+"""
+
+SQL_RENOVAR = """
+    UPDATE sessao
+    SET expira_em = ?
+    WHERE hash_token = ? AND expira_em < ?
+"""
+
+SQL_EXCLUIR = """
+    DELETE FROM sessao
+    WHERE hash_token = ?
+"""
+
+SQL_EXCLUIR_POR_USUARIO = """
+    DELETE FROM sessao
+    WHERE id_usuario = ?
+"""
+
+SQL_EXCLUIR_EXPIRADAS = """
+    DELETE FROM sessao
+    WHERE expira_em <= ?
+"""
@@ -77,15 +77,32 @@ SQL_OBTER_QUANTIDADE_POR_PERFIL = """
     WHERE perfil=?
 """
 
-SQL_OBTER_BUSCA = """
+# #1: total (COUNT(*) OVER () só na primeira página), #2: filtro do
+# cursor, #3: ordenação
+SQL_OBTER_BUSCA_CURSOR = """
+    SELECT id, nome, cpf, data_nascimento, endereco, telefone, email, #1
+    FROM usuario
+    WHERE (nome LIKE ? OR cpf LIKE ?) AND #2
+    ORDER BY #3
+    LIMIT ?
+"""
+
+# listagem do admin em páginas ou em fluxo: na ordem do id a tabela é
+# percorrida sem ordenação, e a página seguinte começa direto no cursor
+# #1: filtro do cursor, #2: ordenação
+SQL_OBTER_PAGINA = """
     SELECT id, nome, cpf, data_nascimento, endereco, telefone, email
     FROM usuario
-    WHERE nome LIKE ? OR cpf LIKE ?
-    ORDER BY nome
-    LIMIT ? OFFSET ?
+    WHERE #1
+    ORDER BY #2
+    LIMIT ?
 """
 
-SQL_OBTER_QUANTIDADE_BUSCA = """
-    SELECT COUNT(*) FROM usuario
-    WHERE nome LIKE ? OR cpf LIKE ?
+SQL_OBTER_ALTERADOS_DESDE = """
+    SELECT id, nome, cpf, data_nascimento, endereco, telefone, email
+    FROM usuario
+    WHERE id IN (
+        SELECT id_registro FROM alteracao
+        WHERE tabela = 'usuario' AND versao > ? AND excluido = 0)
+    ORDER BY nome
 """
@@ -0,0 +1,79 @@
+# tabelas cujas listagens do admin aceitam GET condicional e modo delta;
+# as versões começam em 1, e ?since=0 equivale à listagem completa
+TABELAS_VERSIONADAS = ("produto", "categoria", "usuario", "pedido")
+
+SQL_CRIAR_TABELA = """
+    CREATE TABLE IF NOT EXISTS versao_tabela (
+        tabela TEXT PRIMARY KEY,
+        versao INTEGER NOT NULL DEFAULT 0,
+        alterada_em INTEGER NOT NULL)
+"""
+
+# última versão em que cada registro foi inserido, alterado ou excluído;
+# um registro excluído continua aqui (excluido = 1) para o modo delta
+SQL_CRIAR_TABELA_ALTERACAO = """
+    CREATE TABLE IF NOT EXISTS alteracao (
+        tabela TEXT NOT NULL,
+        id_registro INTEGER NOT NULL,
+        versao INTEGER NOT NULL,
+        excluido INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (tabela, id_registro)) WITHOUT ROWID
+"""
+
+SQL_CRIAR_INDICE_ALTERACAO = """
+    CREATE INDEX IF NOT EXISTS idx_alteracao_tabela_versao
+    ON alteracao(tabela, versao)
+"""
+
+SQL_INSERIR_TABELAS = """
+    INSERT OR IGNORE INTO versao_tabela(tabela, versao, alterada_em)
+    VALUES #1
+""".replace(
+    "#1",
+    ", ".join(
+        f"('{tabela}', 1, CAST(strftime('%s', 'now') AS INTEGER))"
+        for tabela in TABELAS_VERSIONADAS
+    ),
+)
+
+SQL_OBTER_VERSAO = """
+    SELECT versao, alterada_em
+    FROM versao_tabela
+    WHERE tabela = ?
+"""
+
+SQL_OBTER_IDS_ALTERADOS_DESDE = """
+    SELECT id_registro
+    FROM alteracao
+    WHERE tabela = ? AND versao > ?
+"""
+
+def montar_gatilhos(tabela: str) -> list[str]:
+    """Gatilhos que incrementam o contador da tabela e registram a versão
+    de cada registro inserido, alterado ou excluído."""
+    gatilhos = []
+    for evento, registro, excluido in (
+        ("INSERT", "new", 0),
+        ("UPDATE", "new", 0),
+        ("DELETE", "old", 1),
+    ):
+        gatilhos.append(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_versao_apos_{evento.lower()}
+            AFTER {evento} ON {tabela} BEGIN
+                UPDATE versao_tabela
+                SET versao = versao + 1,
+                    alterada_em = CAST(strftime('%s', 'now') AS INTEGER)
+                WHERE tabela = '{tabela}';
+                INSERT INTO alteracao(tabela, id_registro, versao, excluido)
+                VALUES (
+                    '{tabela}',
+                    {registro}.id,
+                    (SELECT versao FROM versao_tabela WHERE tabela = '{tabela}'),
+                    {excluido})
+                ON CONFLICT (tabela, id_registro) DO UPDATE
+                SET versao = excluded.versao, excluido = excluded.excluido;
+            END
+            """
+        )
+    return gatilhos
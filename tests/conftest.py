@@ -0,0 +1,59 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch) -> str:
+    """Cópia do dados.db em um diretório temporário, já migrada, usada pelo
+    pool (DB_ARQUIVO) do próprio teste e dos processos que ele criar."""
+    from util.database import fechar_pool
+    from util.migracoes import executar_migracoes
+
+    arquivo = str(tmp_path / "dados.db")
+    shutil.copy2(os.path.join(RAIZ, "dados.db"), arquivo)
+    monkeypatch.setenv("DB_ARQUIVO", arquivo)
+    fechar_pool()
+    executar_migracoes()
+    yield arquivo
+    fechar_pool()
+
+
+def criar_pedido(
+    arquivo: str, itens: list[tuple[int, int]], estado: str = "pendente"
+) -> int:
+    # itens: (id do produto, quantidade)
+    with sqlite3.connect(arquivo) as conexao:
+        id_cliente = conexao.execute(
+            "SELECT id FROM usuario WHERE perfil = 1 LIMIT 1"
+        ).fetchone()[0]
+        id_pedido = conexao.execute(
+            "INSERT INTO pedido(data_hora, valor_total, endereco_entrega, estado, "
+            "id_cliente) VALUES (unixepoch() * 1000, 0, '', ?, ?)",
+            (estado, id_cliente),
+        ).lastrowid
+        conexao.executemany(
+            "INSERT INTO item_pedido(id_pedido, id_produto, nome_produto, "
+            "valor_produto, quantidade) VALUES (?, ?, 'x', 1, ?)",
+            ((id_pedido, id_produto, quantidade) for id_produto, quantidade in itens),
+        )
+    return id_pedido
+
+
+def definir_estoque(arquivo: str, estoques: dict[int, int]):
+    with sqlite3.connect(arquivo) as conexao:
+        conexao.executemany(
+            "UPDATE produto SET estoque = ? WHERE id = ?",
+            ((estoque, id_produto) for id_produto, estoque in estoques.items()),
+        )
+
+
+def obter_estoque(arquivo: str, id_produto: int) -> int:
+    with sqlite3.connect(arquivo) as conexao:
+        return conexao.execute(
+            "SELECT estoque FROM produto WHERE id = ?", (id_produto,)
+        ).fetchone()[0]
@@ -0,0 +1,23 @@
+from models.produto_model import Produto
+from repositories.produto_repo import ProdutoRepo
+from util.cache import cache_catalogo
+from util.database import obter_conexao
+
+
+def test_escrita_em_transacao_compartilhada_invalida_so_no_commit(banco):
+    produto = Produto(id_categoria=1, nome="Teclado X", preco=10, descricao="", estoque=1)
+    versao = cache_catalogo.versao
+
+    with obter_conexao() as conexao:
+        assert ProdutoRepo.inserir_lote([produto], conexao=conexao) == 1
+        assert ProdutoRepo.alterar(Produto(1, 1, "Novo", 1, "", 1), conexao=conexao)
+        # o que for lido agora ainda é o catálogo antigo e não pode ficar
+        # no cache depois do commit
+        assert cache_catalogo.versao == versao
+    assert cache_catalogo.versao > versao
+
+    versao = cache_catalogo.versao
+    with obter_conexao() as conexao:
+        ProdutoRepo.inserir_lote([produto], conexao=conexao)
+        conexao.rollback()
+    assert cache_catalogo.versao == versao
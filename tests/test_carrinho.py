@@ -0,0 +1,112 @@
+import multiprocessing
+import sqlite3
+
+from services.carrinho_service import CarrinhoService
+
+CLIENTE = 2
+PRODUTO = 1
+
+
+def adicionar_juntos(barreira, fila, cliques: int):
+    # roda em outro processo; todos começam a clicar ao mesmo tempo
+    from util.database import fechar_pool
+
+    barreira.wait()
+    gravados = [CarrinhoService.adicionar(CLIENTE, PRODUTO) for _ in range(cliques)]
+    fila.put(sum(carrinho is not None for carrinho in gravados))
+    fechar_pool()
+
+
+def test_adicoes_concorrentes_nao_perdem_cliques(banco):
+    processos, cliques = 6, 15
+    contexto = multiprocessing.get_context("spawn")
+    barreira = contexto.Barrier(processos)
+    fila = contexto.Queue()
+    trabalhadores = [
+        contexto.Process(target=adicionar_juntos, args=(barreira, fila, cliques))
+        for _ in range(processos)
+    ]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    gravados = sum(fila.get(timeout=60) for _ in trabalhadores)
+    for trabalhador in trabalhadores:
+        trabalhador.join(timeout=60)
+        assert trabalhador.exitcode == 0
+
+    assert gravados == processos * cliques
+    with sqlite3.connect(banco) as conexao:
+        carrinhos = conexao.execute(
+            "SELECT id FROM pedido WHERE id_cliente = ? AND estado = 'carrinho'",
+            (CLIENTE,),
+        ).fetchall()
+        assert len(carrinhos) == 1
+        quantidade = conexao.execute(
+            "SELECT quantidade FROM item_pedido WHERE id_pedido = ? AND id_produto = ?",
+            (carrinhos[0][0], PRODUTO),
+        ).fetchone()[0]
+    assert quantidade == processos * cliques
+
+
+def test_diminuir_ate_zero_remove_o_item(banco):
+    CarrinhoService.adicionar(CLIENTE, PRODUTO, 2)
+
+    carrinho = CarrinhoService.diminuir(CLIENTE, PRODUTO)
+    assert CarrinhoService.obter_item(carrinho, PRODUTO).quantidade == 1
+    carrinho = CarrinhoService.diminuir(CLIENTE, PRODUTO)
+    assert CarrinhoService.obter_item(carrinho, PRODUTO) is None
+    assert CarrinhoService.diminuir(CLIENTE, PRODUTO) is None
+
+
+def test_variacao_de_outro_worker_nao_vai_para_o_proximo_carrinho(banco):
+    from models.pedido_model import EstadoPedido
+    from repositories.pedido_repo import PedidoRepo
+    from util.buffer_carrinho import BufferCarrinho
+
+    fechado = CarrinhoService.adicionar(CLIENTE, PRODUTO, 2)
+    # cliques acumulados no buffer de outro worker, que não é gravado
+    # quando o pedido sai do carrinho
+    outro_worker = BufferCarrinho()
+    outro_worker.registrar(fechado.id, PRODUTO, 3)
+    PedidoRepo.alterar_estado(fechado.id, EstadoPedido.PENDENTE.value)
+    novo = CarrinhoService.adicionar(CLIENTE, PRODUTO)
+
+    lote = outro_worker.retirar()
+    assert CarrinhoService.aplicar_variacoes(lote)
+    outro_worker.concluir(lote, True)
+
+    with sqlite3.connect(banco) as conexao:
+        quantidades = dict(
+            conexao.execute(
+                "SELECT id_pedido, quantidade FROM item_pedido "
+                "WHERE id_pedido IN (?, ?) AND id_produto = ?",
+                (fechado.id, novo.id, PRODUTO),
+            ).fetchall()
+        )
+    assert quantidades == {fechado.id: 2, novo.id: 1}
+    assert outro_worker.variacao(fechado.id, PRODUTO) == 0
+
+
+def test_lote_sai_do_buffer_na_mesma_chamada_do_commit(banco):
+    from util.buffer_carrinho import BufferCarrinho
+
+    carrinho = CarrinhoService.adicionar(CLIENTE, PRODUTO)
+    buffer = BufferCarrinho()
+    buffer.registrar(carrinho.id, PRODUTO, 2)
+    lote = buffer.retirar()
+    assert buffer.variacao(carrinho.id, PRODUTO) == 2
+    vistos = []
+
+    def ao_concluir(gravado):
+        buffer.concluir(lote, gravado)
+        # outra conexão já enxerga a quantidade nova, e o buffer já não
+        # soma o lote: quem ler agora não conta a variação duas vezes
+        with sqlite3.connect(banco) as conexao:
+            quantidade = conexao.execute(
+                "SELECT quantidade FROM item_pedido "
+                "WHERE id_pedido = ? AND id_produto = ?",
+                (carrinho.id, PRODUTO),
+            ).fetchone()[0]
+        vistos.append((gravado, quantidade, buffer.variacao(carrinho.id, PRODUTO)))
+
+    assert CarrinhoService.aplicar_variacoes(lote, ao_concluir=ao_concluir)
+    assert vistos == [(True, 3, 0)]
@@ -0,0 +1,46 @@
+import sqlite3
+
+from conftest import criar_pedido
+from repositories.pedido_repo import PedidoRepo
+from repositories.resumo_cliente_repo import ResumoClienteRepo
+from util.consistencia import verificar_resumos_clientes, verificar_totais_pedidos
+
+
+def desajustar_total(arquivo: str, id_pedido: int):
+    with sqlite3.connect(arquivo) as conexao:
+        conexao.execute("UPDATE pedido SET valor_total = 999 WHERE id = ?", (id_pedido,))
+
+
+def test_corrigir_totais_devolve_o_que_sobrou(banco):
+    desajustar_total(banco, criar_pedido(banco, [(1, 2)]))
+
+    assert verificar_totais_pedidos() == 1
+    assert verificar_totais_pedidos(corrigir=True) == 0
+    assert verificar_totais_pedidos() == 0
+
+
+def test_correcao_de_totais_que_falha_continua_inconsistente(banco, monkeypatch):
+    desajustar_total(banco, criar_pedido(banco, [(1, 2)]))
+    monkeypatch.setattr(PedidoRepo, "corrigir_totais", classmethod(lambda cls: 0))
+
+    assert verificar_totais_pedidos(corrigir=True) == 1
+
+
+def desajustar_resumo(arquivo: str):
+    criar_pedido(arquivo, [(1, 2)], "pago")
+    with sqlite3.connect(arquivo) as conexao:
+        conexao.execute("UPDATE resumo_cliente SET quantidade = quantidade + 5")
+
+
+def test_recalcular_resumos_devolve_o_que_sobrou(banco):
+    desajustar_resumo(banco)
+
+    assert verificar_resumos_clientes() > 0
+    assert verificar_resumos_clientes(corrigir=True) == 0
+
+
+def test_recalculo_de_resumos_que_falha_continua_inconsistente(banco, monkeypatch):
+    desajustar_resumo(banco)
+    monkeypatch.setattr(ResumoClienteRepo, "recalcular", classmethod(lambda cls: False))
+
+    assert verificar_resumos_clientes(corrigir=True) > 0
@@ -0,0 +1,93 @@
+import multiprocessing
+import sqlite3
+import time
+
+from conftest import criar_pedido, definir_estoque, obter_estoque
+from services.estoque_service import EstoqueService
+
+PRODUTO = 1
+OUTRO_PRODUTO = 2
+
+
+def reservar_juntos(barreira, fila, pedidos: list[int]):
+    # roda em outro processo, com o próprio pool; todos os processos começam
+    # a reservar ao mesmo tempo
+    from util.database import fechar_pool
+
+    barreira.wait()
+    fila.put([EstoqueService.reservar(id_pedido) for id_pedido in pedidos])
+    fechar_pool()
+
+
+def obter_reservado(arquivo: str, id_produto: int) -> int:
+    with sqlite3.connect(arquivo) as conexao:
+        return conexao.execute(
+            "SELECT COALESCE(SUM(i.quantidade), 0) FROM reserva_estoque r "
+            "INNER JOIN item_pedido i ON i.id_pedido = r.id_pedido "
+            "WHERE i.id_produto = ?",
+            (id_produto,),
+        ).fetchone()[0]
+
+
+def test_reservas_concorrentes_nao_passam_do_estoque(banco):
+    processos, pedidos_por_processo, estoque = 6, 4, 7
+    definir_estoque(banco, {PRODUTO: estoque})
+    pedidos = [
+        criar_pedido(banco, [(PRODUTO, 1)])
+        for _ in range(processos * pedidos_por_processo)
+    ]
+    contexto = multiprocessing.get_context("spawn")
+    barreira = contexto.Barrier(processos)
+    fila = contexto.Queue()
+    trabalhadores = [
+        contexto.Process(
+            target=reservar_juntos, args=(barreira, fila, pedidos[i::processos])
+        )
+        for i in range(processos)
+    ]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    resultados = [fila.get(timeout=60) for _ in trabalhadores]
+    for trabalhador in trabalhadores:
+        trabalhador.join(timeout=60)
+        assert trabalhador.exitcode == 0
+
+    assert sum(sum(resultado) for resultado in resultados) == estoque
+    assert obter_estoque(banco, PRODUTO) == 0
+    assert obter_reservado(banco, PRODUTO) == estoque
+
+
+def test_reserva_e_tudo_ou_nada(banco):
+    definir_estoque(banco, {PRODUTO: 5, OUTRO_PRODUTO: 1})
+    id_pedido = criar_pedido(banco, [(PRODUTO, 2), (OUTRO_PRODUTO, 2)])
+
+    assert not EstoqueService.reservar(id_pedido)
+    assert obter_estoque(banco, PRODUTO) == 5
+    assert obter_estoque(banco, OUTRO_PRODUTO) == 1
+    assert EstoqueService.obter_itens_indisponiveis(id_pedido) == ["x"]
+
+
+def test_liberar_devolve_o_estoque_uma_vez(banco):
+    definir_estoque(banco, {PRODUTO: 5})
+    id_pedido = criar_pedido(banco, [(PRODUTO, 3)])
+
+    assert EstoqueService.reservar(id_pedido)
+    assert EstoqueService.reservar(id_pedido)
+    assert obter_estoque(banco, PRODUTO) == 2
+    assert EstoqueService.liberar(id_pedido)
+    assert not EstoqueService.liberar(id_pedido)
+    assert obter_estoque(banco, PRODUTO) == 5
+
+
+def test_confirmar_reserva_vencida_sem_estoque(banco):
+    definir_estoque(banco, {PRODUTO: 1})
+    vencido = criar_pedido(banco, [(PRODUTO, 1)])
+    outro = criar_pedido(banco, [(PRODUTO, 1)])
+
+    assert EstoqueService.reservar(vencido)
+    assert EstoqueService.liberar_expiradas(agora=int(time.time()) + 10**6) == 1
+    assert EstoqueService.reservar(outro)
+    assert not EstoqueService.confirmar(vencido)
+    assert EstoqueService.confirmar(outro)
+    assert obter_estoque(banco, PRODUTO) == 0
+    assert obter_reservado(banco, PRODUTO) == 1
@@ -0,0 +1,45 @@
+import io
+import json
+import sqlite3
+
+import util.importacao
+from util.auth_jwt import conferir_senha, obter_hash_senha
+from util.importacao import importar
+
+HASH_PRONTO = obter_hash_senha("123@Abc")
+
+
+def usuario(numero: int, senha: str) -> dict:
+    return {
+        "nome": f"Importado {numero}",
+        "cpf": f"900.000.000-0{numero}",
+        "data_nascimento": "2000-01-01",
+        "telefone": f"(27) 99999-000{numero}",
+        "email": f"importado{numero}@email.com",
+        "senha": senha,
+    }
+
+
+def test_senhas_recebem_hash_antes_da_transacao(banco, monkeypatch):
+    def obter_hash_sem_lock(senha: str) -> str:
+        # nenhum lote foi gravado ainda: o lock de escrita está livre
+        with sqlite3.connect(banco, timeout=0) as conexao:
+            conexao.execute("BEGIN IMMEDIATE")
+        return obter_hash_senha(senha)
+
+    monkeypatch.setattr(util.importacao, "obter_hash_senha", obter_hash_sem_lock)
+    registros = [usuario(0, "Senha@123"), usuario(1, HASH_PRONTO), usuario(2, "x" * 100)]
+    arquivo = io.StringIO("\n".join(json.dumps(r) for r in registros))
+
+    resultado = importar("usuarios", arquivo, "ndjson", tamanho_lote=1)
+
+    assert (resultado.lidos, resultado.inseridos, resultado.rejeitados) == (3, 2, 1)
+    assert resultado.erros == ["Registro 3: senha: não foi possível gerar o hash."]
+    with sqlite3.connect(banco) as conexao:
+        senhas = dict(
+            conexao.execute(
+                "SELECT email, senha FROM usuario WHERE email LIKE 'importado%'"
+            ).fetchall()
+        )
+    assert conferir_senha("Senha@123", senhas["importado0@email.com"])
+    assert senhas["importado1@email.com"] == HASH_PRONTO
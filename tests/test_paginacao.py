@@ -0,0 +1,23 @@
+from util.paginacao import Cursor, codificar_cursor, decodificar_cursor
+
+CONTEXTO = "produto:1:"
+
+
+def test_cursor_valido_volta_igual():
+    cursor = Cursor(["Mouse", 7], "p", 2, 30, CONTEXTO)
+
+    assert decodificar_cursor(codificar_cursor(cursor), CONTEXTO, 2) == cursor
+
+
+def test_cursor_com_chave_de_outro_formato_volta_a_primeira_pagina():
+    for chave in ([1], [1, 2, 3], [[1], 2], [None, 2], {"a": 1}, "ab"):
+        token = codificar_cursor(Cursor(chave, "p", 2, 30, CONTEXTO))
+        assert decodificar_cursor(token, CONTEXTO, 2) is None
+
+
+def test_cursor_de_outra_listagem_ou_corrompido_e_ignorado():
+    token = codificar_cursor(Cursor(["Mouse", 7], "p", 2, 30, CONTEXTO))
+
+    assert decodificar_cursor(token, "produto:2:", 2) is None
+    assert decodificar_cursor(token[:-3], CONTEXTO, 2) is None
+    assert decodificar_cursor("bm9wZQ", CONTEXTO, 2) is None
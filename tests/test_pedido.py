@@ -0,0 +1,102 @@
+import sqlite3
+
+from conftest import criar_pedido, definir_estoque, obter_estoque
+from models.pedido_model import EstadoPedido
+from repositories.pedido_repo import PedidoRepo
+from services.carrinho_service import CarrinhoService
+from services.estoque_service import EstoqueService
+from services.pedido_service import PedidoService
+
+CLIENTE = 2
+
+
+def conferir_totais(arquivo: str):
+    # o total e a quantidade mantidos pelos gatilhos batem com os itens
+    with sqlite3.connect(arquivo) as conexao:
+        divergentes = conexao.execute(
+            """
+            SELECT p.id, p.valor_total, p.quantidade_itens, i.total, i.quantidade
+            FROM pedido p
+            LEFT JOIN (
+                SELECT id_pedido, ROUND(SUM(valor_item), 2) AS total,
+                       COUNT(*) AS quantidade
+                FROM item_pedido
+                GROUP BY id_pedido) i ON i.id_pedido = p.id
+            WHERE p.valor_total <> COALESCE(i.total, 0)
+               OR p.quantidade_itens <> COALESCE(i.quantidade, 0)
+            """
+        ).fetchall()
+    assert divergentes == []
+
+
+def test_gatilhos_mantem_total_do_carrinho(banco):
+    conferir_totais(banco)
+    for id_produto in (1, 2, 3, 2):
+        CarrinhoService.adicionar(CLIENTE, id_produto)
+        conferir_totais(banco)
+    CarrinhoService.aumentar(CLIENTE, 1)
+    CarrinhoService.diminuir(CLIENTE, 2)
+    CarrinhoService.definir_quantidade(CLIENTE, 3, 5)
+    conferir_totais(banco)
+    id_carrinho = CarrinhoService.adicionar(CLIENTE, 1).id
+    CarrinhoService.aplicar_variacoes({(id_carrinho, 1): -2, (id_carrinho, 3): 4})
+    conferir_totais(banco)
+    CarrinhoService.remover(CLIENTE, 2)
+    conferir_totais(banco)
+
+    carrinho = CarrinhoService.adicionar(CLIENTE, 2)
+    assert carrinho.valor_total == round(sum(i.valor_item for i in carrinho.itens), 2)
+    assert carrinho.quantidade_itens == len(carrinho.itens)
+
+
+def test_alterar_estados_em_lote(banco):
+    definir_estoque(banco, {1: 3})
+    pendente = criar_pedido(banco, [(1, 2)], "pendente")
+    sem_estoque = criar_pedido(banco, [(1, 2)], "pendente")
+    entregue = criar_pedido(banco, [(1, 1)], "entregue")
+    assert EstoqueService.reservar(pendente)
+
+    resultados = PedidoService.alterar_estados(
+        [pendente, sem_estoque, entregue, 999999, pendente], EstadoPedido.PAGO.value
+    )
+
+    assert [(r.id, r.alterado) for r in resultados] == [
+        (pendente, True),
+        (sem_estoque, False),
+        (entregue, False),
+        (999999, False),
+    ]
+    assert resultados[1].erro == "Estoque insuficiente."
+    estados = PedidoRepo.obter_estados([pendente, sem_estoque, entregue])
+    assert estados == {
+        pendente: EstadoPedido.PAGO.value,
+        sem_estoque: EstadoPedido.PENDENTE.value,
+        entregue: EstadoPedido.ENTREGUE.value,
+    }
+    assert obter_estoque(banco, 1) == 1
+
+
+def test_cancelar_em_lote_devolve_o_estoque(banco):
+    definir_estoque(banco, {1: 5})
+    pedidos = [criar_pedido(banco, [(1, 2)], "pendente") for _ in range(2)]
+    for id_pedido in pedidos:
+        assert EstoqueService.reservar(id_pedido)
+    assert PedidoService.alterar_estados(pedidos[:1], EstadoPedido.PAGO.value)[0].alterado
+
+    resultados = PedidoService.alterar_estados(pedidos, EstadoPedido.CANCELADO.value)
+
+    assert all(r.alterado for r in resultados)
+    assert obter_estoque(banco, 1) == 5
+    assert not PedidoService.alterar_estados(pedidos, EstadoPedido.PAGO.value)[0].alterado
+
+
+def test_proximo_estado_segue_o_fluxo_normal():
+    from models.pedido_model import proximo_estado
+
+    estados = [EstadoPedido.CARRINHO.value]
+    while proximo_estado(estados[-1]):
+        estados.append(proximo_estado(estados[-1]))
+    assert estados == [
+        e.value for e in EstadoPedido if e != EstadoPedido.CANCELADO
+    ]
+    assert proximo_estado(EstadoPedido.CANCELADO.value) is None
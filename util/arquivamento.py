@@ -0,0 +1,46 @@
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from repositories.historico_repo import HistoricoRepo
+
+
+def arquivar_pedidos(
+    dias: Optional[int] = None, tamanho_lote: Optional[int] = None
+) -> int:
+    """Move para o banco de histórico, em lotes, os pedidos entregues ou
+    cancelados há mais de `dias` dias (ARQUIVAR_APOS_DIAS, padrão 180).
+    Cada lote é uma transação curta: entre um lote e outro as requisições
+    voltam a escrever normalmente. Devolve o total de pedidos movidos."""
+    if dias is None:
+        dias = int(os.getenv("ARQUIVAR_APOS_DIAS", "180"))
+    if tamanho_lote is None:
+        tamanho_lote = int(os.getenv("ARQUIVAMENTO_LOTE", "500"))
+    limite = datetime.now() - timedelta(days=dias)
+    total = 0
+    while True:
+        movidos = HistoricoRepo.arquivar_lote(limite, tamanho_lote)
+        total += movidos
+        if movidos < tamanho_lote:
+            return total
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    from util.migracoes import executar_migracoes
+
+    parser = argparse.ArgumentParser(
+        description="Arquiva pedidos entregues ou cancelados antigos no banco de histórico."
+    )
+    parser.add_argument("--dias", type=int, help="idade mínima dos pedidos (dias)")
+    parser.add_argument("--lote", type=int, help="pedidos por transação")
+    args = parser.parse_args()
+
+    load_dotenv()
+    executar_migracoes()
+    inicio = time.perf_counter()
+    total = arquivar_pedidos(args.dias, args.lote)
+    print(f"{total} pedidos arquivados em {time.perf_counter() - inicio:.2f}s.")
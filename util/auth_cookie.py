@@ -1,43 +1,82 @@
 import secrets
 from typing import Optional
 import bcrypt
-from fastapi import HTTPException, Request, status
+from fastapi import Request, Response
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Receive, Scope, Send
 from models.usuario_model import Usuario
-from repositories.usuario_repo import UsuarioRepo
 from util.cookies import NOME_COOKIE_AUTH, adicionar_cookie_auth
+from util.politicas_rotas import PoliticaRota, checar_autorizacao, obter_politica_rota
+from util.sessoes import armazenamento_sessoes
 
 
 async def obter_usuario_logado(request: Request) -> Optional[Usuario]:
-    try:
-        token = request.cookies[NOME_COOKIE_AUTH]
-        if token.strip() == "":
-            return None
-        usuario = UsuarioRepo.obter_por_token(token)
-        return usuario
-    except KeyError:
+    token = request.cookies.get(NOME_COOKIE_AUTH, "")
+    if token.strip() == "":
         return None
+    sessao = await armazenamento_sessoes.obter(token)
+    return sessao.usuario if sessao else None
+
+
+def _obter_token(headers: list[tuple[bytes, bytes]]) -> str:
+    for nome, valor in headers:
+        if nome == b"cookie":
+            return cookie_parser(valor.decode("latin-1")).get(NOME_COOKIE_AUTH, "").strip()
+    return ""
+
+
+def _montar_cookie_auth(token: str) -> tuple[bytes, bytes]:
+    resposta = Response()
+    adicionar_cookie_auth(resposta, token, armazenamento_sessoes.duracao)
+    return next(
+        cabecalho for cabecalho in resposta.raw_headers if cabecalho[0] == b"set-cookie"
+    )
+
+
+class MiddlewareAutenticacao:
+    """Middleware ASGI da autenticação por cookie: o usuário da sessão vai
+    para request.state.usuario e a política da rota (util.politicas_rotas)
+    para request.state.politica, como no modo JWT.
+
+    Com o cache de sessões aquecido não há leitura do banco. O cookie só é
+    regravado quando a sessão é renovada (perto de expirar) e a resposta
+    ainda não define o cookie de autenticação (login e logout o fazem)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        politica = obter_politica_rota(scope["path"])
+        estado = scope.setdefault("state", {})
+        estado["politica"] = politica
+        estado["usuario"] = None
+        token = "" if politica is PoliticaRota.PUBLICA else _obter_token(scope["headers"])
+        sessao = await armazenamento_sessoes.obter(token) if token else None
+        if sessao is None:
+            await self.app(scope, receive, send)
+            return
+        estado["usuario"] = sessao.usuario
+        if not (
+            armazenamento_sessoes.precisa_renovar(sessao)
+            and await armazenamento_sessoes.renovar(sessao)
+        ):
+            await self.app(scope, receive, send)
+            return
+        cookie = _montar_cookie_auth(token)
+        prefixo = f"{NOME_COOKIE_AUTH}=".encode()
 
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start" and not any(
+                nome == b"set-cookie" and valor.startswith(prefixo)
+                for nome, valor in mensagem.get("headers", [])
+            ):
+                mensagem["headers"] = list(mensagem.get("headers", [])) + [cookie]
+            await send(mensagem)
 
-async def checar_autenticacao(request: Request, call_next):
-    usuario = await obter_usuario_logado(request)
-    request.state.usuario = usuario
-    response = await call_next(request)
-    if response.status_code == status.HTTP_303_SEE_OTHER:
-        return response
-    if usuario:
-        token = request.cookies[NOME_COOKIE_AUTH]
-        adicionar_cookie_auth(response, token)
-    return response
-
-
-async def checar_autorizacao(request: Request):
-    usuario = request.state.usuario if hasattr(request.state, "usuario") else None
-    area_do_cliente = request.url.path.startswith("/cliente")
-    area_do_admin = request.url.path.startswith("/admin")
-    if (area_do_cliente or area_do_admin) and not usuario:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    if (area_do_cliente and usuario.perfil != 1) or (area_do_admin and usuario.perfil != 0):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+        await self.app(scope, receive, enviar)
 
 
 def obter_hash_senha(senha: str) -> str:
@@ -1,13 +1,42 @@
+import functools
 import os
+import time
+from dataclasses import dataclass
+from typing import Optional
 import bcrypt
 from fastapi.responses import JSONResponse
 import jwt
 from datetime import datetime
 from datetime import timedelta
-from fastapi import HTTPException, Request, status
+from fastapi import Request
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from dtos.usuario_autenticado_dto import UsuarioAutenticadoDto
+from util.cache import CacheLRU
 from util.cookies import NOME_COOKIE_AUTH, NOME_HEADER_AUTH
+from util.politicas_rotas import PoliticaRota, checar_autorizacao, obter_politica_rota
+
+
+@dataclass(frozen=True)
+class ConfiguracaoJwt:
+    secret: str
+    algoritmo: str
+
+
+@functools.cache
+def obter_configuracao_jwt() -> ConfiguracaoJwt:
+    # lida uma única vez, na primeira requisição (depois do load_dotenv)
+    return ConfiguracaoJwt(os.getenv("JWT_SECRET"), os.getenv("JWT_ALGORITHM"))
+
+
+# tokens já verificados -> (exp, usuário): a assinatura só é conferida na
+# primeira vez que o token aparece; o TTL limita o tempo que um token fica
+# no cache, e o exp de cada token continua valendo
+cache_tokens = CacheLRU(
+    int(os.getenv("JWT_CACHE_TAMANHO", "10000")),
+    float(os.getenv("JWT_CACHE_TTL", "300")),
+)
 
 
 async def obter_usuario_logado(request: Request) -> dict:
@@ -16,41 +45,77 @@ async def obter_usuario_logado(request: Request) -> dict:
     if not token_cookie and not token_header:
         return None
     token = token_cookie if token_cookie else token_header.replace("Bearer ", "")
+    return obter_usuario_do_token(token)
+
+
+def obter_usuario_do_token(token: str) -> UsuarioAutenticadoDto:
+    """Usuário do token, verificado uma vez e depois servido pelo cache até
+    o exp do token. O objeto devolvido é compartilhado entre as requisições
+    do mesmo token e não deve ser alterado."""
+    achou, valor = cache_tokens.obter(token)
+    if achou:
+        expira_em, usuario = valor
+        if expira_em is None or expira_em > time.time():
+            return usuario
+    # expirado ou desconhecido: a verificação completa levanta o erro certo
     dados = validar_token(token)
     usuario = UsuarioAutenticadoDto(
         id=dados["id"], nome=dados["nome"], email=dados["email"], perfil=dados["perfil"]
     )
     if "mensagem" in dados.keys():
         usuario.mensagem = dados["mensagem"]
+    cache_tokens.guardar(token, (dados.get("exp"), usuario))
     return usuario
 
 
-async def checar_autenticacao(request: Request, call_next):
-    try:
-        usuario = await obter_usuario_logado(request)
-        request.state.usuario = usuario
-        response = await call_next(request)
-        if response.status_code == status.HTTP_307_TEMPORARY_REDIRECT:
-            return response
-        return response
-    except jwt.ExpiredSignatureError:
-        return JSONResponse({"message": "Token expirado"})
-    except jwt.InvalidTokenError:
-        return JSONResponse({"message": "Token inválido"})
-    except Exception as e:
-        return JSONResponse({"message": f"Erro: {e}"})
-
-
-async def checar_autorizacao(request: Request):
-    usuario = request.state.usuario if hasattr(request.state, "usuario") else None
-    area_do_cliente = request.url.path.startswith("/cliente")
-    area_do_admin = request.url.path.startswith("/admin")
-    if (area_do_cliente or area_do_admin) and not usuario:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    if (area_do_cliente and usuario.perfil != 1) or (
-        area_do_admin and usuario.perfil != 0
-    ):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+_NOME_HEADER_AUTH = NOME_HEADER_AUTH.lower().encode()
+
+
+def _obter_token(headers: list[tuple[bytes, bytes]]) -> Optional[str]:
+    # mesmo critério de obter_usuario_logado (cookie antes do header), lendo
+    # direto os headers crus do escopo ASGI
+    token_cookie = token_header = None
+    for nome, valor in headers:
+        if nome == b"cookie" and token_cookie is None:
+            token_cookie = cookie_parser(valor.decode("latin-1")).get(NOME_COOKIE_AUTH, "")
+        elif nome == _NOME_HEADER_AUTH and token_header is None:
+            token_header = valor.decode("latin-1").replace("Bearer ", "")
+    return token_cookie or token_header or None
+
+
+class MiddlewareAutenticacao:
+    """Middleware ASGI que coloca o usuário do token em request.state.usuario
+    e a política da rota em request.state.politica, que checar_autorizacao
+    usa depois.
+
+    Arquivos estáticos e demais rotas PUBLICA passam direto, sem ler o
+    token. Só erros do token viram resposta aqui; exceções das rotas seguem
+    para os tratadores da aplicação."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        politica = obter_politica_rota(scope["path"])
+        estado = scope.setdefault("state", {})
+        estado["politica"] = politica
+        if politica is PoliticaRota.PUBLICA:
+            estado["usuario"] = None
+            await self.app(scope, receive, send)
+            return
+        try:
+            token = _obter_token(scope["headers"])
+            estado["usuario"] = obter_usuario_do_token(token) if token else None
+        except jwt.ExpiredSignatureError:
+            await JSONResponse({"message": "Token expirado"})(scope, receive, send)
+            return
+        except jwt.InvalidTokenError:
+            await JSONResponse({"message": "Token inválido"})(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
 
 
 def obter_hash_senha(senha: str) -> str:
@@ -76,15 +141,13 @@ def criar_token(id: int, nome: str, email: str, perfil: int) -> str:
         "perfil": perfil,
         "exp": datetime.now() + timedelta(days=1),
     }
-    secret = os.getenv("JWT_SECRET")
-    algorithm = os.getenv("JWT_ALGORITHM")
-    return jwt.encode(payload, secret, algorithm)
+    configuracao = obter_configuracao_jwt()
+    return jwt.encode(payload, configuracao.secret, configuracao.algoritmo)
 
 
 def validar_token(token: str) -> dict:
-    secret = os.getenv("JWT_SECRET")
-    algorithm = os.getenv("JWT_ALGORITHM")
-    return jwt.decode(token, secret, algorithm)
+    configuracao = obter_configuracao_jwt()
+    return jwt.decode(token, configuracao.secret, [configuracao.algoritmo])
 
 
 def configurar_swagger_auth(app):
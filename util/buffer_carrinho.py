@@ -0,0 +1,180 @@
+import asyncio
+import functools
+import os
+import threading
+from typing import List, Optional
+
+from models.item_pedido_model import ItemPedido
+from services.carrinho_service import CarrinhoService
+
+
+class BufferCarrinho:
+    """Variações de quantidade dos itens do carrinho ainda não gravadas,
+    por (id_pedido, id_produto).
+
+    Cliques seguidos em aumentar e diminuir viram uma única variação (+1,
+    +1, -1 = +1), gravada depois junto com as de outros clientes em uma só
+    transação. O buffer é do processo: se ele cair, perde-se no máximo o
+    que foi acumulado desde a última gravação (limitado pelo intervalo e
+    por maximo_pendentes).
+
+    Com vários workers, cada um tem o seu buffer, e fechar o pedido e ir
+    para o pagamento grava só o do worker que atendeu. Por isso a chave é o
+    pedido, não o cliente: o que ficou pendente em outro worker é
+    descartado na gravação (o pedido já não é carrinho) em vez de cair no
+    próximo carrinho do cliente. O pedido leva as quantidades já gravadas;
+    os cliques do último intervalo feitos em outro worker ficam de fora."""
+
+    def __init__(self, maximo_pendentes: int = 1000):
+        self.maximo_pendentes = maximo_pendentes
+        self._pendentes: dict[tuple[int, int], int] = {}
+        # retiradas para gravação e ainda não confirmadas
+        self._gravando: dict[tuple[int, int], int] = {}
+        self._lock = threading.Lock()
+        self._cliques = 0
+        self._gravacoes = 0
+        self._falhas = 0
+
+    def registrar(self, id_pedido: int, id_produto: int, variacao: int) -> bool:
+        # devolve True quando o buffer chegou ao limite e deve ser gravado já
+        with self._lock:
+            chave = (id_pedido, id_produto)
+            self._pendentes[chave] = self._pendentes.get(chave, 0) + variacao
+            self._cliques += 1
+            return len(self._pendentes) >= self.maximo_pendentes
+
+    def variacao(self, id_pedido: int, id_produto: int) -> int:
+        chave = (id_pedido, id_produto)
+        with self._lock:
+            return self._pendentes.get(chave, 0) + self._gravando.get(chave, 0)
+
+    def descartar(self, id_pedido: int, id_produto: int) -> int:
+        with self._lock:
+            return self._pendentes.pop((id_pedido, id_produto), 0)
+
+    def retirar(self, id_pedido: Optional[int] = None) -> dict[tuple[int, int], int]:
+        # todas as variações pendentes, ou só as do pedido informado
+        with self._lock:
+            if id_pedido is None:
+                lote, self._pendentes = self._pendentes, {}
+            else:
+                lote = {
+                    chave: self._pendentes.pop(chave)
+                    for chave in list(self._pendentes)
+                    if chave[0] == id_pedido
+                }
+            for chave, variacao in lote.items():
+                self._gravando[chave] = self._gravando.get(chave, 0) + variacao
+            return lote
+
+    def concluir(self, lote: dict[tuple[int, int], int], gravado: bool):
+        # se a gravação falhou, as variações voltam para a próxima tentativa
+        with self._lock:
+            for chave, variacao in lote.items():
+                restante = self._gravando.pop(chave, 0) - variacao
+                if restante:
+                    self._gravando[chave] = restante
+                if not gravado:
+                    self._pendentes[chave] = self._pendentes.get(chave, 0) + variacao
+            self._gravacoes += gravado
+            self._falhas += not gravado
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "pendentes": len(self._pendentes),
+                "cliques": self._cliques,
+                "gravacoes": self._gravacoes,
+                "falhas": self._falhas,
+            }
+
+
+def buffer_carrinho_habilitado() -> bool:
+    return os.getenv("CARRINHO_BUFFER", "0") == "1"
+
+
+buffer_carrinho = BufferCarrinho(int(os.getenv("CARRINHO_BUFFER_MAXIMO", "1000")))
+_tarefa: Optional[asyncio.Task] = None
+
+
+async def gravar_buffer_carrinho(id_pedido: Optional[int] = None) -> int:
+    """Grava as variações pendentes (de todos os carrinhos ou de um só) em
+    uma transação. Devolve quantos itens foram gravados."""
+    lote = buffer_carrinho.retirar(id_pedido)
+    if not lote:
+        return 0
+    # concluir roda na thread do banco logo após o commit: se rodasse só
+    # quando a tarefa voltasse ao event loop, uma requisição nesse meio
+    # tempo leria a quantidade nova no banco e ainda somaria o lote em
+    # gravação. Pelo mesmo motivo, um cancelamento aqui não devolve o lote
+    # ao buffer; quem decide é o resultado da gravação
+    gravado = await CarrinhoService.aaplicar_variacoes(
+        lote, ao_concluir=functools.partial(buffer_carrinho.concluir, lote)
+    )
+    return len(lote) if gravado else 0
+
+
+async def alterar_quantidade(
+    id_cliente: int, id_produto: int, variacao: int
+) -> Optional[ItemPedido]:
+    """Aumenta ou diminui a quantidade de um item do carrinho pelo buffer.
+    Devolve o item com a quantidade já considerando as variações pendentes,
+    ou None se o item não está no carrinho. Quando a quantidade chega a
+    zero o item é excluído na hora e volta com quantidade 0."""
+    item = await CarrinhoService.aobter_item_carrinho(id_cliente, id_produto)
+    if item is None:
+        return None
+    quantidade = item.quantidade + buffer_carrinho.variacao(item.id_pedido, id_produto)
+    if quantidade + variacao <= 0:
+        buffer_carrinho.descartar(item.id_pedido, id_produto)
+        await CarrinhoService.aremover(id_cliente, id_produto)
+        item.quantidade = 0
+        return item
+    if buffer_carrinho.registrar(item.id_pedido, id_produto, variacao):
+        await gravar_buffer_carrinho()
+    item.quantidade = quantidade + variacao
+    item.valor_item = round(item.valor_produto * item.quantidade, 2)
+    return item
+
+
+def aplicar_pendentes(itens: List[ItemPedido]) -> float:
+    # ajusta os itens lidos do banco com as variações ainda não gravadas e
+    # devolve a diferença no valor total do carrinho
+    diferenca = 0.0
+    for item in itens:
+        variacao = buffer_carrinho.variacao(item.id_pedido, item.id_produto)
+        if variacao:
+            item.quantidade += variacao
+            item.valor_item = round(item.valor_produto * item.quantidade, 2)
+            diferenca += item.valor_produto * variacao
+    return round(diferenca, 2)
+
+
+async def _gravar_periodicamente(intervalo: float):
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            await gravar_buffer_carrinho()
+        except Exception as ex:
+            print(ex)
+
+
+async def iniciar_buffer_carrinho():
+    global _tarefa
+    # intervalo entre gravações: também o máximo de tempo de cliques que
+    # uma queda do processo pode perder
+    intervalo = int(os.getenv("CARRINHO_BUFFER_INTERVALO_MS", "500")) / 1000
+    if _tarefa is None and buffer_carrinho_habilitado():
+        _tarefa = asyncio.create_task(_gravar_periodicamente(intervalo))
+
+
+async def parar_buffer_carrinho():
+    global _tarefa
+    if _tarefa is not None:
+        _tarefa.cancel()
+        try:
+            await _tarefa
+        except asyncio.CancelledError:
+            pass
+        _tarefa = None
+    await gravar_buffer_carrinho()
@@ -0,0 +1,237 @@
+import functools
+import hashlib
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi import Request, Response, status
+
+from util.database import apos_confirmar
+
+
+class CacheLRU:
+    """Cache em memória limitado por quantidade de itens (LRU) e por tempo
+    de vida (TTL), seguro para uso entre threads.
+
+    A versão é incrementada a cada invalidação; um valor carregado enquanto
+    a versão mudou é descartado, para que uma leitura concorrente com uma
+    escrita não recoloque no cache um dado já desatualizado."""
+
+    def __init__(self, tamanho_maximo: int = 1024, ttl: float = 300.0):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self.versao = 0
+        self._itens: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._falhas = 0
+        self._expirados = 0
+        self._descartados = 0
+        self._invalidacoes = 0
+
+    def obter(self, chave: Hashable, contar_falha: bool = True) -> tuple[bool, Any]:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self._falhas += contar_falha
+                return False, None
+            validade, valor = item
+            if validade < time.monotonic():
+                del self._itens[chave]
+                self._expirados += 1
+                self._falhas += contar_falha
+                return False, None
+            self._itens.move_to_end(chave)
+            self._acertos += 1
+            return True, valor
+
+    def guardar(self, chave: Hashable, valor: Any, versao: int = None):
+        with self._lock:
+            if versao is not None and versao != self.versao:
+                return
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+                self._descartados += 1
+
+    def obter_ou_carregar(self, chave: Hashable, carregar: Callable[[], Any]) -> Any:
+        achou, valor = self.obter(chave)
+        if achou:
+            return valor
+        versao = self.versao
+        valor = carregar()
+        # None indica registro inexistente ou erro no banco: não é guardado
+        if valor is not None:
+            self.guardar(chave, valor, versao)
+        return valor
+
+    def remover(self, chave: Hashable):
+        # só a chave informada; ao contrário de invalidar(), não muda a versão
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def invalidar(self):
+        with self._lock:
+            self.versao += 1
+            self._invalidacoes += 1
+            self._itens.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self._acertos + self._falhas
+            return {
+                "versao": self.versao,
+                "itens": len(self._itens),
+                "tamanho_maximo": self.tamanho_maximo,
+                "ttl": self.ttl,
+                "acertos": self._acertos,
+                "falhas": self._falhas,
+                "taxa_acertos": round(self._acertos / consultas, 4) if consultas else 0.0,
+                "expirados": self._expirados,
+                "descartados": self._descartados,
+                "invalidacoes": self._invalidacoes,
+            }
+
+
+# produtos e categorias: só mudam pelas rotas de administração
+cache_catalogo = CacheLRU(
+    int(os.getenv("CACHE_CATALOGO_TAMANHO", "1024")),
+    float(os.getenv("CACHE_CATALOGO_TTL", "300")),
+)
+
+# HTML das páginas públicas do catálogo renderizadas para visitantes anônimos
+cache_paginas = CacheLRU(
+    int(os.getenv("CACHE_PAGINAS_TAMANHO", "256")),
+    float(os.getenv("CACHE_PAGINAS_TTL", "300")),
+)
+
+COOKIES_MENSAGEM = ("message_success", "message_info", "message_warning", "message_danger")
+
+
+def obter_versao_catalogo() -> int:
+    return cache_catalogo.versao
+
+
+def com_cache_catalogo(funcao: Callable) -> Callable:
+    """Guarda no cache do catálogo o resultado de um método de leitura do
+    repositório, usando como chave o nome do método e seus argumentos.
+
+    Chamadas com uma conexão compartilhada (unidade de trabalho) vão direto
+    ao banco, pois podem enxergar alterações ainda não confirmadas. Os
+    objetos devolvidos são compartilhados entre requisições e não devem ser
+    alterados por quem os recebe."""
+    assinatura = inspect.signature(funcao)
+
+    def montar_chave(cls, args, kwargs) -> Optional[tuple]:
+        argumentos = assinatura.bind(cls, *args, **kwargs)
+        if argumentos.arguments.get("conexao") is not None:
+            return None
+        return (funcao.__qualname__,) + tuple(
+            valor for nome, valor in argumentos.arguments.items() if nome != "cls"
+        )
+
+    @functools.wraps(funcao)
+    def envoltorio(cls, *args, **kwargs):
+        chave = montar_chave(cls, args, kwargs)
+        if chave is None:
+            return funcao(cls, *args, **kwargs)
+        return cache_catalogo.obter_ou_carregar(
+            chave, lambda: funcao(cls, *args, **kwargs)
+        )
+
+    def consultar_cache(cls, *args, **kwargs) -> tuple[bool, Any]:
+        # usada pelas versões assíncronas: um acerto é respondido no próprio
+        # event loop, sem passar pelo executor do banco
+        chave = montar_chave(cls, args, kwargs)
+        if chave is None:
+            return False, None
+        return cache_catalogo.obter(chave, contar_falha=False)
+
+    envoltorio.consultar_cache = consultar_cache
+    return envoltorio
+
+
+def invalidando_cache_catalogo(funcao: Callable) -> Callable:
+    """Invalida o cache do catálogo depois de uma escrita bem-sucedida.
+
+    Com uma conexão compartilhada, a escrita só vale quando a transação de
+    quem chamou é confirmada; até lá uma leitura ainda vê os dados antigos
+    e os guardaria no cache já invalidado. Por isso a invalidação é adiada
+    para depois do commit dessa transação."""
+    assinatura = inspect.signature(funcao)
+
+    @functools.wraps(funcao)
+    def envoltorio(cls, *args, **kwargs):
+        resultado = funcao(cls, *args, **kwargs)
+        if resultado:
+            conexao = assinatura.bind(cls, *args, **kwargs).arguments.get("conexao")
+            if conexao is not None:
+                apos_confirmar(conexao, cache_catalogo.invalidar)
+            else:
+                cache_catalogo.invalidar()
+        return resultado
+
+    return envoltorio
+
+
+def _etag_confere(request: Request, etag: str) -> bool:
+    valor = request.headers.get("if-none-match")
+    if not valor:
+        return False
+    etags = [parte.strip().removeprefix("W/") for parte in valor.split(",")]
+    return etag in etags or "*" in etags
+
+
+def _resposta_pagina(request: Request, corpo: bytes, tipo: str, etag: str) -> Response:
+    cabecalhos = {
+        "ETag": etag,
+        # o navegador sempre revalida: a mesma URL muda quando o usuário entra
+        "Cache-Control": "no-cache",
+        "Vary": "Cookie",
+    }
+    if _etag_confere(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos)
+    return Response(corpo, headers=cabecalhos, media_type=tipo)
+
+
+def com_cache_pagina(funcao: Callable) -> Callable:
+    """Guarda o HTML renderizado por uma rota pública do catálogo, com ETag
+    forte, usando como chave o caminho, a query string e a versão do
+    catálogo; uma escrita no catálogo torna as páginas antigas inalcançáveis.
+
+    Usuários logados e requisições com mensagens em cookie (que alteram o
+    HTML) sempre passam pela rota."""
+
+    @functools.wraps(funcao)
+    async def envoltorio(*args, **kwargs):
+        request: Request = kwargs["request"]
+        if getattr(request.state, "usuario", None) or any(
+            nome in request.cookies for nome in COOKIES_MENSAGEM
+        ):
+            return await funcao(*args, **kwargs)
+        chave = (
+            request.url.path,
+            tuple(sorted(request.query_params.multi_items())),
+            obter_versao_catalogo(),
+        )
+        achou, pagina = cache_paginas.obter(chave)
+        if achou:
+            return _resposta_pagina(request, *pagina)
+        versao = cache_paginas.versao
+        resposta = await funcao(*args, **kwargs)
+        if (
+            resposta.status_code != status.HTTP_200_OK
+            or "set-cookie" in resposta.headers
+            or not hasattr(resposta, "body")
+        ):
+            return resposta
+        etag = '"' + hashlib.blake2b(resposta.body, digest_size=16).hexdigest() + '"'
+        pagina = (resposta.body, resposta.headers.get("content-type"), etag)
+        cache_paginas.guardar(chave, pagina, versao)
+        return _resposta_pagina(request, *pagina)
+
+    return envoltorio
@@ -0,0 +1,82 @@
+import argparse
+
+from repositories.pedido_repo import PedidoRepo
+from repositories.resumo_cliente_repo import ResumoClienteRepo
+
+
+def verificar_totais_pedidos(corrigir: bool = False) -> int:
+    """Compara valor_total e quantidade_itens de todos os pedidos com os
+    itens em uma única consulta agrupada e, se pedido, corrige em um único
+    UPDATE. Devolve a quantidade de pedidos que continuam inconsistentes
+    (depois da correção, quando ela é feita)."""
+    inconsistentes = PedidoRepo.obter_totais_inconsistentes()
+    if inconsistentes is None:
+        raise SystemExit("Não foi possível verificar os totais dos pedidos.")
+    for id, valor, quantidade, valor_calculado, quantidade_calculada in inconsistentes:
+        print(
+            f"Pedido {id:06d}: total {valor:.2f} (itens: {valor_calculado:.2f}), "
+            f"{quantidade} itens (itens: {quantidade_calculada})"
+        )
+    if inconsistentes and corrigir:
+        # corrigir_totais devolve 0 também quando falha: o que vale é a
+        # verificação feita de novo depois dele
+        print(f"{PedidoRepo.corrigir_totais()} pedidos corrigidos.")
+        inconsistentes = PedidoRepo.obter_totais_inconsistentes()
+        if inconsistentes is None:
+            raise SystemExit("Não foi possível conferir os totais corrigidos.")
+        if inconsistentes:
+            print(f"{len(inconsistentes)} pedidos continuam inconsistentes.")
+    elif not inconsistentes:
+        print("Todos os pedidos estão consistentes.")
+    return len(inconsistentes)
+
+
+def verificar_resumos_clientes(corrigir: bool = False) -> int:
+    """Compara resumo_cliente com os pedidos (inclusive os arquivados) e, se
+    pedido, recalcula a tabela inteira. Devolve a quantidade de linhas que
+    continuam inconsistentes (depois do recálculo, quando ele é feito)."""
+    inconsistentes = ResumoClienteRepo.obter_inconsistentes()
+    if inconsistentes is None:
+        raise SystemExit("Não foi possível verificar os resumos dos clientes.")
+    for linha in inconsistentes:
+        id_cliente, estado, quantidade, valor, quantidade_calculada, valor_calculado = linha
+        print(
+            f"Cliente {id_cliente} ({estado}): {quantidade} pedidos "
+            f"(calculado: {quantidade_calculada}), total {valor:.2f} "
+            f"(calculado: {valor_calculado:.2f})"
+        )
+    if inconsistentes and corrigir:
+        if not ResumoClienteRepo.recalcular():
+            print("Não foi possível recalcular os resumos dos clientes.")
+            return len(inconsistentes)
+        inconsistentes = ResumoClienteRepo.obter_inconsistentes()
+        if inconsistentes is None:
+            raise SystemExit("Não foi possível conferir os resumos recalculados.")
+        if inconsistentes:
+            print(f"{len(inconsistentes)} resumos continuam inconsistentes.")
+        else:
+            print("Resumos dos clientes recalculados.")
+    elif not inconsistentes:
+        print("Todos os resumos dos clientes estão consistentes.")
+    return len(inconsistentes)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    from util.migracoes import executar_migracoes
+
+    parser = argparse.ArgumentParser(
+        description="Verifica os totais gravados dos pedidos e os resumos dos clientes."
+    )
+    parser.add_argument(
+        "--corrigir", action="store_true", help="grava os totais recalculados"
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    executar_migracoes()
+    inconsistentes = verificar_totais_pedidos(args.corrigir)
+    inconsistentes += verificar_resumos_clientes(args.corrigir)
+    # com --corrigir, o que sobrou depois da correção
+    raise SystemExit(1 if inconsistentes else 0)
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional, Union
+
+
+# pedido.data_hora é gravado como inteiro em milissegundos desde a época
+# (horário local, como datetime.now()): compara como número, ordena
+# corretamente e ocupa menos espaço no índice do que o texto de str(datetime)
+def para_epoch_ms(data_hora: Optional[datetime]) -> Optional[int]:
+    if data_hora is None:
+        return None
+    return round(data_hora.timestamp() * 1000)
+
+
+def de_epoch_ms(valor: Union[int, str, datetime, None]) -> Optional[datetime]:
+    # aceita também o texto antigo e datetime, para modelos montados à mão
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, str):
+        return datetime.fromisoformat(valor)
+    return datetime.fromtimestamp(valor / 1000)
@@ -1,4 +1,361 @@
+import asyncio
+import functools
+import os
 import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional
 
-def obter_conexao():
-    return sqlite3.connect("dados.db")
\ No newline at end of file
+from sql import historico_sql
+
+ARQUIVO_BANCO = "dados.db"
+
+
+class ConexaoBanco(sqlite3.Connection):
+    # marcada quando um comando falha dentro de uma unidade de trabalho,
+    # para que a transação da requisição seja desfeita em vez de confirmada
+    falhou: bool = False
+    # ações registradas por apos_confirmar() para a transação em andamento
+    _acoes_apos_confirmar: Optional[list[Callable[[], None]]] = None
+
+    def commit(self):
+        super().commit()
+        self.executar_acoes_apos_confirmar()
+
+    def rollback(self):
+        self._acoes_apos_confirmar = None
+        super().rollback()
+
+    def executar_acoes_apos_confirmar(self):
+        acoes, self._acoes_apos_confirmar = self._acoes_apos_confirmar, None
+        for acao in acoes or ():
+            acao()
+
+
+class PoolConexoes:
+    """Pool limitado de conexões SQLite, seguro para uso entre threads.
+
+    Cada conexão é configurada uma única vez (bancos anexados, pragmas e
+    comandos iniciais) no momento em que é criada e depois reaproveitada
+    pelas requisições seguintes.
+    """
+
+    def __init__(
+        self,
+        arquivo: str = ARQUIVO_BANCO,
+        tamanho_maximo: int = 8,
+        timeout: float = 10.0,
+        pragmas: Optional[dict] = None,
+        anexos: Optional[dict[str, str]] = None,
+        comandos_iniciais: Optional[list[str]] = None,
+    ):
+        self.arquivo = arquivo
+        self.tamanho_maximo = tamanho_maximo
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.anexos = anexos or {}
+        self.comandos_iniciais = comandos_iniciais or []
+        self._livres: list[sqlite3.Connection] = []
+        self._condicao = threading.Condition()
+        self._abertas = 0
+        self._em_uso = 0
+        self._fechado = False
+        self._checkouts = 0
+        self._esperas = 0
+        self._timeouts = 0
+        self._tempo_espera_total = 0.0
+        self._tempo_espera_maximo = 0.0
+        self._pico_em_uso = 0
+
+    def _criar_conexao(self) -> sqlite3.Connection:
+        conexao = sqlite3.connect(
+            self.arquivo,
+            timeout=self.timeout,
+            check_same_thread=False,
+            factory=ConexaoBanco,
+        )
+        # anexados antes dos pragmas: journal_mode vale para todos os bancos
+        for esquema, arquivo in self.anexos.items():
+            conexao.execute(f"ATTACH DATABASE ? AS {esquema}", (arquivo,))
+        for nome, valor in self.pragmas.items():
+            conexao.execute(f"PRAGMA {nome}={valor}")
+        for comando in self.comandos_iniciais:
+            conexao.execute(comando)
+        return conexao
+
+    def obter(self) -> sqlite3.Connection:
+        inicio = time.perf_counter()
+        criar = False
+        with self._condicao:
+            if self._fechado:
+                raise sqlite3.OperationalError("O pool de conexões está fechado.")
+            esperou = False
+            while not self._livres and self._abertas >= self.tamanho_maximo:
+                esperou = True
+                restante = self.timeout - (time.perf_counter() - inicio)
+                if restante <= 0 or not self._condicao.wait(restante):
+                    if not self._livres and self._abertas >= self.tamanho_maximo:
+                        self._timeouts += 1
+                        raise sqlite3.OperationalError(
+                            "Tempo esgotado aguardando uma conexão livre no pool."
+                        )
+            if self._livres:
+                conexao = self._livres.pop()
+            else:
+                # reserva a vaga antes de abrir a conexão fora do lock
+                self._abertas += 1
+                criar = True
+            espera = time.perf_counter() - inicio
+            self._checkouts += 1
+            self._em_uso += 1
+            self._pico_em_uso = max(self._pico_em_uso, self._em_uso)
+            if esperou:
+                self._esperas += 1
+            self._tempo_espera_total += espera
+            self._tempo_espera_maximo = max(self._tempo_espera_maximo, espera)
+        if criar:
+            try:
+                conexao = self._criar_conexao()
+            except Exception:
+                with self._condicao:
+                    self._abertas -= 1
+                    self._em_uso -= 1
+                    self._condicao.notify()
+                raise
+        return conexao
+
+    def devolver(self, conexao: sqlite3.Connection):
+        descartar = False
+        conexao.falhou = False
+        conexao._acoes_apos_confirmar = None
+        try:
+            if conexao.in_transaction:
+                conexao.rollback()
+        except sqlite3.Error:
+            descartar = True
+        with self._condicao:
+            self._em_uso -= 1
+            if descartar or self._fechado:
+                self._abertas -= 1
+            else:
+                self._livres.append(conexao)
+            self._condicao.notify()
+        if descartar or self._fechado:
+            conexao.close()
+
+    def fechar(self):
+        with self._condicao:
+            self._fechado = True
+            livres, self._livres = self._livres, []
+            self._abertas -= len(livres)
+            self._condicao.notify_all()
+        for conexao in livres:
+            conexao.close()
+
+    def estatisticas(self) -> dict:
+        with self._condicao:
+            return {
+                "tamanho_maximo": self.tamanho_maximo,
+                "conexoes_abertas": self._abertas,
+                "conexoes_livres": len(self._livres),
+                "conexoes_em_uso": self._em_uso,
+                "pico_em_uso": self._pico_em_uso,
+                "checkouts": self._checkouts,
+                "esperas": self._esperas,
+                "timeouts": self._timeouts,
+                "tempo_espera_total_ms": round(self._tempo_espera_total * 1000, 3),
+                "tempo_espera_maximo_ms": round(self._tempo_espera_maximo * 1000, 3),
+                "tempo_espera_medio_ms": round(
+                    self._tempo_espera_total * 1000 / self._checkouts, 3
+                )
+                if self._checkouts
+                else 0.0,
+            }
+
+
+_pool: Optional[PoolConexoes] = None
+_pid_pool: Optional[int] = None
+_lock_pool = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_pid_executor: Optional[int] = None
+
+
+def obter_pragmas() -> dict:
+    # foreign_keys fica desligado por padrão: a tabela pedido referencia
+    # cliente(id), que não existe, e ligá-lo impediria novos pedidos
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.getenv("DB_BUSY_TIMEOUT", "5000")),
+        "foreign_keys": os.getenv("DB_FOREIGN_KEYS", "OFF"),
+        "cache_size": int(os.getenv("DB_CACHE_SIZE", "-16000")),
+        "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024))),
+    }
+
+
+def obter_arquivo_historico(arquivo_banco: str) -> str:
+    # por padrão, historico.db fica na mesma pasta do banco principal
+    return os.getenv("DB_ARQUIVO_HISTORICO") or os.path.join(
+        os.path.dirname(arquivo_banco), "historico.db"
+    )
+
+
+def obter_pool() -> PoolConexoes:
+    global _pool, _pid_pool
+    # o pool é por processo: após um fork, as conexões herdadas são ignoradas
+    if _pool is None or _pid_pool != os.getpid():
+        with _lock_pool:
+            if _pool is None or _pid_pool != os.getpid():
+                arquivo = os.getenv("DB_ARQUIVO", ARQUIVO_BANCO)
+                _pool = PoolConexoes(
+                    arquivo,
+                    int(os.getenv("DB_POOL_TAMANHO", "8")),
+                    float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                    obter_pragmas(),
+                    {historico_sql.ESQUEMA: obter_arquivo_historico(arquivo)},
+                    historico_sql.SQL_CRIAR_ESQUEMA,
+                )
+                _pid_pool = os.getpid()
+    return _pool
+
+
+def fechar_pool():
+    global _pool, _executor
+    with _lock_pool:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+        if _pool is not None:
+            _pool.fechar()
+            _pool = None
+
+
+def obter_estatisticas_pool() -> dict:
+    return obter_pool().estatisticas()
+
+
+@contextmanager
+def obter_conexao(conexao: Optional[sqlite3.Connection] = None):
+    # com uma conexão compartilhada (unidade de trabalho da requisição),
+    # o commit/rollback fica a cargo de quem a abriu
+    if conexao is not None:
+        try:
+            yield conexao
+        except sqlite3.Error:
+            conexao.falhou = True
+            raise
+        return
+    pool = obter_pool()
+    conexao = pool.obter()
+    try:
+        # o commit do "with" não passa por ConexaoBanco.commit
+        with conexao:
+            yield conexao
+        conexao.executar_acoes_apos_confirmar()
+    finally:
+        pool.devolver(conexao)
+
+
+def iniciar_escrita(conexao: sqlite3.Connection):
+    # BEGIN IMMEDIATE pega o lock de escrita antes das leituras, para que
+    # outra transação não altere o que foi lido antes da escrita
+    if not conexao.in_transaction:
+        conexao.execute("BEGIN IMMEDIATE")
+
+
+def apos_confirmar(conexao: sqlite3.Connection, acao: Callable[[], None]):
+    # adia a ação (ex.: invalidar um cache) para depois do commit da
+    # transação em andamento, que numa unidade de trabalho só acontece no
+    # fim da requisição; se a transação for desfeita, a ação é descartada
+    if isinstance(conexao, ConexaoBanco) and conexao.in_transaction:
+        if conexao._acoes_apos_confirmar is None:
+            conexao._acoes_apos_confirmar = []
+        conexao._acoes_apos_confirmar.append(acao)
+    else:
+        acao()
+
+
+def obter_executor() -> ThreadPoolExecutor:
+    global _executor, _pid_executor
+    # uma thread por conexão do pool: nenhuma tarefa fica parada esperando
+    # conexão enquanto ocupa uma thread do executor
+    if _executor is None or _pid_executor != os.getpid():
+        pool = obter_pool()
+        with _lock_pool:
+            if _executor is None or _pid_executor != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=pool.tamanho_maximo,
+                    thread_name_prefix="banco",
+                )
+                _pid_executor = os.getpid()
+    return _executor
+
+
+async def executar_no_banco(funcao: Callable, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        obter_executor(), functools.partial(funcao, *args, **kwargs)
+    )
+
+
+def com_metodos_async(cls):
+    """Gera, para cada classmethod público do repositório, uma versão
+    assíncrona prefixada com "a" (ex.: obter_todos -> aobter_todos) que
+    executa o método original no executor do banco. Métodos com cache
+    (util.cache) respondem os acertos sem sair do event loop."""
+
+    def criar_metodo_async(nome: str, consultar_cache: Optional[Callable]):
+        async def metodo_async(cls, *args, **kwargs):
+            if consultar_cache is not None:
+                achou, valor = consultar_cache(cls, *args, **kwargs)
+                if achou:
+                    return valor
+            return await executar_no_banco(getattr(cls, nome), *args, **kwargs)
+
+        metodo_async.__name__ = f"a{nome}"
+        metodo_async.__qualname__ = f"{cls.__name__}.a{nome}"
+        return classmethod(metodo_async)
+
+    for nome, atributo in list(vars(cls).items()):
+        if isinstance(atributo, classmethod) and not nome.startswith("_"):
+            consultar_cache = getattr(atributo.__func__, "consultar_cache", None)
+            setattr(cls, f"a{nome}", criar_metodo_async(nome, consultar_cache))
+    return cls
+
+
+_limites_unidades_trabalho = weakref.WeakKeyDictionary()
+
+
+def obter_limite_unidades_trabalho() -> asyncio.Semaphore:
+    # no máximo metade do pool fica presa a unidades de trabalho; o restante
+    # atende as chamadas avulsas, que assim sempre conseguem progredir
+    loop = asyncio.get_running_loop()
+    limite = _limites_unidades_trabalho.get(loop)
+    if limite is None:
+        limite = asyncio.Semaphore(max(1, obter_pool().tamanho_maximo // 2))
+        _limites_unidades_trabalho[loop] = limite
+    return limite
+
+
+async def obter_conexao_requisicao():
+    """Dependência do FastAPI: uma conexão e uma transação por requisição.
+
+    Todos os repositórios chamados com essa conexão participam da mesma
+    transação, confirmada uma única vez ao final da rota ou desfeita se a
+    rota lançar uma exceção ou algum comando SQL falhar.
+    """
+    pool = obter_pool()
+    async with obter_limite_unidades_trabalho():
+        # a espera pela conexão usa o executor padrão do loop para não
+        # ocupar as threads do banco
+        conexao = await asyncio.get_running_loop().run_in_executor(None, pool.obter)
+        try:
+            yield conexao
+            if not conexao.falhou:
+                await executar_no_banco(conexao.commit)
+        finally:
+            # devolver() desfaz tudo que não foi confirmado
+            pool.devolver(conexao)
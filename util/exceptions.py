@@ -1,7 +1,9 @@
 import logging
 from fastapi import FastAPI, HTTPException, Request, status
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse
+from dtos.problem_details_dto import ProblemDetailsDto
 from util.cookies import adicionar_mensagem_erro
+from util.senhas import SenhasOcupadasError
 from util.templates import obter_jinja_templates
 
 templates = obter_jinja_templates("templates")
@@ -49,6 +51,20 @@ def configurar_excecoes(app: FastAPI):
             "pages/404.html", {"request": request, "cliente": request.state.usuario}
         )
 
+    @app.exception_handler(SenhasOcupadasError)
+    async def senhas_ocupadas_exception_handler(request: Request, _):
+        # muitos logins ao mesmo tempo: melhor recusar já do que enfileirar
+        pd = ProblemDetailsDto(
+            "str",
+            "Servidor ocupado. Tente novamente em alguns segundos.",
+            "service_unavailable",
+        )
+        return JSONResponse(
+            pd.to_dict(),
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        )
+
     @app.exception_handler(HTTPException)
     async def http_exception_handler(request: Request, ex: HTTPException):
         logger.error("Ocorreu uma exceção não tratada: %s", ex)
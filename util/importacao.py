@@ -0,0 +1,325 @@
+import asyncio
+import csv
+import io
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, TextIO
+
+from pydantic import TypeAdapter, ValidationError
+
+from dtos.importar_usuario_dto import ImportarUsuarioDto
+from dtos.inserir_categoria_dto import InserirCategoriaDto
+from dtos.inserir_produto_dto import InserirProdutoDto
+from models.categoria_model import Categoria
+from models.produto_model import Produto
+from models.usuario_model import Usuario
+from repositories.categoria_repo import CategoriaRepo
+from repositories.produto_repo import ProdutoRepo
+from repositories.usuario_repo import UsuarioRepo
+from util.auth_jwt import obter_hash_senha
+from util.database import executar_no_banco, obter_conexao
+from util.senhas import pool_senhas, reduzir_prioridade
+
+FORMATOS = ("json", "ndjson", "csv")
+TAMANHO_LOTE = 5000
+MAXIMO_ERROS_RELATADOS = 50
+
+
+class ErroImportacao(Exception):
+    pass
+
+
+@dataclass
+class ResultadoImportacao:
+    tabela: str
+    lidos: int = 0
+    inseridos: int = 0
+    rejeitados: int = 0
+    segundos: float = 0.0
+    linhas_por_segundo: float = 0.0
+    erros: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Importacao:
+    # lotes (número do último registro lido, modelos) prontos para gravar:
+    # um gerador, lido durante a gravação, ou uma lista, quando a conversão
+    # já foi feita toda antes
+    tabela: str
+    lotes: Iterable[tuple[int, list]]
+    resultado: ResultadoImportacao
+    inicio: float
+
+
+def _rejeitar(resultado: ResultadoImportacao, mensagens: list[str]):
+    resultado.rejeitados += len(mensagens)
+    vagas = MAXIMO_ERROS_RELATADOS - len(resultado.erros)
+    resultado.erros.extend(mensagens[: max(vagas, 0)])
+
+
+def _por_registro(converter: Callable) -> Callable:
+    return lambda numerados, resultado: [converter(dto) for _, dto in numerados]
+
+
+def _hash_senha(senha: str) -> str:
+    return senha if senha.startswith("$2") else obter_hash_senha(senha)
+
+
+def _usuarios(
+    numerados: list[tuple[int, ImportarUsuarioDto]], resultado: ResultadoImportacao
+) -> list[Usuario]:
+    # hashes bcrypt já prontos são mantidos; as senhas em texto recebem o
+    # hash em paralelo (o bcrypt libera o GIL), nas threads e com a
+    # prioridade configuradas para o pool de senhas
+    with ThreadPoolExecutor(
+        max_workers=pool_senhas.threads,
+        thread_name_prefix="importacao-senhas",
+        initializer=reduzir_prioridade,
+        initargs=(pool_senhas.prioridade,),
+    ) as executor:
+        senhas = list(executor.map(_hash_senha, (dto.senha for _, dto in numerados)))
+    usuarios, recusados = [], []
+    for (numero, dto), senha in zip(numerados, senhas):
+        # obter_hash_senha devolve "" quando o bcrypt recusa a senha: o
+        # usuário nunca conseguiria entrar
+        if not senha:
+            recusados.append(f"Registro {numero}: senha: não foi possível gerar o hash.")
+            continue
+        usuarios.append(Usuario(**dto.model_dump(exclude={"senha"}), senha=senha))
+    _rejeitar(resultado, recusados)
+    return usuarios
+
+
+# tabela -> (DTO de validação, conversão de um lote de DTOs nos modelos,
+# inserção em lote)
+TABELAS: dict[str, tuple[type, Callable, Callable]] = {
+    "produtos": (
+        InserirProdutoDto,
+        _por_registro(lambda dto: Produto(**dto.model_dump())),
+        ProdutoRepo.inserir_lote,
+    ),
+    "categorias": (
+        InserirCategoriaDto,
+        _por_registro(lambda dto: Categoria(**dto.model_dump())),
+        CategoriaRepo.inserir_lote,
+    ),
+    "usuarios": (ImportarUsuarioDto, _usuarios, UsuarioRepo.inserir_lote),
+}
+
+# tabelas com conversão cara (o hash das senhas): todos os lotes são
+# convertidos antes de a transação começar, para que o lock de escrita não
+# fique preso enquanto ela roda
+CONVERTIDAS_ANTES_DA_TRANSACAO = {"usuarios"}
+
+
+def detectar_formato(nome_arquivo: str) -> str:
+    extensao = Path(nome_arquivo).suffix.lower().lstrip(".")
+    if extensao == "jsonl":
+        extensao = "ndjson"
+    if extensao not in FORMATOS:
+        raise ErroImportacao(
+            f"Formato não reconhecido para {nome_arquivo}: use {', '.join(FORMATOS)}."
+        )
+    return extensao
+
+
+def _ler_json(arquivo: TextIO, tamanho_bloco: int = 1 << 16) -> Iterator[dict]:
+    # lê um array JSON objeto a objeto, sem carregar o arquivo inteiro
+    decodificador = json.JSONDecoder()
+    espacos = re.compile(r"[\s,]*")
+    buffer = arquivo.read(tamanho_bloco).lstrip()
+    if not buffer.startswith("["):
+        raise ErroImportacao("O arquivo JSON deve conter um array de objetos.")
+    posicao = 1
+    while True:
+        posicao = espacos.match(buffer, posicao).end()
+        if buffer.startswith("]", posicao):
+            return
+        try:
+            objeto, posicao = decodificador.raw_decode(buffer, posicao)
+        except json.JSONDecodeError:
+            bloco = arquivo.read(tamanho_bloco)
+            if not bloco:
+                raise ErroImportacao("Arquivo JSON incompleto ou malformado.")
+            buffer, posicao = buffer[posicao:] + bloco, 0
+            continue
+        yield objeto
+
+
+def _ler_ndjson(arquivo: TextIO) -> Iterator[dict]:
+    for numero, linha in enumerate(arquivo, 1):
+        if linha.strip():
+            try:
+                yield json.loads(linha)
+            except json.JSONDecodeError:
+                raise ErroImportacao(f"Linha {numero} não é um JSON válido.")
+
+
+def ler_registros(arquivo: TextIO, formato: str) -> Iterator[dict]:
+    if formato == "json":
+        return _ler_json(arquivo)
+    if formato == "ndjson":
+        return _ler_ndjson(arquivo)
+    if formato == "csv":
+        return csv.DictReader(arquivo)
+    raise ErroImportacao(f"Formato desconhecido: {formato}.")
+
+
+def _em_lotes(registros: Iterable[dict], tamanho: int) -> Iterator[list[dict]]:
+    lote = []
+    for registro in registros:
+        lote.append(registro)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _validar_lote(
+    validador: TypeAdapter, lote: list[dict], inicio: int, resultado: ResultadoImportacao
+) -> list[tuple[int, object]]:
+    # devolve os DTOs válidos com o número do registro no arquivo
+    try:
+        return list(enumerate(validador.validate_python(lote), inicio))
+    except ValidationError as ex:
+        invalidos = {}
+        for erro in ex.errors():
+            indice = erro["loc"][0]
+            campo = ".".join(str(parte) for parte in erro["loc"][1:])
+            mensagem = re.sub(r"</?b>", "", erro["msg"])
+            invalidos.setdefault(indice, f"Registro {inicio + indice}: {campo}: {mensagem}")
+    _rejeitar(resultado, list(invalidos.values()))
+    indices = [i for i in range(len(lote)) if i not in invalidos]
+    validos = validador.validate_python([lote[i] for i in indices])
+    return [(inicio + i, dto) for i, dto in zip(indices, validos)]
+
+
+def preparar_importacao(
+    tabela: str,
+    arquivo: TextIO,
+    formato: str,
+    tamanho_lote: int = TAMANHO_LOTE,
+) -> Importacao:
+    """Lê, valida e converte os registros, sem usar o banco.
+
+    Os lotes são convertidos à medida que a gravação os pede, exceto nas
+    tabelas de CONVERTIDAS_ANTES_DA_TRANSACAO, convertidas aqui por
+    inteiro."""
+    if tabela not in TABELAS:
+        raise ErroImportacao(
+            f"Tabela desconhecida: {tabela}. Use {', '.join(TABELAS)}."
+        )
+    dto, converter, _ = TABELAS[tabela]
+    validador = TypeAdapter(list[dto])
+    resultado = ResultadoImportacao(tabela)
+    inicio = time.perf_counter()
+
+    def converter_lotes() -> Iterator[tuple[int, list]]:
+        for lote in _em_lotes(ler_registros(arquivo, formato), tamanho_lote):
+            numerados = _validar_lote(validador, lote, resultado.lidos + 1, resultado)
+            resultado.lidos += len(lote)
+            modelos = converter(numerados, resultado) if numerados else []
+            if modelos:
+                yield resultado.lidos, modelos
+
+    lotes = converter_lotes()
+    if tabela in CONVERTIDAS_ANTES_DA_TRANSACAO:
+        lotes = list(lotes)
+    return Importacao(tabela, lotes, resultado, inicio)
+
+
+def gravar_importacao(importacao: Importacao) -> ResultadoImportacao:
+    """Insere os lotes com executemany em uma única transação: se algum
+    falhar no banco (ex.: e-mail duplicado), nada é gravado."""
+    _, _, inserir_lote = TABELAS[importacao.tabela]
+    resultado = importacao.resultado
+    with obter_conexao() as conexao:
+        for fim, modelos in importacao.lotes:
+            inseridos = inserir_lote(modelos, conexao=conexao)
+            if inseridos != len(modelos) or conexao.falhou:
+                raise ErroImportacao(
+                    f"Falha ao gravar o lote que termina no registro {fim}; "
+                    "nenhum registro foi importado."
+                )
+            resultado.inseridos += inseridos
+    resultado.segundos = round(time.perf_counter() - importacao.inicio, 3)
+    if resultado.segundos:
+        resultado.linhas_por_segundo = round(resultado.inseridos / resultado.segundos)
+    return resultado
+
+
+def importar(
+    tabela: str,
+    arquivo: TextIO,
+    formato: str,
+    tamanho_lote: int = TAMANHO_LOTE,
+) -> ResultadoImportacao:
+    """Importa registros de um arquivo JSON (array), NDJSON ou CSV.
+
+    Os registros são lidos em fluxo e validados lote a lote com os mesmos
+    DTOs das rotas; os inválidos são descartados e relatados. Todos os
+    lotes válidos são inseridos em uma única transação."""
+    return gravar_importacao(preparar_importacao(tabela, arquivo, formato, tamanho_lote))
+
+
+def importar_arquivo(
+    tabela: str,
+    caminho: str,
+    formato: Optional[str] = None,
+    tamanho_lote: int = TAMANHO_LOTE,
+) -> ResultadoImportacao:
+    formato = formato or detectar_formato(caminho)
+    with open(caminho, "r", encoding="utf-8", newline="") as arquivo:
+        return importar(tabela, arquivo, formato, tamanho_lote)
+
+
+async def aimportar_binario(
+    tabela: str,
+    arquivo_binario,
+    formato: str,
+    tamanho_lote: int = TAMANHO_LOTE,
+) -> ResultadoImportacao:
+    # usado pelo upload da rota de administração: a preparação (com o hash
+    # das senhas) roda em uma thread comum, fora do executor do banco, e só
+    # a gravação ocupa uma conexão do pool
+    with io.TextIOWrapper(arquivo_binario, encoding="utf-8", newline="") as arquivo:
+        importacao = await asyncio.to_thread(
+            preparar_importacao, tabela, arquivo, formato, tamanho_lote
+        )
+        return await executar_no_banco(gravar_importacao, importacao)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dotenv import load_dotenv
+
+    from util.migracoes import executar_migracoes
+
+    parser = argparse.ArgumentParser(
+        description="Importa produtos, categorias ou usuários em lote."
+    )
+    parser.add_argument("tabela", choices=list(TABELAS))
+    parser.add_argument("arquivo")
+    parser.add_argument("--formato", choices=FORMATOS)
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args()
+
+    load_dotenv()
+    executar_migracoes()
+    try:
+        resultado = importar_arquivo(args.tabela, args.arquivo, args.formato, args.lote)
+    except ErroImportacao as ex:
+        raise SystemExit(str(ex))
+    for erro in resultado.erros:
+        print(erro)
+    print(
+        f"{resultado.inseridos} de {resultado.lidos} registros importados em "
+        f"{resultado.segundos}s ({resultado.linhas_por_segundo:.0f} linhas/s); "
+        f"{resultado.rejeitados} rejeitados."
+    )
@@ -0,0 +1,263 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from dtos.problem_details_dto import ProblemDetailsDto
+from sql.limite_taxa_sql import *
+
+
+@dataclass(frozen=True)
+class PoliticaLimite:
+    """Balde de tokens: até `capacidade` requisições seguidas e depois
+    `capacidade` a cada `periodo` segundos. Com `por_usuario`, o balde é do
+    usuário logado (o anônimo cai no IP)."""
+
+    nome: str
+    capacidade: int
+    periodo: float
+    por_usuario: bool = False
+
+    @property
+    def taxa(self) -> float:
+        # tokens por segundo
+        return self.capacidade / self.periodo
+
+
+POLITICA_ENTRAR = PoliticaLimite("entrar", 10, 60)
+POLITICA_CADASTRO = PoliticaLimite("cadastro", 5, 600)
+POLITICA_BUSCAR = PoliticaLimite("buscar", 30, 15, por_usuario=True)
+POLITICA_PAGAMENTO = PoliticaLimite("pagamento", 5, 60, por_usuario=True)
+
+# (método, caminho) -> política; /post_entrar e /auth/entrar dividem o
+# mesmo balde. As rotas com parâmetro no caminho ficam por prefixo
+POLITICAS_LIMITE = {
+    ("POST", "/post_entrar"): POLITICA_ENTRAR,
+    ("POST", "/auth/entrar"): POLITICA_ENTRAR,
+    ("POST", "/post_cadastro"): POLITICA_CADASTRO,
+    ("GET", "/buscar"): POLITICA_BUSCAR,
+}
+
+POLITICAS_LIMITE_PREFIXO = (
+    ("GET", "/cliente/pagamentopedido/", POLITICA_PAGAMENTO),
+)
+
+
+def obter_politica_limite(metodo: str, caminho: str) -> Optional[PoliticaLimite]:
+    politica = POLITICAS_LIMITE.get((metodo, caminho))
+    if politica is None:
+        for metodo_prefixo, prefixo, politica_prefixo in POLITICAS_LIMITE_PREFIXO:
+            if metodo == metodo_prefixo and caminho.startswith(prefixo):
+                return politica_prefixo
+    return politica
+
+
+class BaldesMemoria:
+    """Baldes no próprio processo: um item por chave (tokens, instante da
+    última requisição, instante em que volta a estar cheio), em ordem de
+    último acesso.
+
+    Cada consumo descarta até dois baldes do início da fila que já
+    encheram de novo (ociosos, iguais a um balde novo), então a limpeza
+    acompanha a criação de chaves sem varreduras. Acima de maximo_chaves o
+    mais antigo sai mesmo que não esteja cheio. Usado só no event loop."""
+
+    def __init__(self, maximo_chaves: int = 100000):
+        self.maximo_chaves = maximo_chaves
+        self._baldes: OrderedDict[tuple, tuple[float, float, float]] = OrderedDict()
+        self._despejados = 0
+
+    async def consumir(self, chave: tuple, politica: PoliticaLimite) -> float:
+        # 0 se a requisição pode seguir; senão, segundos até o próximo token
+        agora = time.monotonic()
+        balde = self._baldes.pop(chave, None)
+        if balde is None:
+            tokens = politica.capacidade
+        else:
+            tokens = min(politica.capacidade, balde[0] + (agora - balde[1]) * politica.taxa)
+        espera = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            espera = (1 - tokens) / politica.taxa
+        cheio_em = agora + (politica.capacidade - tokens) / politica.taxa
+        self._baldes[chave] = (tokens, agora, cheio_em)
+        self._despejar(agora)
+        return espera
+
+    def _despejar(self, agora: float):
+        for _ in range(2):
+            if not self._baldes:
+                return
+            chave, balde = next(iter(self._baldes.items()))
+            if balde[2] > agora and len(self._baldes) <= self.maximo_chaves:
+                return
+            del self._baldes[chave]
+            self._despejados += 1
+
+    def estatisticas(self) -> dict:
+        return {
+            "backend": "memoria",
+            "chaves": len(self._baldes),
+            "maximo_chaves": self.maximo_chaves,
+            "despejados": self._despejados,
+        }
+
+
+class BaldesSqlite:
+    """Baldes compartilhados entre os workers em um arquivo SQLite próprio;
+    cada consumo é um único UPSERT atômico, executado fora do event loop.
+    Se o arquivo falhar, a requisição segue (o limite não derruba a loja)."""
+
+    def __init__(self, arquivo: str, ocioso_maximo: float):
+        self.arquivo = arquivo
+        self.ocioso_maximo = ocioso_maximo
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._consumos = 0
+        self._falhas = 0
+
+    def _obter_conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.arquivo, timeout=5, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=OFF")
+            conexao.execute(SQL_CRIAR_TABELA)
+            conexao.execute(SQL_CRIAR_INDICE_ATUALIZADO_EM)
+            self._local.conexao = conexao
+        return conexao
+
+    def _consumir(self, chave: tuple, politica: PoliticaLimite) -> float:
+        agora = time.time()
+        with self._lock:
+            self._consumos += 1
+            limpar = self._consumos % 1000 == 0
+        try:
+            conexao = self._obter_conexao()
+            aceito, tokens = conexao.execute(
+                SQL_CONSUMIR,
+                {
+                    "chave": ":".join(map(str, chave)),
+                    "capacidade": politica.capacidade,
+                    "taxa": politica.taxa,
+                    "agora": agora,
+                },
+            ).fetchone()
+            if limpar:
+                conexao.execute(SQL_EXCLUIR_OCIOSOS, (agora - self.ocioso_maximo,))
+        except sqlite3.Error as ex:
+            print(ex)
+            with self._lock:
+                self._falhas += 1
+            return 0.0
+        return 0.0 if aceito else (1 - tokens) / politica.taxa
+
+    async def consumir(self, chave: tuple, politica: PoliticaLimite) -> float:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._consumir, chave, politica)
+
+    def estatisticas(self) -> dict:
+        try:
+            chaves = self._obter_conexao().execute(SQL_OBTER_QUANTIDADE).fetchone()[0]
+        except sqlite3.Error as ex:
+            print(ex)
+            chaves = None
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "arquivo": self.arquivo,
+                "chaves": chaves,
+                "consumos": self._consumos,
+                "falhas": self._falhas,
+            }
+
+
+class LimiteTaxa:
+    def __init__(self, baldes):
+        self.baldes = baldes
+        self._aceitas: dict[str, int] = {}
+        self._recusadas: dict[str, int] = {}
+
+    async def consumir(self, politica: PoliticaLimite, identidade: str) -> float:
+        espera = await self.baldes.consumir((politica.nome, identidade), politica)
+        contagem = self._recusadas if espera else self._aceitas
+        contagem[politica.nome] = contagem.get(politica.nome, 0) + 1
+        return espera
+
+    def estatisticas(self) -> dict:
+        return {
+            "aceitas": dict(self._aceitas),
+            "recusadas": dict(self._recusadas),
+            **self.baldes.estatisticas(),
+        }
+
+
+def limite_taxa_habilitado() -> bool:
+    return os.getenv("LIMITE_TAXA", "1") == "1"
+
+
+def _criar_baldes():
+    # LIMITE_TAXA_BACKEND=sqlite divide os baldes entre os workers
+    if os.getenv("LIMITE_TAXA_BACKEND", "memoria") == "sqlite":
+        politicas = list(POLITICAS_LIMITE.values()) + [
+            politica for _, _, politica in POLITICAS_LIMITE_PREFIXO
+        ]
+        return BaldesSqlite(
+            os.getenv("LIMITE_TAXA_ARQUIVO", "limite_taxa.db"),
+            max(politica.periodo for politica in politicas),
+        )
+    return BaldesMemoria(int(os.getenv("LIMITE_TAXA_MAXIMO_CHAVES", "100000")))
+
+
+limite_taxa = LimiteTaxa(_criar_baldes())
+
+
+def _identificar(scope: Scope, politica: PoliticaLimite) -> str:
+    # atrás de um proxy, o IP real vem do uvicorn com --proxy-headers
+    if politica.por_usuario:
+        usuario = scope.get("state", {}).get("usuario")
+        if usuario:
+            return f"usuario:{usuario.id}"
+    cliente = scope.get("client")
+    return f"ip:{cliente[0] if cliente else '-'}"
+
+
+class MiddlewareLimiteTaxa:
+    """Middleware ASGI que aplica as políticas de POLITICAS_LIMITE; as
+    demais rotas passam direto. Fica dentro do middleware de autenticação,
+    para enxergar o usuário em request.state. Recusa com 429 e
+    Retry-After."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            politica = obter_politica_limite(scope["method"], scope["path"])
+            if politica is not None:
+                espera = await limite_taxa.consumir(politica, _identificar(scope, politica))
+                if espera:
+                    segundos = max(1, math.ceil(espera))
+                    pd = ProblemDetailsDto(
+                        "str",
+                        f"Muitas requisições. Tente novamente em {segundos} segundo(s).",
+                        "too_many_requests",
+                    )
+                    resposta = JSONResponse(
+                        pd.to_dict(),
+                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        headers={"Retry-After": str(segundos)},
+                    )
+                    await resposta(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
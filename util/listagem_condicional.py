@@ -0,0 +1,154 @@
+import json
+from dataclasses import asdict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from repositories.versao_repo import VersaoRepo
+from util.paginacao import Pagina
+
+TIPO_NDJSON = "application/x-ndjson"
+TAMANHO_PAGINA_MAXIMO = 1000
+TAMANHO_LOTE_NDJSON = 500
+
+
+def _nao_modificada(request: Request, etag: str, alterada_em: int) -> bool:
+    # o ETag (versão da tabela) decide sempre que vier; a data só tem
+    # resolução de segundos, e uma alteração no mesmo segundo do
+    # Last-Modified enviado não mudaria a data: nesse caso não há 304
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etags = [parte.strip().removeprefix("W/") for parte in if_none_match.split(",")]
+        return etag in etags or "*" in etags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return alterada_em < parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def responder_listagem(
+    request: Request,
+    tabela: str,
+    obter_todos: Callable[[], Awaitable[list]],
+    obter_alterados_desde: Callable[[int], Awaitable[list]],
+    desde: Optional[int] = None,
+    obter_excluidos_desde: Optional[Callable[[int], Awaitable[list]]] = None,
+) -> Response:
+    """Resposta de uma listagem do admin com GET condicional e modo delta.
+
+    O ETag e o Last-Modified vêm do contador de alterações da tabela, de
+    modo que uma listagem sem alterações responde 304 sem consultar os
+    registros. Com ?since=<versão>, devolve só os registros alterados desde
+    essa versão e os ids que saíram da listagem; a versão atual vai no
+    cabeçalho X-Versao. Sem filtro, sai da listagem o que foi excluído; numa
+    listagem filtrada, obter_excluidos_desde informa os ids que deixaram de
+    atender ao filtro."""
+    versao, alterada_em = await VersaoRepo.aobter_versao(tabela)
+    etag = f'"{tabela}-{versao}"'
+    cabecalhos = {
+        "ETag": etag,
+        "Last-Modified": formatdate(alterada_em, usegmt=True),
+        "Cache-Control": "no-cache",
+        "X-Versao": str(versao),
+    }
+    if _nao_modificada(request, etag, alterada_em):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos)
+    # versão desconhecida (ex.: banco recriado) recebe a listagem completa
+    if desde is None or not 0 < desde <= versao:
+        conteudo = await obter_todos()
+    else:
+        # ids antes dos registros: uma alteração entre as consultas
+        # aparece em "alterados", nunca como exclusão indevida
+        ids = await VersaoRepo.aobter_ids_alterados_desde(tabela, desde)
+        excluidos = ids
+        if ids and obter_excluidos_desde is not None:
+            excluidos = await obter_excluidos_desde(desde)
+        alterados = await obter_alterados_desde(desde) if ids else []
+        ids_alterados = {registro.id for registro in alterados}
+        conteudo = {
+            "versao": versao,
+            "alterados": alterados,
+            "excluidos": sorted(set(excluidos) - ids_alterados),
+        }
+    return JSONResponse(jsonable_encoder(conteudo), headers=cabecalhos)
+
+
+def pedir_ndjson(request: Request, formato: Optional[str] = None) -> bool:
+    # ?formato=ndjson ou Accept: application/x-ndjson
+    if formato:
+        return formato == "ndjson"
+    return TIPO_NDJSON in request.headers.get("accept", "")
+
+
+def _lote_ndjson(lote: Iterable) -> bytes:
+    # um pedaço da resposta por lote, não por linha
+    return "".join(
+        json.dumps(asdict(registro), ensure_ascii=False, default=str) + "\n"
+        for registro in lote
+    ).encode()
+
+
+async def _lotes_ndjson(
+    obter_pagina: Callable[[int, Optional[str]], Awaitable[Optional[Pagina]]],
+) -> AsyncIterator[bytes]:
+    # cada lote é uma página lida por chave com uma conexão própria, que
+    # volta ao pool antes de o lote ser enviado: um cliente lento não segura
+    # conexão nem transação de leitura entre um lote e outro
+    cursor = None
+    while True:
+        pagina = await obter_pagina(TAMANHO_LOTE_NDJSON, cursor)
+        if pagina is None:
+            return
+        if pagina.itens:
+            yield _lote_ndjson(pagina.itens)
+        cursor = pagina.cursor_proximo
+        if not cursor:
+            return
+
+
+async def responder_listagem_paginada(
+    request: Request,
+    tabela: str,
+    obter_pagina: Callable[[int, Optional[str]], Awaitable[Optional[Pagina]]],
+    tamanho_pagina: Optional[int] = None,
+    cursor: Optional[str] = None,
+    ndjson: bool = False,
+) -> Response:
+    """Listagem do admin em páginas (?limit=&cursor=) ou em fluxo NDJSON.
+
+    Em páginas, o corpo traz os itens e os cursores da página anterior e
+    da próxima. Em NDJSON sem limit, a tabela inteira é enviada lote a
+    lote, página após página, com memória constante; como cada lote é
+    lido em sua própria transação, a listagem não é um retrato único da
+    tabela. X-Versao é lido antes da listagem: usado depois em ?since=,
+    nenhuma alteração feita durante o envio se perde."""
+    versao, _ = await VersaoRepo.aobter_versao(tabela)
+    cabecalhos = {"Cache-Control": "no-cache", "X-Versao": str(versao)}
+    if ndjson and tamanho_pagina is None and cursor is None:
+        return StreamingResponse(
+            _lotes_ndjson(obter_pagina), media_type=TIPO_NDJSON, headers=cabecalhos
+        )
+    pagina = await obter_pagina(tamanho_pagina or TAMANHO_PAGINA_MAXIMO, cursor)
+    if pagina is None:
+        return JSONResponse(
+            {"detail": "Não foi possível obter a listagem."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    if pagina.cursor_proximo:
+        cabecalhos["X-Proximo-Cursor"] = pagina.cursor_proximo
+    if ndjson:
+        return StreamingResponse(
+            [_lote_ndjson(pagina.itens)], media_type=TIPO_NDJSON, headers=cabecalhos
+        )
+    conteudo = {
+        "itens": pagina.itens,
+        "cursor_anterior": pagina.cursor_anterior,
+        "cursor_proximo": pagina.cursor_proximo,
+    }
+    return JSONResponse(jsonable_encoder(conteudo), headers=cabecalhos)
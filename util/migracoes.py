@@ -0,0 +1,50 @@
+import sqlite3
+from datetime import datetime
+from typing import Optional
+
+from sql.migracao_sql import *
+from util.database import obter_conexao
+
+
+def executar_migracoes(versao_alvo: Optional[int] = None) -> list[int]:
+    """Aplica, em ordem, as migrações ainda não registradas em
+    schema_version. Cada migração roda em sua própria transação e é
+    registrada junto com seus comandos, de modo que uma falha no meio não
+    deixa o esquema pela metade."""
+    aplicadas = []
+    with obter_conexao() as conexao:
+        conexao.execute(SQL_CRIAR_TABELA)
+        conexao.commit()
+        for versao, descricao, comandos in MIGRACOES:
+            if versao_alvo is not None and versao > versao_alvo:
+                break
+            # BEGIN IMMEDIATE serializa workers que sobem ao mesmo tempo;
+            # a versão é relida já com o lock de escrita obtido
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                versao_atual = conexao.execute(SQL_OBTER_VERSAO_ATUAL).fetchone()[0]
+                if versao <= versao_atual:
+                    conexao.rollback()
+                    continue
+                for comando in comandos:
+                    conexao.execute(comando)
+                conexao.execute(
+                    SQL_INSERIR, (versao, descricao, datetime.now().isoformat())
+                )
+                conexao.commit()
+            except sqlite3.Error:
+                conexao.rollback()
+                raise
+            print(f"Migração {versao} aplicada: {descricao}")
+            aplicadas.append(versao)
+    return aplicadas
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    executar_migracoes()
+    with obter_conexao() as conexao:
+        for versao, descricao, aplicada_em in conexao.execute(SQL_OBTER_TODAS):
+            print(f"{versao:4d}  {aplicada_em}  {descricao}")
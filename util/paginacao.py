@@ -0,0 +1,122 @@
+import base64
+import binascii
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+
+@dataclass
+class Cursor:
+    # valores da última (ou primeira) linha da página, na ordem das colunas
+    # de ordenação: ex. [nome, id] ou [preco, id]
+    chave: list
+    # "p" busca a próxima página, "a" a anterior
+    direcao: str
+    numero: int
+    total: int
+    # identifica a listagem (termo, ordem...) para a qual o cursor vale
+    contexto: str
+
+
+@dataclass
+class Pagina:
+    itens: list = field(default_factory=list)
+    total: int = 0
+    numero: int = 1
+    quantidade_paginas: int = 0
+    cursor_anterior: Optional[str] = None
+    cursor_proximo: Optional[str] = None
+
+
+def codificar_cursor(cursor: Cursor) -> str:
+    dados = {
+        "k": cursor.chave,
+        "d": cursor.direcao,
+        "n": cursor.numero,
+        "t": cursor.total,
+        "c": cursor.contexto,
+    }
+    texto = json.dumps(dados, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(
+    token: Optional[str], contexto: str, colunas: int
+) -> Optional[Cursor]:
+    # cursor ausente, corrompido, de outra listagem ou com uma chave que não
+    # tem um valor simples por coluna de ordenação: volta à primeira página
+    if not token:
+        return None
+    try:
+        preenchimento = "=" * (-len(token) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(token + preenchimento))
+        cursor = Cursor(
+            dados["k"], dados["d"], int(dados["n"]), int(dados["t"]), dados["c"]
+        )
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+    if cursor.contexto != contexto or cursor.direcao not in ("p", "a"):
+        return None
+    if not isinstance(cursor.chave, list) or len(cursor.chave) != colunas:
+        return None
+    if any(type(valor) not in (str, int, float) for valor in cursor.chave):
+        return None
+    return cursor
+
+
+def montar_filtro_cursor(
+    colunas: list[str], decrescente: bool, cursor: Optional[Cursor]
+) -> tuple[str, str, list]:
+    """Devolve (filtro WHERE, ORDER BY, parâmetros) da consulta por chave.
+
+    Voltar uma página inverte a comparação e a ordenação; as linhas obtidas
+    são desinvertidas em montar_pagina."""
+    invertido = decrescente != (cursor is not None and cursor.direcao == "a")
+    sentido = "DESC" if invertido else "ASC"
+    ordenacao = ", ".join(f"{coluna} {sentido}" for coluna in colunas)
+    if cursor is None:
+        return "1 = 1", ordenacao, []
+    operador = "<" if invertido else ">"
+    filtro = f"({', '.join(colunas)}) {operador} ({', '.join('?' * len(colunas))})"
+    return filtro, ordenacao, list(cursor.chave)
+
+
+def montar_pagina(
+    itens: list,
+    chaves: list[list[Any]],
+    total: Optional[int],
+    tamanho_pagina: int,
+    cursor: Optional[Cursor],
+    contexto: str,
+) -> Pagina:
+    """Monta a página a partir de até tamanho_pagina + 1 linhas; a linha
+    extra indica que há mais resultados na direção percorrida."""
+    ha_mais = len(itens) > tamanho_pagina
+    itens, chaves = itens[:tamanho_pagina], chaves[:tamanho_pagina]
+    if cursor is None:
+        numero, total = 1, total or 0
+        ha_anterior, ha_proxima = False, ha_mais
+    elif cursor.direcao == "p":
+        numero, total = cursor.numero, cursor.total
+        ha_anterior, ha_proxima = True, ha_mais
+    else:
+        itens.reverse()
+        chaves.reverse()
+        numero, total = cursor.numero, cursor.total
+        ha_anterior, ha_proxima = numero > 1 and ha_mais, True
+    pagina = Pagina(
+        itens=itens,
+        total=total,
+        numero=numero,
+        quantidade_paginas=math.ceil(total / float(tamanho_pagina)),
+    )
+    if itens and ha_anterior:
+        pagina.cursor_anterior = codificar_cursor(
+            Cursor(chaves[0], "a", numero - 1, total, contexto)
+        )
+    if itens and ha_proxima:
+        pagina.cursor_proximo = codificar_cursor(
+            Cursor(chaves[-1], "p", numero + 1, total, contexto)
+        )
+    return pagina
@@ -0,0 +1,46 @@
+from enum import Enum
+
+from fastapi import HTTPException, Request, status
+
+
+class PoliticaRota(Enum):
+    PUBLICA = "publica"
+    OPCIONAL = "opcional"
+    CLIENTE = "cliente"
+    ADMIN = "admin"
+
+
+# política pelo primeiro segmento do caminho; o que não está aqui é
+# OPCIONAL (páginas que mostram o usuário logado, se houver). Nas rotas
+# PUBLICA o token nem é lido: request.state.usuario fica None
+POLITICAS_ROTAS = {
+    "static": PoliticaRota.PUBLICA,
+    "auth": PoliticaRota.PUBLICA,
+    "docs": PoliticaRota.PUBLICA,
+    "redoc": PoliticaRota.PUBLICA,
+    "openapi.json": PoliticaRota.PUBLICA,
+    "favicon.ico": PoliticaRota.PUBLICA,
+    "cliente": PoliticaRota.CLIENTE,
+    "admin": PoliticaRota.ADMIN,
+}
+
+PERFIL_POR_POLITICA = {PoliticaRota.CLIENTE: 1, PoliticaRota.ADMIN: 0}
+
+
+def obter_politica_rota(caminho: str) -> PoliticaRota:
+    fim = caminho.find("/", 1)
+    segmento = caminho[1:] if fim < 0 else caminho[1:fim]
+    return POLITICAS_ROTAS.get(segmento, PoliticaRota.OPCIONAL)
+
+
+async def checar_autorizacao(request: Request):
+    estado = request.state
+    politica = getattr(estado, "politica", None) or obter_politica_rota(request.url.path)
+    perfil = PERFIL_POR_POLITICA.get(politica)
+    if perfil is None:
+        return
+    usuario = getattr(estado, "usuario", None)
+    if not usuario:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    if usuario.perfil != perfil:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,38 @@
+import asyncio
+import os
+from typing import Optional
+
+from services.estoque_service import EstoqueService
+
+_tarefa: Optional[asyncio.Task] = None
+
+
+async def _varrer_reservas(intervalo: float):
+    # cada worker roda sua própria varredura; a liberação é uma única
+    # transação, então varreduras simultâneas não devolvem o estoque duas vezes
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            liberadas = await EstoqueService.aliberar_expiradas()
+            if liberadas:
+                print(f"{liberadas} reserva(s) de estoque expirada(s) liberada(s).")
+        except Exception as ex:
+            print(ex)
+
+
+async def iniciar_varredura_reservas():
+    global _tarefa
+    intervalo = float(os.getenv("RESERVA_VARREDURA_SEGUNDOS", "60"))
+    if _tarefa is None and intervalo > 0:
+        _tarefa = asyncio.create_task(_varrer_reservas(intervalo))
+
+
+async def parar_varredura_reservas():
+    global _tarefa
+    if _tarefa is not None:
+        _tarefa.cancel()
+        try:
+            await _tarefa
+        except asyncio.CancelledError:
+            pass
+        _tarefa = None
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from util.auth_jwt import conferir_senha, obter_hash_senha
+
+
+def reduzir_prioridade(prioridade: int):
+    # no Linux a prioridade vale por thread (id nativo); em outros
+    # sistemas a thread segue com a prioridade do processo
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), prioridade)
+    except (AttributeError, OSError):
+        pass
+
+
+class SenhasOcupadasError(Exception):
+    """A fila do pool de senhas está cheia: a requisição deve ser recusada
+    com 503 em vez de esperar."""
+
+
+class PoolSenhas:
+    """Executa o bcrypt (centenas de ms de CPU por chamada) fora do event
+    loop, em poucas threads de prioridade reduzida, com limite de tarefas
+    aguardando; acima dele, falha na hora com SenhasOcupadasError.
+
+    O bcrypt libera o GIL enquanto calcula, então as threads não travam as
+    demais requisições; a prioridade menor (nice) faz o sistema operacional
+    preferir o event loop quando os dois disputam a CPU."""
+
+    def __init__(self, threads: int, fila_maxima: int, prioridade: int = 10):
+        self.threads = threads
+        self.fila_maxima = fila_maxima
+        self.prioridade = prioridade
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._em_execucao = 0
+        self._maximo_pendentes = 0
+        self._concluidas = 0
+        self._recusadas = 0
+        self._tempo_execucao = 0.0
+        self._tempo_espera = 0.0
+
+    def _obter_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.threads,
+                        thread_name_prefix="senhas",
+                        initializer=reduzir_prioridade,
+                        initargs=(self.prioridade,),
+                    )
+        return self._executor
+
+    def _executar(self, funcao: Callable, enviada_em: float, *args):
+        inicio = time.perf_counter()
+        with self._lock:
+            self._em_execucao += 1
+            self._tempo_espera += inicio - enviada_em
+        try:
+            return funcao(*args)
+        finally:
+            with self._lock:
+                self._em_execucao -= 1
+                self._concluidas += 1
+                self._tempo_execucao += time.perf_counter() - inicio
+
+    async def executar(self, funcao: Callable, *args):
+        with self._lock:
+            if self._pendentes >= self.threads + self.fila_maxima:
+                self._recusadas += 1
+                raise SenhasOcupadasError()
+            self._pendentes += 1
+            self._maximo_pendentes = max(self._maximo_pendentes, self._pendentes)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._obter_executor(),
+                functools.partial(self._executar, funcao, time.perf_counter(), *args),
+            )
+        finally:
+            with self._lock:
+                self._pendentes -= 1
+
+    def fechar(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            concluidas = self._concluidas
+            return {
+                "threads": self.threads,
+                "fila_maxima": self.fila_maxima,
+                "em_execucao": self._em_execucao,
+                "na_fila": self._pendentes - self._em_execucao,
+                "maximo_pendentes": self._maximo_pendentes,
+                "concluidas": concluidas,
+                "recusadas": self._recusadas,
+                "execucao_media_ms": (
+                    round(self._tempo_execucao * 1000 / concluidas, 1) if concluidas else 0.0
+                ),
+                "espera_media_ms": (
+                    round(self._tempo_espera * 1000 / concluidas, 1) if concluidas else 0.0
+                ),
+            }
+
+
+pool_senhas = PoolSenhas(
+    int(os.getenv("SENHAS_THREADS", str(max(1, (os.cpu_count() or 1) // 2)))),
+    int(os.getenv("SENHAS_FILA_MAXIMA", "16")),
+    int(os.getenv("SENHAS_PRIORIDADE", "10")),
+)
+
+
+async def aobter_hash_senha(senha: str) -> str:
+    return await pool_senhas.executar(obter_hash_senha, senha)
+
+
+async def aconferir_senha(senha: str, hash_senha: str) -> bool:
+    return await pool_senhas.executar(conferir_senha, senha, hash_senha)
@@ -0,0 +1,126 @@
+import dataclasses
+import hashlib
+import os
+import secrets
+import time
+from typing import Optional
+
+from models.sessao_model import Sessao
+from models.usuario_model import Usuario
+from repositories.sessao_repo import SessaoRepo
+from util.cache import CacheLRU
+from util.cookies import TEMPO_COOKIE_AUTH
+
+
+def calcular_hash_token(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _agora_ms() -> int:
+    return round(time.time() * 1000)
+
+
+class ArmazenamentoSessoes:
+    """Sessões da autenticação por cookie: o repositório (SessaoRepo, ou
+    outro com os mesmos métodos assíncronos) guarda o hash do token e um
+    cache em memória na frente responde as requisições seguintes sem ler o
+    banco.
+
+    A expiração é deslizante: a sessão dura `duracao` segundos e só é
+    estendida (no banco e no cookie) quando faltam menos de `renovar_antes`
+    segundos, e não a cada requisição.
+
+    O cache é do processo: com vários workers, uma sessão encerrada em um
+    deles ainda vale nos outros por até o TTL do cache."""
+
+    def __init__(
+        self,
+        repositorio=SessaoRepo,
+        duracao: int = TEMPO_COOKIE_AUTH,
+        renovar_antes: int = TEMPO_COOKIE_AUTH // 4,
+        cache: Optional[CacheLRU] = None,
+    ):
+        self.repositorio = repositorio
+        self.duracao = duracao
+        self.renovar_antes = renovar_antes
+        self.cache = cache if cache is not None else CacheLRU(10000, 60)
+        # hashes encerrados há pouco: uma leitura do banco que começou antes
+        # do encerramento não recoloca a sessão no cache
+        self._encerrados = CacheLRU(self.cache.tamanho_maximo, self.cache.ttl)
+
+    def _guardar(self, sessao: Sessao, versao: Optional[int] = None):
+        achou, _ = self._encerrados.obter(sessao.hash_token, contar_falha=False)
+        if not achou:
+            self.cache.guardar(sessao.hash_token, sessao, versao)
+
+    async def criar(self, usuario: Usuario) -> Optional[str]:
+        """Cria a sessão do usuário e devolve o token do cookie, ou None se
+        não foi possível gravá-la."""
+        token = secrets.token_urlsafe(32)
+        agora = _agora_ms()
+        sessao = Sessao(
+            calcular_hash_token(token), usuario.id, agora + self.duracao * 1000, usuario
+        )
+        if not await self.repositorio.ainserir(sessao, agora):
+            return None
+        self._guardar(sessao)
+        return token
+
+    async def obter(self, token: str) -> Optional[Sessao]:
+        """Sessão válida do token, ou None. Com o cache aquecido não lê o
+        banco. A sessão devolvida é compartilhada e não deve ser alterada."""
+        hash_token = calcular_hash_token(token)
+        agora = _agora_ms()
+        achou, sessao = self.cache.obter(hash_token)
+        if achou and sessao.expira_em > agora:
+            return sessao
+        # vencida no cache ainda pode ter sido renovada por outro worker
+        versao = self.cache.versao
+        sessao = await self.repositorio.aobter(hash_token, agora)
+        if sessao is None:
+            self.cache.remover(hash_token)
+            return None
+        self._guardar(sessao, versao)
+        return sessao
+
+    def precisa_renovar(self, sessao: Sessao) -> bool:
+        return sessao.expira_em - _agora_ms() < self.renovar_antes * 1000
+
+    async def renovar(self, sessao: Sessao) -> bool:
+        expira_em = _agora_ms() + self.duracao * 1000
+        if not await self.repositorio.arenovar(sessao.hash_token, expira_em):
+            # excluída (logout em outro worker) ou já renovada até depois
+            self.cache.remover(sessao.hash_token)
+            return False
+        self._guardar(dataclasses.replace(sessao, expira_em=expira_em))
+        return True
+
+    async def encerrar(self, token: str):
+        hash_token = calcular_hash_token(token)
+        await self.repositorio.aexcluir(hash_token)
+        self._encerrados.guardar(hash_token, True)
+        self.cache.remover(hash_token)
+
+    async def encerrar_do_usuario(self, id_usuario: int):
+        # todas as sessões do usuário (troca de senha, exclusão da conta);
+        # raro, então limpa o cache inteiro em vez de procurar as sessões dele
+        await self.repositorio.aexcluir_por_usuario(id_usuario)
+        self.cache.invalidar()
+
+    def estatisticas(self) -> dict:
+        return self.cache.estatisticas()
+
+
+def autenticacao_por_cookie() -> bool:
+    # AUTENTICACAO=cookie troca o JWT pelas sessões (util.auth_cookie)
+    return os.getenv("AUTENTICACAO", "jwt") == "cookie"
+
+
+armazenamento_sessoes = ArmazenamentoSessoes(
+    duracao=TEMPO_COOKIE_AUTH,
+    renovar_antes=int(os.getenv("SESSOES_RENOVAR_ANTES", str(TEMPO_COOKIE_AUTH // 4))),
+    cache=CacheLRU(
+        int(os.getenv("SESSOES_CACHE_TAMANHO", "10000")),
+        float(os.getenv("SESSOES_CACHE_TTL", "60")),
+    ),
+)